@@ -1,6 +1,7 @@
 """This module contains api endpoints for the document connected logics"""
 
-from fastapi import APIRouter, Depends, BackgroundTasks, UploadFile, Form, File
+from fastapi import APIRouter, Depends, UploadFile, Form, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.controllers import tests as test_controllers
@@ -18,6 +19,7 @@ from app.schemas.tests.test import (
 )
 
 from app.services.users import get_user_from_token
+from app.utils.enums import JobKind
 
 tests_router = APIRouter(tags=["Tests"])
 
@@ -82,14 +84,12 @@ async def update_test(
 async def submit_test(
     test_id: int,
     payload: TestSubmitPayload,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_user_from_token),
 ) -> SubmitTestResponse:
     result = await test_controllers.start_test_batch(
         test_id=test_id,
         payload=payload,
         current_user=current_user,
-        background_tasks=background_tasks,
     )
     return result
 
@@ -102,6 +102,12 @@ async def get_job_status(job_id: str) -> RunJobStatusResponse:
     return result
 
 
+@tests_router.get("/submit-status/{job_id}/stream", response_class=StreamingResponse)
+async def stream_job_status(job_id: str) -> StreamingResponse:
+    result = await test_controllers.stream_job_status(job_id, kind=JobKind.TEST_RUN)
+    return result
+
+
 @tests_router.get("/{test_id}/test-runs", status_code=200)
 async def get_runs_of_test(
     test_id: int,
@@ -116,17 +122,23 @@ async def get_runs_of_test(
 
 @tests_router.post("/document/upload")
 async def upload_document(
-    background_tasks: BackgroundTasks,
     document: UploadFile = File(...),
     test_id: int = Form(...),
     current_user: User = Depends(get_user_from_token),
-    async_db_session: AsyncSession = Depends(get_async_postgres_session),
 ):
     result = await test_controllers.upload_document(
-        background_tasks=background_tasks,
         document=document,
         test_id=test_id,
         user_id=current_user.id,
-        async_db_session=async_db_session,
+    )
+    return result
+
+
+@tests_router.get(
+    "/document/upload-status/{job_id}/stream", response_class=StreamingResponse
+)
+async def stream_document_upload_status(job_id: str) -> StreamingResponse:
+    result = await test_controllers.stream_job_status(
+        job_id, kind=JobKind.DOCUMENT_UPLOAD
     )
     return result
@@ -1,7 +1,8 @@
 import logging
 import uuid
 
-from fastapi import BackgroundTasks, UploadFile
+from fastapi import UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy import Select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -24,12 +25,14 @@ from app.services.tests.tests import (
     normalize_parsed_data,
     save_test_in_db,
     get_test_from_db,
-    run_background_tests,
     get_runs_of_test_db,
+    get_llm_usage_of_test_db,
 )
-from app.services.tests.documents import process_document_job
-from app.settings import TEST_RUNS_JOBS_STORAGE, UPLOAD_DOCUMENT_JOBS_STORAGE
-from app.utils.enums import JobStatus
+from app.services.jobs.progress import stream_job_progress
+from app.services.jobs.queue import enqueue_task
+from app.services.jobs.store import job_store
+from app.services.tests.documents import check_request_document, spool_document
+from app.utils.enums import JobStatus, JobKind
 from app.utils.exception_types import NotFoundError
 from app.utils.logging import correlation_id
 
@@ -45,7 +48,7 @@ async def upload_google_doc_test(
         extra={"user_id": current_user.id, "test_url": payload.test_url},
     )
     # 2. Wywołanie parsera — pobranie pytań z Google Form
-    parsed_data = parse_google_form(url=payload.test_url, only_required=False)
+    parsed_data = await parse_google_form(url=payload.test_url, only_required=False)
     # 3. Wywołanie serwisu — normalizacja danych
     test_content: TestQuestions = normalize_parsed_data(parsed_data)
     # 4. Wywołanie serwisu — zapis do bazy danych
@@ -116,22 +119,28 @@ async def update_test(
     return TestResponse(test_id=test_db.id)
 
 
-async def start_test_batch(test_id, payload, current_user, background_tasks):
+async def start_test_batch(test_id, payload, current_user):
     job_id = str(uuid.uuid4())
 
-    TEST_RUNS_JOBS_STORAGE[job_id] = {
-        "status": JobStatus.PENDING,
-        "total_tests": payload.quantity,
-        "processed_tests": 0,
-        "results": [],
-    }
+    await job_store.create(
+        job_id,
+        kind=JobKind.TEST_RUN,
+        data={
+            "status": JobStatus.PENDING,
+            "total_tests": payload.quantity,
+            "processed_tests": 0,
+            "results": [],
+        },
+    )
 
-    background_tasks.add_task(
-        run_background_tests,
-        job_id=job_id,
-        test_id=test_id,
-        payload=payload,
-        current_user=current_user,
+    await enqueue_task(
+        job_id,
+        kind=JobKind.TEST_RUN,
+        payload={
+            "test_id": test_id,
+            "user_id": current_user.id,
+            "payload": payload.model_dump(mode="json"),
+        },
     )
 
     return SubmitTestResponse(
@@ -140,8 +149,8 @@ async def start_test_batch(test_id, payload, current_user, background_tasks):
 
 
 async def get_run_status(job_id: str):
-    job = TEST_RUNS_JOBS_STORAGE.get(job_id)
-    if not job:
+    job = await job_store.get(job_id)
+    if not job or job["kind"] != JobKind.TEST_RUN:
         raise NotFoundError(message="Test run Job not found")
 
     current_status = job["status"]
@@ -160,6 +169,18 @@ async def get_run_status(job_id: str):
     return response
 
 
+async def stream_job_status(job_id: str, kind: JobKind) -> StreamingResponse:
+    job = await job_store.get(job_id)
+    if not job or job["kind"] != kind:
+        raise NotFoundError(message="Job not found")
+
+    return StreamingResponse(
+        stream_job_progress(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 async def get_test_run(run_id: int, current_user: User, db_session: AsyncSession):
     query = await db_session.execute(
         Select(TestRun).where(TestRun.id == run_id, TestRun.user_id == current_user.id)
@@ -179,6 +200,7 @@ async def get_test_run(run_id: int, current_user: User, db_session: AsyncSession
         test_id=test_run_db.test_id,
         run_id=test_run_db.id,
         run_content=test_run_db.run_content,
+        llm_model=test_run_db.llm_model,
         submitted_date=test_run_db.submitted_date,
     )
 
@@ -197,37 +219,53 @@ async def get_runs_of_test(
             job_id=test_run.job_id,
             submitted_date=test_run.submitted_date,
             llm_model=test_run.llm_model,
+            llm_prompt_tokens=test_run.llm_prompt_tokens,
+            llm_completion_tokens=test_run.llm_completion_tokens,
+            llm_attempts=test_run.llm_attempts,
+            llm_answering_time=test_run.llm_answering_time,
         )
         for test_run in test_runs_db
     ]
+    llm_usage = await get_llm_usage_of_test_db(
+        test_id=test_id, current_user=current_user, db_session=async_db_session
+    )
 
-    return RunsOfTestResponse(test_runs=result)
+    return RunsOfTestResponse(test_runs=result, llm_usage=llm_usage)
 
 
 async def upload_document(
     document: UploadFile,
     test_id: int,
     user_id: int,
-    background_tasks: BackgroundTasks,
-    async_db_session: AsyncSession,
 ):
 
+    check_request_document(document.content_type, document.size or 0)
+
     job_id = str(uuid.uuid4())
-    UPLOAD_DOCUMENT_JOBS_STORAGE[job_id] = {
-        "status": JobStatus.PENDING,
-        "file_name": document.filename,
-        "processed_chunks": 0,
-        "total_chunks": 0,
-        "error": None,
-    }
-
-    background_tasks.add_task(
-        process_document_job,
-        job_id=job_id,
-        user_id=user_id,
-        test_id=test_id,
-        document=document,
-        db_session=async_db_session,
-        scope="test",
+    document_path = await spool_document(document, job_id)
+
+    await job_store.create(
+        job_id,
+        kind=JobKind.DOCUMENT_UPLOAD,
+        data={
+            "status": JobStatus.PENDING,
+            "file_name": document.filename,
+            "processed_chunks": 0,
+            "total_chunks": 0,
+            "error": None,
+        },
+    )
+
+    await enqueue_task(
+        job_id,
+        kind=JobKind.DOCUMENT_UPLOAD,
+        payload={
+            "test_id": test_id,
+            "user_id": user_id,
+            "document_path": document_path,
+            "file_name": document.filename,
+            "content_type": document.content_type,
+            "scope": "test",
+        },
     )
-    return {"job_id": job_id, "status": JobStatus.PROCESSING}
+    return {"job_id": job_id, "status": JobStatus.PENDING}
@@ -0,0 +1,31 @@
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy import Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.models.orm.mixin import MixinModel
+from app.database.postgres_config import DeclarativeBase
+
+
+# pylint: disable=too-few-public-methods
+class ChunkEmbedding(DeclarativeBase, MixinModel):
+    """Embedding shared by every document chunk with the same text."""
+
+    __tablename__ = "chunk_embeddings"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # sha256 of the embeddings model, dimensionality and chunk text
+    content_hash: Mapped[str] = mapped_column(nullable=False, unique=True)
+    embeddings_model: Mapped[str] = mapped_column(nullable=False)
+    dimensions: Mapped[int] = mapped_column(nullable=False)
+    # halfvec, HNSW indexes do not support vector columns above 2000 dimensions
+    embedding: Mapped[list[float]] = mapped_column(HALFVEC(3072), nullable=False)
+
+    __table_args__ = (
+        Index(
+            "ix_chunk_embeddings_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "halfvec_l2_ops"},
+        ),
+    )
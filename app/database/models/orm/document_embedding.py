@@ -1,8 +1,8 @@
-from pgvector.sqlalchemy import Vector
 from sqlalchemy import ForeignKey
 
 from sqlalchemy.orm import Mapped, relationship, mapped_column
 
+from app.database.models.orm.chunk_embedding import ChunkEmbedding
 from app.database.models.orm.mixin import MixinModel
 from app.database.postgres_config import DeclarativeBase
 
@@ -16,5 +16,9 @@ class DocumentEmbedding(DeclarativeBase, MixinModel):
     )
     chunk_index: Mapped[int] = mapped_column(nullable=False)
     chunk_text: Mapped[str] = mapped_column(nullable=False)
-    embedding: Mapped[list[float]] = mapped_column(Vector(3072), nullable=False)
+    # Vectors are shared between documents with the same chunks
+    embedding_id: Mapped[int] = mapped_column(
+        ForeignKey("chunk_embeddings.id"), nullable=False, index=True
+    )
     document = relationship("Document", back_populates="embeddings")
+    embedding: Mapped["ChunkEmbedding"] = relationship("ChunkEmbedding")
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.postgres_config import DeclarativeBase
+from app.database.models.orm.mixin import MixinModel
+
+
+# pylint: disable=too-few-public-methods
+class Job(DeclarativeBase, MixinModel):
+    __tablename__ = "jobs"
+
+    id: Mapped[str] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(nullable=False, index=True)
+    data: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, index=True
+    )
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.postgres_config import DeclarativeBase
+from app.database.models.orm.mixin import MixinModel
+from app.database.models.orm.test import PydanticJSON
+from app.schemas.llm import LLMQuestionsListOut
+
+
+# pylint: disable=too-few-public-methods
+class LLMAnswerCacheEntry(DeclarativeBase, MixinModel):
+    __tablename__ = "llm_answer_cache"
+
+    cache_key: Mapped[str] = mapped_column(primary_key=True)
+    llm_model: Mapped[str] = mapped_column(nullable=False)
+    answers: Mapped[LLMQuestionsListOut] = mapped_column(
+        PydanticJSON(LLMQuestionsListOut), nullable=False
+    )
+    expires_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, index=True
+    )
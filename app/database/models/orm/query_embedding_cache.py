@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy import DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.postgres_config import DeclarativeBase
+from app.database.models.orm.mixin import MixinModel
+
+
+# pylint: disable=too-few-public-methods
+class QueryEmbeddingCacheEntry(DeclarativeBase, MixinModel):
+    __tablename__ = "query_embedding_cache"
+
+    # sha256 of the embeddings model, dimensionality and query text
+    cache_key: Mapped[str] = mapped_column(primary_key=True)
+    embeddings_model: Mapped[str] = mapped_column(nullable=False)
+    embedding: Mapped[list[float]] = mapped_column(HALFVEC(3072), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, index=True
+    )
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.postgres_config import DeclarativeBase
+from app.database.models.orm.mixin import MixinModel
+
+
+# pylint: disable=too-few-public-methods
+# pylint: disable=not-callable
+class QueuedTask(DeclarativeBase, MixinModel):
+    __tablename__ = "job_queue"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    job_id: Mapped[str] = mapped_column(nullable=False, index=True)
+    kind: Mapped[str] = mapped_column(nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    status: Mapped[str] = mapped_column(nullable=False, index=True)
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(nullable=False)
+    run_after: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    locked_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    locked_by: Mapped[str] = mapped_column(nullable=True)
+    last_error: Mapped[str] = mapped_column(nullable=True)
@@ -22,6 +22,9 @@ class TestRun(DeclarativeBase, MixinModel):
     llm_prompt_tokens: Mapped[int] = mapped_column(nullable=True)
     llm_completion_tokens: Mapped[int] = mapped_column(nullable=True)
     llm_answering_time: Mapped[float] = mapped_column(nullable=True)
+    llm_attempts: Mapped[int] = mapped_column(nullable=True)
+    llm_retrieval_time: Mapped[float] = mapped_column(nullable=True)
+    llm_generation_time: Mapped[float] = mapped_column(nullable=True)
     run_content: Mapped[AnsweredTestContent] = mapped_column(
         PydanticJSON(AnsweredTestContent), nullable=False
     )
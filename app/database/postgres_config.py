@@ -1,5 +1,7 @@
 import os
 from typing import AsyncGenerator
+
+import asyncpg
 from dotenv import load_dotenv
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
@@ -22,3 +24,18 @@ async_postgres_session = async_sessionmaker(
 async def get_async_postgres_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_postgres_session() as session:
         yield session
+
+
+async def connect_raw_postgres() -> asyncpg.Connection:
+    """
+    Dedicated asyncpg connection outside the pool, for LISTEN and COPY which change
+    connection state (listeners, type codecs) that must not leak into pooled ones.
+    """
+    url = postgres_db_engine.url
+    return await asyncpg.connect(
+        user=url.username,
+        password=url.password,
+        host=url.host,
+        port=url.port,
+        database=url.database,
+    )
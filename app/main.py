@@ -1,6 +1,7 @@
 """Application FastAPI main file"""
 
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, APIRouter
@@ -11,6 +12,12 @@ from app.api.v1.routes import auth, tests, users
 
 from app.database.postgres_config import postgres_db_engine
 from app.middlewares import LoggingMiddleware
+from app.services.http_client import http_client
+from app.services.jobs.cleanup import run_periodic_cleanup
+from app.services.jobs.events import relay_job_notifications
+from app.services.jobs.store import job_store
+from app.services.llm.cache import llm_answer_cache, query_embedding_cache
+from app.services.tests.documents import delete_orphan_chunk_embeddings
 from app.settings import custom_openapi
 from app.utils.exception_handlers import (
     unexpected_exception_handler,
@@ -28,7 +35,26 @@ async def lifespan(_app: FastAPI):
     """Lifecycle context manager for FastAPI application."""
     async with postgres_db_engine.begin() as conn:
         await conn.execute(text("SELECT 1"))
+    background_tasks = [
+        asyncio.create_task(
+            run_periodic_cleanup(
+                {
+                    "jobs": job_store.cleanup_expired,
+                    "llm_answer_cache": llm_answer_cache.cleanup_expired,
+                    "query_embedding_cache": query_embedding_cache.cleanup_expired,
+                    "chunk_embeddings": delete_orphan_chunk_embeddings,
+                }
+            )
+        ),
+        asyncio.create_task(relay_job_notifications()),
+    ]
+    http_client.start()
     yield
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await http_client.close()
     await postgres_db_engine.dispose()
 
 
@@ -7,6 +7,7 @@ from starlette.types import Scope, Receive, Send
 
 from app.utils.logging import (
     correlation_id,
+    is_logged_body,
     log_headers,
     log_request_body,
     log_response_body,
@@ -29,11 +30,27 @@ class LoggingMiddleware:
         cid = request.headers.get("X-Correlation-ID") or str(uuid.uuid4())
         correlation_id.set(cid)
 
-        parsed_payload, raw_body = await log_request_body(request)
-
         headers_to_log = await log_headers(request)
 
+        if is_logged_body(request):
+            parsed_payload, raw_body = await log_request_body(request)
+        else:
+            # Multipart uploads are not buffered, the endpoint streams them to disk
+            parsed_payload = {
+                "content_type": request.headers.get("content-type"),
+                "content_length": request.headers.get("content-length"),
+            }
+            raw_body = None
+
+        body_replayed = False
+
         async def receive_with_body():
+            # The body was already consumed for logging, replay it once and then
+            # hand over to the server so streaming responses can detect disconnects
+            nonlocal body_replayed
+            if body_replayed or raw_body is None:
+                return await receive()
+            body_replayed = True
             return {
                 "type": "http.request",
                 "body": raw_body,
@@ -52,19 +69,27 @@ class LoggingMiddleware:
         status_code = None
         bytes_sent = 0
         response_body_chunks: list[bytes] = []
+        is_event_stream = False
 
         async def send_wrapper(message):
-            nonlocal status_code, bytes_sent
+            nonlocal status_code, bytes_sent, is_event_stream
 
             # Read status code
             if message["type"] == "http.response.start":
                 status_code = message["status"]
+                is_event_stream = any(
+                    key.lower() == b"content-type"
+                    and value.startswith(b"text/event-stream")
+                    for key, value in message.get("headers", [])
+                )
             # Count response body size (but don't store it)
             if message["type"] == "http.response.body":
                 body = message.get("body", b"")
                 bytes_sent += len(body)
 
-                response_body_chunks.append(body)
+                # Long lived progress streams are not buffered for logging
+                if not is_event_stream:
+                    response_body_chunks.append(body)
 
             return await send(message)
 
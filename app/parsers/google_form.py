@@ -1,9 +1,28 @@
+import asyncio
+import functools
 import json
 import logging
 import re
+import time
+from dataclasses import dataclass
 from typing import Any
+from urllib.parse import urlsplit, urlunsplit
 
-import requests
+import aiohttp
+
+from app.services.http_client import http_client
+from app.settings import (
+    GOOGLE_FORM_FETCH_TIMEOUT,
+    GOOGLE_FORM_CACHE_MAX_SIZE,
+    GOOGLE_FORM_CACHE_FRESH_FOR,
+    GOOGLE_FORM_CACHE_TTL,
+)
+from app.utils.cache import TTLCache
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # optional fast JSON backend
+    from json import loads as json_loads
 
 # constants
 ALL_DATA_FIELDS = "FB_PUBLIC_LOAD_DATA_"
@@ -26,33 +45,108 @@ def get_form_response_url(url: str) -> str:
     return url
 
 
+# Decodes one JSON value from a position of a larger text, quote and bracket aware
+json_decoder = json.JSONDecoder()
+
+
+@functools.lru_cache(maxsize=16)
+def get_assignment_pattern(name: str) -> re.Pattern:
+    return re.compile(rf"var\s+{re.escape(name)}\s*=\s*")
+
+
 def extract_script_variables(name: str, html: str) -> Any | None:
     """
     Extracts the value of a JS variable from the page HTML.
     Example: var FB_PUBLIC_LOAD_DATA_ = [...];
+    The literal usually fills the rest of its script tag and is decoded in one go
+    (with orjson when installed), otherwise the JSON decoder finds where it ends.
+    Semicolons inside strings no longer cut the value short.
     """
-    pattern = re.compile(rf"var\s+{re.escape(name)}\s*=\s*(.*?);", re.DOTALL)
-    match = pattern.search(html)
+    match = get_assignment_pattern(name).search(html)
     if not match:
         return None
+    start = match.end()
+
+    script_end = html.find("</script>", start)
+    if script_end != -1:
+        literal = html[start:script_end].rstrip().removesuffix(";")
+        try:
+            return json_loads(literal)
+        except ValueError:
+            pass
+
     try:
-        return json.loads(match.group(1))
-    except json.JSONDecodeError:
+        value, _ = json_decoder.raw_decode(html, start)
+    except ValueError:
         return None
+    return value
+
+
+@dataclass
+class CachedFormData:
+    data: list
+    fresh_until: float
+    etag: str | None = None
+    last_modified: str | None = None
+
 
+form_data_cache = TTLCache(
+    max_size=GOOGLE_FORM_CACHE_MAX_SIZE, ttl=GOOGLE_FORM_CACHE_TTL
+)
 
-def fetch_form_data(url: str) -> list | None:
+
+def normalize_form_url(url: str) -> str:
+    """formResponse URL without query and fragment, used as the cache key."""
+    scheme, netloc, path, _, _ = urlsplit(url.strip())
+    return get_form_response_url(
+        urlunsplit((scheme.lower(), netloc.lower(), path, "", ""))
+    )
+
+
+async def fetch_form_data(url: str) -> list | None:
     """
     Fetch the raw_questions form data from a Google Form URL.
+    Parsed data is cached per form, stale entries are revalidated with a
+    conditional request so unchanged forms are not downloaded again.
 
     Returns:
         A Python list representing the internal Google Form data structure,
         or None if request fails or structure not found.
     """
-    url = get_form_response_url(url)
+    url = normalize_form_url(url)
+    cached: CachedFormData | None = form_data_cache.get(url)
+    if cached and cached.fresh_until > time.monotonic():
+        return cached.data
+
+    headers = {}
+    if cached and cached.etag:
+        headers["If-None-Match"] = cached.etag
+    if cached and cached.last_modified:
+        headers["If-Modified-Since"] = cached.last_modified
+
     try:
-        response = requests.get(url, timeout=10)
-    except requests.RequestException as e:
+        async with http_client.session.get(
+            url,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=GOOGLE_FORM_FETCH_TIMEOUT),
+        ) as response:
+            if response.status == 304 and cached:
+                cached.fresh_until = time.monotonic() + GOOGLE_FORM_CACHE_FRESH_FOR
+                form_data_cache.set(url, cached)
+                return cached.data
+
+            if response.status != 200:
+                logger.error(
+                    "HTTP %s: Cannot fetch form data.",
+                    response.status,
+                )
+
+                return None
+
+            html = await response.text()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error(
             "Failed to fetch form: %s",
             str(e),
@@ -60,19 +154,20 @@ def fetch_form_data(url: str) -> list | None:
 
         return None
 
-    if response.status_code != 200:
-        logger.error(
-            "HTTP %s: Cannot fetch form data.",
-            response.status_code,
-        )
-
-        return None
-
-    data = extract_script_variables(ALL_DATA_FIELDS, response.text)
+    data = extract_script_variables(ALL_DATA_FIELDS, html)
     if not data:
         logger.error("Cannot extract FB_PUBLIC_LOAD_DATA_. Possibly login required")
         return None
 
+    form_data_cache.set(
+        url,
+        CachedFormData(
+            data=data,
+            fresh_until=time.monotonic() + GOOGLE_FORM_CACHE_FRESH_FOR,
+            etag=etag,
+            last_modified=last_modified,
+        ),
+    )
     return data
 
 
@@ -181,7 +276,7 @@ def fill_form_entries(entries, fill_algorithm):
 
 
 # ------ OUTPUT ------ #
-def parse_google_form(url: str, only_required: bool = False) -> list[dict]:
+async def parse_google_form(url: str, only_required: bool = False) -> list[dict]:
     """
     Controller-level function that returns already parsed Google Form fields.
     Combines both fetching (HTML → JSON) and parsing (JSON → structured fields).
@@ -210,7 +305,7 @@ def parse_google_form(url: str, only_required: bool = False) -> list[dict]:
     """
 
     # Step 1: Fetch raw_questions form data from the given URL
-    form_data = fetch_form_data(url)
+    form_data = await fetch_form_data(url)
     if not form_data:
         raise ValueError(
             "Failed to fetch or parse Google Form data. Check URL or form access settings."
@@ -223,7 +318,7 @@ def parse_google_form(url: str, only_required: bool = False) -> list[dict]:
     return entries
 
 
-def get_form_submit_request(
+async def get_form_submit_request(
     url: str,
     output="console",
     only_required=False,
@@ -231,7 +326,7 @@ def get_form_submit_request(
     fill_algorithm=None,
 ):
     """Get form request body data"""
-    entries = parse_google_form(url=url, only_required=only_required)
+    entries = await parse_google_form(url=url, only_required=only_required)
 
     if fill_algorithm:
         entries = fill_form_entries(entries, fill_algorithm)
@@ -309,7 +404,13 @@ def main():
         output = "console"
 
     # Call your main function
-    get_form_submit_request(url, output, only_required, add_comments)
+    async def run():
+        try:
+            await get_form_submit_request(url, output, only_required, add_comments)
+        finally:
+            await http_client.close()
+
+    asyncio.run(run())
 
 
 if __name__ == "__main__":
@@ -23,3 +23,22 @@ class LLMQuestionOut(BaseModel):
 
 class LLMQuestionsListOut(BaseModel):
     questions: List[LLMQuestionOut]
+
+
+class LLMResponse(BaseModel):
+    content: str
+    model: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class LLMUsage(BaseModel):
+    """Token usage and timings of the LLM part of one test run, times in seconds."""
+
+    model: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    attempts: int = 0
+    retrieval_time: float = 0
+    generation_time: float = 0
+    answering_time: float = 0
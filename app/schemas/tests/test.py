@@ -58,6 +58,10 @@ class Answer(BaseModel):
 class TestSubmitPayload(BaseModel):
     quantity: Optional[int] = 1
     answers: list[Answer]
+    # Solve LLM questions independently for every copy instead of once per batch
+    diverse_llm_answers: bool = False
+    # Set to False to skip the LLM answer cache and always ask the model
+    use_llm_cache: bool = True
 
 
 class TestGetResponse(BaseModel):
@@ -102,10 +106,28 @@ class RunsOfTest(BaseModel):
     job_id: str
     submitted_date: datetime.datetime
     llm_model: Optional[str] = None
+    llm_prompt_tokens: Optional[int] = None
+    llm_completion_tokens: Optional[int] = None
+    llm_attempts: Optional[int] = None
+    llm_answering_time: Optional[float] = None
+
+
+class TestRunsLLMUsage(BaseModel):
+    """LLM usage of all runs of a test, llm_runs counts the runs that called the LLM."""
+
+    runs: int
+    llm_runs: int
+    prompt_tokens: int
+    completion_tokens: int
+    avg_attempts: Optional[float] = None
+    avg_retrieval_time: Optional[float] = None
+    avg_generation_time: Optional[float] = None
+    avg_answering_time: Optional[float] = None
 
 
 class RunsOfTestResponse(BaseModel):
     test_runs: list[RunsOfTest]
+    llm_usage: Optional[TestRunsLLMUsage] = None
 
 
 class UserTestItem(BaseModel):
@@ -0,0 +1,51 @@
+import logging
+
+import aiohttp
+
+from app.settings import (
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPClient:
+    """
+    Process wide aiohttp session, so form submissions reuse pooled keep-alive
+    connections and cached DNS lookups instead of a new TLS handshake per request.
+    Opened lazily inside the running event loop, closed on application shutdown.
+    """
+
+    def __init__(self):
+        self._session: aiohttp.ClientSession | None = None
+
+    def start(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=HTTP_POOL_LIMIT,
+                    limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+                    keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+                    ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                ),
+                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+            )
+            logger.info("HTTP client session opened")
+        return self._session
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        return self.start()
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("HTTP client session closed")
+        self._session = None
+
+
+http_client = HTTPClient()
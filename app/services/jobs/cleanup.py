@@ -0,0 +1,30 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from app.settings import JOB_CLEANUP_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodic_cleanup(
+    cleanups: dict[str, Callable[[], Awaitable[int]]],
+    interval: int = JOB_CLEANUP_INTERVAL,
+):
+    """
+    Periodically drop expired rows (jobs, cached LLM answers) and orphaned chunk
+    embeddings, runs for the whole application lifetime. Every cleanup returns how
+    many entries it removed.
+    """
+    while True:
+        for name, cleanup in cleanups.items():
+            try:
+                removed = await cleanup()
+                if removed:
+                    logger.info(
+                        "Expired entries removed",
+                        extra={"cleanup": name, "removed": removed},
+                    )
+            except Exception as e:
+                logger.error("Cleanup failed", extra={"cleanup": name, "error": str(e)})
+        await asyncio.sleep(interval)
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from app.database.postgres_config import connect_raw_postgres
+from app.settings import JOB_EVENTS_CHANNEL, JOB_EVENTS_RECONNECT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class JobEventBroker:
+    """
+    In-process pub/sub of job progress notifications.
+    Subscribers only get woken up and re-read the job from the JobStore. Updates
+    made in other processes (the job worker) reach the broker through
+    relay_job_notifications, which listens to the NOTIFY sent by PostgresJobStore.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+
+    def publish(self, job_id: str, event: dict | None = None) -> None:
+        for queue in self._subscribers.get(job_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Subscriber already has pending wake ups, it will read the latest state
+                pass
+
+    @asynccontextmanager
+    async def subscribe(self, job_id: str) -> AsyncIterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers[job_id].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[job_id].discard(queue)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+
+job_events = JobEventBroker()
+
+
+async def relay_job_notifications(
+    broker: JobEventBroker = job_events,
+    reconnect_interval: float = JOB_EVENTS_RECONNECT_INTERVAL,
+):
+    """
+    LISTEN on the job events channel and publish every notified job id to the local
+    broker, runs for the whole application lifetime. A dedicated connection is used
+    because listeners must not leak into the pooled ones.
+    """
+
+    def on_notification(_connection, _pid, _channel, job_id: str) -> None:
+        broker.publish(job_id)
+
+    while True:
+        connection = None
+        try:
+            connection = await connect_raw_postgres()
+            await connection.add_listener(JOB_EVENTS_CHANNEL, on_notification)
+            logger.info(
+                "Listening for job events", extra={"channel": JOB_EVENTS_CHANNEL}
+            )
+            while not connection.is_closed():
+                await asyncio.sleep(reconnect_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Job events listener failed", extra={"error": str(e)})
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        await asyncio.sleep(reconnect_interval)
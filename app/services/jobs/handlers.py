@@ -0,0 +1,47 @@
+import logging
+import os
+
+from app.database.models.orm.queued_task import QueuedTask
+from app.database.postgres_config import async_postgres_session
+from app.schemas.tests.test import TestSubmitPayload
+from app.services.jobs.store import job_store
+from app.services.tests.documents import delete_document, process_document_job
+from app.services.tests.tests import run_background_tests
+from app.services.users import get_user_by_id
+from app.utils.enums import JobKind
+
+logger = logging.getLogger(__name__)
+
+
+async def handle_test_run_task(task: QueuedTask) -> None:
+    async with async_postgres_session() as session:
+        current_user = await get_user_by_id(task.payload["user_id"], session)
+
+    await run_background_tests(
+        job_id=task.job_id,
+        test_id=task.payload["test_id"],
+        payload=TestSubmitPayload(**task.payload["payload"]),
+        current_user=current_user,
+    )
+
+
+async def handle_document_upload_task(task: QueuedTask) -> None:
+    document_path = task.payload["document_path"]
+    try:
+        await process_document_job(job_id=task.job_id, **task.payload)
+    except Exception:
+        # Keep the spooled file and saved batches while the task can still be retried
+        if task.attempts >= task.max_attempts:
+            if os.path.exists(document_path):
+                os.remove(document_path)
+            job = await job_store.get(task.job_id) or {}
+            if job.get("document_id"):
+                await delete_document(job["document_id"])
+        raise
+    os.remove(document_path)
+
+
+TASK_HANDLERS = {
+    JobKind.TEST_RUN: handle_test_run_task,
+    JobKind.DOCUMENT_UPLOAD: handle_document_upload_task,
+}
@@ -0,0 +1,61 @@
+import asyncio
+import json
+from typing import AsyncIterator
+
+from app.services.jobs.events import job_events
+from app.services.jobs.store import job_store
+from app.settings import JOB_STREAM_POLL_INTERVAL
+from app.utils.enums import JobStatus
+
+FINAL_JOB_STATUSES = {JobStatus.COMPLETED, JobStatus.FAILED}
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def wait_for_notification(notifications: asyncio.Queue, timeout: float) -> None:
+    """Wait for a wake up from the broker, the timeout covers missed notifications."""
+    try:
+        await asyncio.wait_for(notifications.get(), timeout=timeout)
+    except asyncio.TimeoutError:
+        return
+    while not notifications.empty():
+        notifications.get_nowait()
+
+
+async def stream_job_progress(
+    job_id: str, poll_interval: float = JOB_STREAM_POLL_INTERVAL
+) -> AsyncIterator[str]:
+    """
+    Yield Server-Sent Events for a job until it reaches a final status.
+    "progress" carries the job counters, "result" every new per-run result once.
+    """
+    sent_results = 0
+    last_progress = None
+
+    async with job_events.subscribe(job_id) as notifications:
+        while True:
+            job = await job_store.get(job_id)
+            if job is None:
+                yield format_sse("error", {"job_id": job_id, "error": "Job expired"})
+                return
+
+            results = job.get("results") or []
+            for result in results[sent_results:]:
+                yield format_sse("result", result)
+            sent_results = len(results)
+
+            # Sent after the results, so the last event of a stream is the final status
+            progress = {
+                "job_id": job_id,
+                **{k: v for k, v in job.items() if k not in ("kind", "results")},
+            }
+            if progress != last_progress:
+                yield format_sse("progress", progress)
+                last_progress = progress
+
+            if job["status"] in FINAL_JOB_STATUSES:
+                return
+
+            await wait_for_notification(notifications, timeout=poll_interval)
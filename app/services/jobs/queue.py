@@ -0,0 +1,144 @@
+import logging
+from datetime import datetime, timedelta, UTC
+
+from sqlalchemy import and_, or_, select, update
+
+from app.database.models.orm.queued_task import QueuedTask
+from app.database.postgres_config import async_postgres_session
+from app.settings import JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF, JOB_LOCK_TIMEOUT
+from app.utils.enums import JobStatus
+
+logger = logging.getLogger(__name__)
+
+
+async def enqueue_task(
+    job_id: str, kind: str, payload: dict, max_attempts: int = JOB_MAX_ATTEMPTS
+) -> None:
+    async with async_postgres_session() as session:
+        session.add(
+            QueuedTask(
+                job_id=job_id,
+                kind=kind,
+                payload=payload,
+                status=JobStatus.PENDING,
+                attempts=0,
+                max_attempts=max_attempts,
+            )
+        )
+        await session.commit()
+    logger.info("Task enqueued", extra={"job_id": job_id, "kind": kind})
+
+
+def is_abandoned(now: datetime):
+    return and_(
+        QueuedTask.status == JobStatus.PROCESSING,
+        QueuedTask.locked_at < now - timedelta(seconds=JOB_LOCK_TIMEOUT),
+    )
+
+
+async def claim_next_task(worker_id: str) -> QueuedTask | None:
+    """
+    Lock the oldest runnable task for this worker.
+    SKIP LOCKED lets many workers poll the same table without blocking each other,
+    tasks abandoned by a crashed worker (no heartbeat for JOB_LOCK_TIMEOUT) become
+    runnable again while they have attempts left.
+    """
+    now = datetime.now(UTC)
+    async with async_postgres_session() as session:
+        result = await session.execute(
+            select(QueuedTask)
+            .where(
+                or_(
+                    and_(
+                        QueuedTask.status == JobStatus.PENDING,
+                        QueuedTask.run_after <= now,
+                    ),
+                    and_(
+                        is_abandoned(now),
+                        QueuedTask.attempts < QueuedTask.max_attempts,
+                    ),
+                )
+            )
+            .order_by(QueuedTask.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        task = result.scalar_one_or_none()
+        if task is None:
+            return None
+
+        task.status = JobStatus.PROCESSING
+        task.attempts += 1
+        task.locked_at = now
+        task.locked_by = worker_id
+        await session.commit()
+        return task
+
+
+async def heartbeat_task(task_id: int, worker_id: str) -> bool:
+    """Refresh the lock of a running task, returns False when the lock was lost."""
+    async with async_postgres_session() as session:
+        result = await session.execute(
+            update(QueuedTask)
+            .where(
+                QueuedTask.id == task_id,
+                QueuedTask.locked_by == worker_id,
+                QueuedTask.status == JobStatus.PROCESSING,
+            )
+            .values(locked_at=datetime.now(UTC))
+        )
+        await session.commit()
+        return result.rowcount == 1
+
+
+async def fail_abandoned_tasks() -> list[str]:
+    """Give up on abandoned tasks without attempts left, returns their job ids."""
+    async with async_postgres_session() as session:
+        result = await session.execute(
+            update(QueuedTask)
+            .where(
+                is_abandoned(datetime.now(UTC)),
+                QueuedTask.attempts >= QueuedTask.max_attempts,
+            )
+            .values(
+                status=JobStatus.FAILED,
+                locked_at=None,
+                last_error="Worker stopped responding",
+            )
+            .returning(QueuedTask.job_id)
+        )
+        job_ids = list(result.scalars().all())
+        await session.commit()
+    if job_ids:
+        logger.warning("Abandoned tasks failed", extra={"job_ids": job_ids})
+    return job_ids
+
+
+async def complete_task(task_id: int) -> None:
+    async with async_postgres_session() as session:
+        task = await session.get(QueuedTask, task_id)
+        task.status = JobStatus.COMPLETED
+        task.locked_at = None
+        await session.commit()
+
+
+def get_retry_delay(attempts: int) -> float:
+    return JOB_RETRY_BACKOFF * 2 ** (attempts - 1)
+
+
+async def fail_task(task_id: int, error: str) -> bool:
+    """Schedule a retry with exponential backoff, returns False when out of attempts."""
+    async with async_postgres_session() as session:
+        task = await session.get(QueuedTask, task_id)
+        task.last_error = error
+        task.locked_at = None
+        will_retry = task.attempts < task.max_attempts
+        if will_retry:
+            task.status = JobStatus.PENDING
+            task.run_after = datetime.now(UTC) + timedelta(
+                seconds=get_retry_delay(task.attempts)
+            )
+        else:
+            task.status = JobStatus.FAILED
+        await session.commit()
+        return will_retry
@@ -0,0 +1,205 @@
+import copy
+import json
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, UTC
+
+from sqlalchemy import delete, select, text
+
+from app.database.models.orm.job import Job
+from app.database.postgres_config import async_postgres_session
+from app.services.jobs.events import job_events
+from app.settings import (
+    JOB_STORE_BACKEND,
+    JOB_TTL,
+    JOB_EVENTS_CHANNEL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore(ABC):
+    """Storage of background job progress shared by the API and the job runners."""
+
+    def __init__(self, ttl: int = JOB_TTL):
+        self.ttl = ttl
+
+    def _expires_at(self) -> datetime:
+        return datetime.now(UTC) + timedelta(seconds=self.ttl)
+
+    @abstractmethod
+    async def create(self, job_id: str, kind: str, data: dict) -> None:
+        """Register a new job with its initial progress data."""
+
+    @abstractmethod
+    async def get(self, job_id: str) -> dict | None:
+        """Return the job data, or None when the job is unknown or expired."""
+
+    async def update(self, job_id: str, **fields) -> None:
+        """Overwrite top level fields of the job data."""
+        await self._update(job_id, **fields)
+        self._publish(job_id)
+
+    async def increment(self, job_id: str, field: str, amount: int = 1) -> None:
+        """Atomically add amount to a numeric field of the job data."""
+        await self._increment(job_id, field, amount)
+        self._publish(job_id)
+
+    async def append_result(self, job_id: str, result: dict) -> None:
+        """Atomically append an item to the results list of the job data."""
+        await self._append_result(job_id, result)
+        self._publish(job_id)
+
+    def _publish(self, job_id: str) -> None:
+        """Wake up the progress streams of the job."""
+        job_events.publish(job_id)
+
+    @abstractmethod
+    async def _update(self, job_id: str, **fields) -> None: ...
+
+    @abstractmethod
+    async def _increment(self, job_id: str, field: str, amount: int) -> None: ...
+
+    @abstractmethod
+    async def _append_result(self, job_id: str, result: dict) -> None: ...
+
+    @abstractmethod
+    async def cleanup_expired(self) -> int:
+        """Remove expired jobs and return how many were removed."""
+
+
+class InMemoryJobStore(JobStore):
+    """Process local store, jobs are not visible to other workers."""
+
+    def __init__(self, ttl: int = JOB_TTL):
+        super().__init__(ttl)
+        self._jobs: dict[str, tuple[datetime, dict]] = {}
+
+    async def create(self, job_id: str, kind: str, data: dict) -> None:
+        self._jobs[job_id] = (self._expires_at(), {"kind": kind, **data})
+
+    def _get_data(self, job_id: str) -> dict | None:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        expires_at, data = job
+        if expires_at < datetime.now(UTC):
+            del self._jobs[job_id]
+            return None
+        return data
+
+    async def get(self, job_id: str) -> dict | None:
+        data = self._get_data(job_id)
+        return copy.deepcopy(data) if data is not None else None
+
+    async def _update(self, job_id: str, **fields) -> None:
+        data = self._get_data(job_id)
+        if data is not None:
+            data.update(fields)
+
+    async def _increment(self, job_id: str, field: str, amount: int) -> None:
+        data = self._get_data(job_id)
+        if data is not None:
+            data[field] = data.get(field, 0) + amount
+
+    async def _append_result(self, job_id: str, result: dict) -> None:
+        data = self._get_data(job_id)
+        if data is not None:
+            data.setdefault("results", []).append(result)
+
+    async def cleanup_expired(self) -> int:
+        now = datetime.now(UTC)
+        expired = [
+            job_id for job_id, (expires_at, _) in self._jobs.items() if expires_at < now
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+
+class PostgresJobStore(JobStore):
+    """
+    Jobs table backed store, every update is a single atomic statement.
+    Updates NOTIFY the job events channel in the same transaction, so progress
+    streams of every API process are woken up once the change is visible.
+    """
+
+    async def create(self, job_id: str, kind: str, data: dict) -> None:
+        async with async_postgres_session() as session:
+            session.add(
+                Job(
+                    id=job_id,
+                    kind=kind,
+                    data=json.loads(json.dumps({"kind": kind, **data})),
+                    expires_at=self._expires_at(),
+                )
+            )
+            await session.commit()
+
+    async def get(self, job_id: str) -> dict | None:
+        async with async_postgres_session() as session:
+            result = await session.execute(
+                select(Job.data).where(
+                    Job.id == job_id, Job.expires_at > datetime.now(UTC)
+                )
+            )
+            return result.scalar_one_or_none()
+
+    async def _update(self, job_id: str, **fields) -> None:
+        await self._run(
+            "UPDATE jobs SET data = data || CAST(:fields AS jsonb), updated_at = now() "
+            "WHERE id = :job_id",
+            job_id=job_id,
+            fields=json.dumps(fields),
+        )
+
+    async def _increment(self, job_id: str, field: str, amount: int) -> None:
+        await self._run(
+            "UPDATE jobs SET data = jsonb_set(data, ARRAY[CAST(:field AS text)], "
+            "to_jsonb(COALESCE((data ->> CAST(:field AS text))::int, 0) "
+            "+ CAST(:amount AS integer))), "
+            "updated_at = now() WHERE id = :job_id",
+            job_id=job_id,
+            field=field,
+            amount=amount,
+        )
+
+    async def _append_result(self, job_id: str, result: dict) -> None:
+        await self._run(
+            "UPDATE jobs SET data = jsonb_set(data, '{results}', "
+            "COALESCE(data -> 'results', '[]'::jsonb) "
+            "|| jsonb_build_array(CAST(:result AS jsonb))), "
+            "updated_at = now() WHERE id = :job_id",
+            job_id=job_id,
+            result=json.dumps(result),
+        )
+
+    async def cleanup_expired(self) -> int:
+        async with async_postgres_session() as session:
+            result = await session.execute(
+                delete(Job).where(Job.expires_at < datetime.now(UTC))
+            )
+            await session.commit()
+            return result.rowcount
+
+    def _publish(self, job_id: str) -> None:
+        """Already published by the NOTIFY sent together with the update."""
+
+    @staticmethod
+    async def _run(statement: str, **params) -> None:
+        async with async_postgres_session() as session:
+            await session.execute(text(statement), params)
+            await session.execute(
+                text("SELECT pg_notify(:channel, :job_id)"),
+                {"channel": JOB_EVENTS_CHANNEL, "job_id": params["job_id"]},
+            )
+            await session.commit()
+
+
+def build_job_store() -> JobStore:
+    if JOB_STORE_BACKEND == "memory":
+        return InMemoryJobStore()
+    return PostgresJobStore()
+
+
+job_store = build_job_store()
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import logging
+from array import array
+from datetime import datetime, timedelta, UTC
+from typing import Any
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database.models.orm.llm_answer_cache import LLMAnswerCacheEntry
+from app.database.models.orm.query_embedding_cache import QueryEmbeddingCacheEntry
+from app.database.postgres_config import async_postgres_session
+from app.schemas.llm import LLMQuestionsListIn, LLMQuestionsListOut
+from app.services.llm.llm_config import (
+    LLM_PROMPT_VERSION,
+    embeddings_provider,
+    llm_model_name,
+)
+from app.settings import (
+    EMBEDDING_DIM,
+    LLM_ANSWER_CACHE_MAX_SIZE,
+    LLM_ANSWER_CACHE_TTL,
+    QUERY_EMBEDDING_CACHE_MAX_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL,
+)
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def hash_payload(payload: Any) -> str:
+    """Stable sha256 of a JSON-serializable payload."""
+    canonical = json.dumps(
+        payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMAnswerCache:
+    """
+    Two tier cache of validated solver answers.
+    First tier is an in-process TTL LRU, second tier is the llm_answer_cache table,
+    so identical forms are answered without Gemini across runs, users and workers.
+    The table is accessed with its own sessions, so cache failures never roll back
+    the caller's session.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.ttl = ttl
+        self.memory = TTLCache(max_size=max_size, ttl=ttl)
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+
+    @staticmethod
+    def build_key(questions: LLMQuestionsListIn, context_chunks: list[str]) -> str:
+        return hash_payload(
+            {
+                "questions": questions.model_dump(mode="json"),
+                "context_chunks": context_chunks,
+                "model": llm_model_name,
+                "prompt_version": LLM_PROMPT_VERSION,
+            }
+        )
+
+    async def get(self, key: str) -> LLMQuestionsListOut | None:
+        answers = self.memory.get(key)
+        if answers is not None:
+            self.stats["memory_hits"] += 1
+            return answers
+
+        try:
+            async with async_postgres_session() as db_session:
+                result = await db_session.execute(
+                    select(LLMAnswerCacheEntry.answers).where(
+                        LLMAnswerCacheEntry.cache_key == key,
+                        LLMAnswerCacheEntry.expires_at > datetime.now(UTC),
+                    )
+                )
+                answers = result.scalar_one_or_none()
+        except Exception as e:
+            logger.warning("LLM answer cache lookup failed", extra={"error": str(e)})
+            answers = None
+
+        if answers is None:
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["db_hits"] += 1
+        self.memory.set(key, answers)
+        return answers
+
+    async def set(self, key: str, answers: LLMQuestionsListOut) -> None:
+        self.memory.set(key, answers)
+        expires_at = datetime.now(UTC) + timedelta(seconds=self.ttl)
+        query = insert(LLMAnswerCacheEntry).values(
+            cache_key=key,
+            llm_model=llm_model_name,
+            answers=answers,
+            expires_at=expires_at,
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[LLMAnswerCacheEntry.cache_key],
+            set_={"answers": query.excluded.answers, "expires_at": expires_at},
+        )
+        try:
+            async with async_postgres_session() as db_session:
+                await db_session.execute(query)
+                await db_session.commit()
+        except Exception as e:
+            logger.warning("LLM answer cache store failed", extra={"error": str(e)})
+
+    async def cleanup_expired(self) -> int:
+        """Remove expired entries from the table and return how many were removed."""
+        async with async_postgres_session() as db_session:
+            result = await db_session.execute(
+                delete(LLMAnswerCacheEntry).where(
+                    LLMAnswerCacheEntry.expires_at < datetime.now(UTC)
+                )
+            )
+            await db_session.commit()
+            return result.rowcount
+
+
+llm_answer_cache = LLMAnswerCache(
+    max_size=LLM_ANSWER_CACHE_MAX_SIZE, ttl=LLM_ANSWER_CACHE_TTL
+)
+
+
+class QueryEmbeddingCache:
+    """
+    Two tier cache of question embeddings used for retrieval.
+    First tier is an in-process TTL LRU, second tier is the query_embedding_cache
+    table shared by every API process and worker, so repeated runs of a test embed
+    their questions once.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.ttl = ttl
+        self.memory = TTLCache(max_size=max_size, ttl=ttl)
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+
+    @staticmethod
+    def build_key(query: str) -> str:
+        return hash_payload(
+            {
+                "query": query,
+                "model": embeddings_provider.model,
+                "dimensions": EMBEDDING_DIM,
+            }
+        )
+
+    async def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        """Cached embeddings of the given keys, missing keys are left out."""
+        found = {}
+        for key in keys:
+            embedding = self.memory.get(key)
+            if embedding is not None:
+                found[key] = embedding.tolist()
+        self.stats["memory_hits"] += len(found)
+
+        missing_keys = [key for key in keys if key not in found]
+        if not missing_keys:
+            return found
+        try:
+            async with async_postgres_session() as db_session:
+                result = await db_session.execute(
+                    select(
+                        QueryEmbeddingCacheEntry.cache_key,
+                        QueryEmbeddingCacheEntry.embedding,
+                    ).where(
+                        QueryEmbeddingCacheEntry.cache_key.in_(missing_keys),
+                        QueryEmbeddingCacheEntry.expires_at > datetime.now(UTC),
+                    )
+                )
+                rows = result.all()
+        except Exception as e:
+            logger.warning(
+                "Query embedding cache lookup failed", extra={"error": str(e)}
+            )
+            rows = []
+
+        for key, embedding in rows:
+            found[key] = embedding.to_list()
+            self.memory.set(key, array("f", found[key]))
+        self.stats["db_hits"] += len(rows)
+        self.stats["misses"] += len(missing_keys) - len(rows)
+        return found
+
+    async def set_many(self, embeddings: dict[str, list[float]]) -> None:
+        for key, embedding in embeddings.items():
+            self.memory.set(key, array("f", embedding))
+        expires_at = datetime.now(UTC) + timedelta(seconds=self.ttl)
+        query = insert(QueryEmbeddingCacheEntry).values(
+            [
+                {
+                    "cache_key": key,
+                    "embeddings_model": embeddings_provider.model,
+                    "embedding": embedding,
+                    "expires_at": expires_at,
+                }
+                for key, embedding in embeddings.items()
+            ]
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[QueryEmbeddingCacheEntry.cache_key],
+            set_={"expires_at": expires_at},
+        )
+        try:
+            async with async_postgres_session() as db_session:
+                await db_session.execute(query)
+                await db_session.commit()
+        except Exception as e:
+            logger.warning(
+                "Query embedding cache store failed", extra={"error": str(e)}
+            )
+
+    async def cleanup_expired(self) -> int:
+        """Remove expired entries from the table and return how many were removed."""
+        async with async_postgres_session() as db_session:
+            result = await db_session.execute(
+                delete(QueryEmbeddingCacheEntry).where(
+                    QueryEmbeddingCacheEntry.expires_at < datetime.now(UTC)
+                )
+            )
+            await db_session.commit()
+            return result.rowcount
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    max_size=QUERY_EMBEDDING_CACHE_MAX_SIZE, ttl=QUERY_EMBEDDING_CACHE_TTL
+)
@@ -1,38 +1,86 @@
 import asyncio
+import hashlib
 import logging
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sqlalchemy import select
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.database.models.orm.chunk_embedding import ChunkEmbedding
 from app.database.models.orm.document import Document
 from app.database.models.orm.document_embedding import DocumentEmbedding
-from app.services.llm.llm_config import embeddings_model
-from app.settings import CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_DIM
+from app.services.jobs.store import job_store
+from app.services.llm.cache import query_embedding_cache
+from app.services.llm.llm_config import embeddings_provider
+from app.settings import (
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    EMBEDDING_DIM,
+    EMBEDDING_MAX_ATTEMPTS,
+    EMBEDDING_RETRY_BACKOFF,
+    VECTOR_SEARCH_MODE,
+    HNSW_EF_SEARCH,
+    RETRIEVAL_TOP_K_PER_QUESTION,
+    RETRIEVAL_MAX_CHUNKS,
+)
+from app.utils.enums import VectorSearchMode
 
 logger = logging.getLogger(__name__)
 
 
-async def get_document_chunks(text: str, storage: dict, job_id: str) -> list:
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        length_function=len,
-        is_separator_regex=False,
-    )
-    chunks = text_splitter.split_text(text)
-    storage[job_id]["total_chunks"] = len(chunks)
-    logger.info(
-        "Document was splited to chunks", extra={"job_id": job_id, "chunks": chunks}
-    )
-    return chunks
+class StreamingTextSplitter:
+    """
+    Splits a document arriving in parts (pages) without joining the whole text.
+    The last chunk of every part is carried over to the next one, so chunks do not
+    break at page boundaries.
+    """
+
+    def __init__(self):
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            length_function=len,
+            is_separator_regex=False,
+        )
+        self._carry = ""
+
+    def split(self, text: str) -> list[str]:
+        chunks = self.text_splitter.split_text(
+            f"{self._carry}\n{text}" if self._carry else text
+        )
+        if not chunks:
+            return []
+        self._carry = chunks[-1]
+        return chunks[:-1]
+
+    def flush(self) -> list[str]:
+        chunks = [self._carry] if self._carry else []
+        self._carry = ""
+        return chunks
+
+
+def get_chunk_content_hash(chunk: str) -> str:
+    """Key of the shared embedding, other models or dimensions get other keys."""
+    key = f"{embeddings_provider.model}:{EMBEDDING_DIM}:{chunk}"
+    return hashlib.sha256(key.encode()).hexdigest()
 
 
 async def generate_embeddings(chunks: list[str]) -> list[list[float]]:
-    loop = asyncio.get_event_loop()
-    embeddings = await loop.run_in_executor(
-        None,
-        lambda: embeddings_model.embed_documents(chunks, output_dimensionality=3072),
-    )
+    """Embed one batch of chunks, failed calls (mostly rate limits) are retried."""
+    for attempt in range(1, EMBEDDING_MAX_ATTEMPTS + 1):
+        try:
+            embeddings = await embeddings_provider.aembed(chunks, EMBEDDING_DIM)
+            break
+        except Exception as e:
+            if attempt == EMBEDDING_MAX_ATTEMPTS:
+                raise
+            delay = EMBEDDING_RETRY_BACKOFF * 2 ** (attempt - 1)
+            logger.warning(
+                "Embedding batch failed, retrying",
+                extra={"attempt": attempt, "delay_s": delay, "error": str(e)},
+            )
+            await asyncio.sleep(delay)
+
     if chunks:
         dim = len(embeddings[0])
         if dim != EMBEDDING_DIM:
@@ -45,23 +93,165 @@ async def generate_embeddings(chunks: list[str]) -> list[list[float]]:
     return embeddings
 
 
+async def embed_queries(queries: list[str]) -> list[list[float]]:
+    """Embeddings of search queries, only uncached queries reach the API."""
+    keys = [query_embedding_cache.build_key(query) for query in queries]
+    embeddings = await query_embedding_cache.get_many(keys)
+    # Keyed by cache key, so repeated queries are embedded once
+    missing_queries = {
+        key: query for key, query in zip(keys, queries) if key not in embeddings
+    }
+    if missing_queries:
+        new_embeddings = await embeddings_provider.aembed(
+            list(missing_queries.values()), EMBEDDING_DIM, task_type="RETRIEVAL_QUERY"
+        )
+        new_embeddings = dict(zip(missing_queries, new_embeddings))
+        await query_embedding_cache.set_many(new_embeddings)
+        embeddings.update(new_embeddings)
+    logger.info(
+        "Embedded queries",
+        extra={"queries": len(queries), "embedded": len(missing_queries)},
+    )
+    return [embeddings[key] for key in keys]
+
+
+async def set_vector_search_mode(
+    db_session: AsyncSession, search_mode: str, ef_search: int = HNSW_EF_SEARCH
+) -> None:
+    """
+    Configure the current transaction for HNSW search. The test filter is applied
+    after the index scan, so the scan keeps going until enough rows pass it instead
+    of stopping at ef_search candidates (relaxed order, results are re-sorted).
+    Exact search needs no settings, its queries sort by a non-indexable expression.
+    """
+    if search_mode == VectorSearchMode.EXACT:
+        return
+    await db_session.execute(
+        text(
+            "SELECT set_config('hnsw.ef_search', :ef_search, true), "
+            "set_config('hnsw.iterative_scan', 'relaxed_order', true)"
+        ),
+        {"ef_search": str(ef_search)},
+    )
+
+
+def distance_order(distance, search_mode: str):
+    """
+    Sort key of a nearest neighbour query. Adding zero hides the distance from the
+    HNSW index, so exact search sorts every candidate while the btree indexes on
+    test and document ids stay usable.
+    """
+    return distance + 0 if search_mode == VectorSearchMode.EXACT else distance
+
+
 async def retrieve_context_from_db(
-    db_session, question_text: str, test_id: int, top_k: int = 5
+    db_session,
+    question_text: str,
+    test_id: int,
+    top_k: int = 5,
+    search_mode: str = VECTOR_SEARCH_MODE,
 ):
-    query_embedding = embeddings_model.embed_query(question_text)
+    [query_embedding] = await embed_queries([question_text])
 
-    query = (
-        select(DocumentEmbedding)
+    distance = ChunkEmbedding.embedding.l2_distance(query_embedding)
+    nearest = (
+        select(DocumentEmbedding.chunk_text, distance.label("distance"))
+        .join(ChunkEmbedding, ChunkEmbedding.id == DocumentEmbedding.embedding_id)
         .join(Document, Document.id == DocumentEmbedding.document_id)
         .where(Document.test_id == test_id)
-        .order_by(DocumentEmbedding.embedding.l2_distance(query_embedding))
+        .order_by(distance_order(distance, search_mode))
         .limit(top_k)
+        .cte("nearest")
+        .prefix_with("MATERIALIZED")
     )
+    query = select(nearest.c.chunk_text).order_by(nearest.c.distance)
 
+    await set_vector_search_mode(db_session, search_mode)
     results = await db_session.execute(query)
     chunks = results.scalars().all()
 
     if not chunks:
         return None
 
-    return [c.chunk_text for c in chunks]
+    return list(chunks)
+
+
+# One LATERAL top-k search per question embedding, the HNSW index serves each one.
+# The outer ORDER BY re-sorts the relaxed order of the iterative index scan.
+PER_QUESTION_SEARCH_SQL = f"""
+SELECT questions.question_index, chunks.chunk_text, chunks.distance
+FROM (
+    SELECT CAST(embedding AS halfvec({EMBEDDING_DIM})) AS embedding, question_index
+    FROM unnest(CAST(:embeddings AS text[]))
+        WITH ORDINALITY AS query(embedding, question_index)
+) AS questions
+CROSS JOIN LATERAL (
+    SELECT document_embeddings.chunk_text,
+        chunk_embeddings.embedding <-> questions.embedding AS distance
+    FROM document_embeddings
+    JOIN chunk_embeddings ON chunk_embeddings.id = document_embeddings.embedding_id
+    JOIN documents ON documents.id = document_embeddings.document_id
+    WHERE documents.test_id = :test_id
+    ORDER BY {{order_by}}
+    LIMIT :top_k
+) AS chunks
+ORDER BY chunks.distance
+"""
+PER_QUESTION_SEARCH_SQL_BY_MODE = {
+    VectorSearchMode.APPROXIMATE: PER_QUESTION_SEARCH_SQL.format(
+        order_by="chunk_embeddings.embedding <-> questions.embedding"
+    ),
+    VectorSearchMode.EXACT: PER_QUESTION_SEARCH_SQL.format(
+        order_by="(chunk_embeddings.embedding <-> questions.embedding) + 0"
+    ),
+}
+
+
+async def retrieve_context_for_questions(
+    db_session: AsyncSession,
+    questions: list[str],
+    test_id: int,
+    top_k: int = RETRIEVAL_TOP_K_PER_QUESTION,
+    search_mode: str = VECTOR_SEARCH_MODE,
+) -> dict[int, list[tuple[str, float]]]:
+    """
+    Top chunks of every question instead of one search for the whole form.
+    Uncached questions are embedded in one API call and searched in one query.
+    Returns (chunk text, distance) pairs keyed by the position of the question,
+    the closest first.
+    """
+    query_embeddings = await embed_queries(questions)
+
+    await set_vector_search_mode(db_session, search_mode)
+    results = await db_session.execute(
+        text(PER_QUESTION_SEARCH_SQL_BY_MODE[VectorSearchMode(search_mode)]),
+        {
+            "embeddings": [str(embedding) for embedding in query_embeddings],
+            "test_id": test_id,
+            "top_k": top_k,
+        },
+    )
+    rows = results.all()
+
+    chunks_by_question = {}
+    for row in rows:
+        # ORDINALITY counts from one
+        chunks_by_question.setdefault(row.question_index - 1, []).append(
+            (row.chunk_text, row.distance)
+        )
+    logger.info(
+        "Retrieved context per question",
+        extra={"questions": len(questions), "rows": len(rows)},
+    )
+    return chunks_by_question
+
+
+def merge_question_chunks(
+    chunks: list[tuple[str, float]], max_chunks: int = RETRIEVAL_MAX_CHUNKS
+) -> list[str]:
+    """
+    Context of a group of questions, chunks found by several questions are kept
+    once, the closest first.
+    """
+    ordered = sorted(chunks, key=lambda chunk: chunk[1])
+    return list(dict.fromkeys(chunk_text for chunk_text, _ in ordered))[:max_chunks]
@@ -1,9 +1,32 @@
+import asyncio
+import json
 from dataclasses import dataclass
 from typing import Optional
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from pydantic import BaseModel
-from app.schemas.llm import LLMQuestionsListOut, LLMQuestionsListIn
+from app.schemas.llm import (
+    LLMQuestionIn,
+    LLMQuestionsListOut,
+    LLMQuestionsListIn,
+    LLMResponse,
+)
+from app.services.llm.providers import (
+    EmbeddingsProvider,
+    FakeEmbeddingsProvider,
+    FakeLLMProvider,
+    GeminiEmbeddingsProvider,
+    GeminiLLMProvider,
+    LLMProvider,
+)
+from app.settings import (
+    LLM_MAX_CONCURRENT_CALLS,
+    LLM_CONTEXT_TOKEN_BUDGET,
+    LLM_PROVIDER,
+    FAKE_LLM_LATENCY,
+    FAKE_EMBEDDING_LATENCY,
+    FAKE_LLM_ERROR_RATE,
+)
+from app.utils.enums import LLMProviderName
 
 load_dotenv()
 
@@ -18,19 +41,49 @@ class LLMGeminiSettings:
     embeddings_model: str = "gemini-embedding-001"
 
 
-class LLMClient:
-    def __init__(self):
-        self.model = ChatGoogleGenerativeAI(
-            model=LLMGeminiSettings.model,
-            temperature=LLMGeminiSettings.llm_temperature,
-            timeout=LLMGeminiSettings.llm_timeout,
-            max_retries=LLMGeminiSettings.max_retries,
+# Shared by every solver in the process so a large batch cannot flood the provider
+llm_calls_limiter = asyncio.Semaphore(LLM_MAX_CONCURRENT_CALLS)
+
+# Bump whenever the solver prompt changes so cached answers are not reused
+LLM_PROMPT_VERSION = "3"
+
+
+def build_llm_provider(name: str = LLM_PROVIDER) -> LLMProvider:
+    if name == LLMProviderName.FAKE:
+        return FakeLLMProvider(latency=FAKE_LLM_LATENCY, error_rate=FAKE_LLM_ERROR_RATE)
+    return GeminiLLMProvider(
+        model=LLMGeminiSettings.model,
+        temperature=LLMGeminiSettings.llm_temperature,
+        timeout=LLMGeminiSettings.llm_timeout,
+        max_retries=LLMGeminiSettings.max_retries,
+    )
+
+
+def build_embeddings_provider(name: str = LLM_PROVIDER) -> EmbeddingsProvider:
+    if name == LLMProviderName.FAKE:
+        return FakeEmbeddingsProvider(
+            latency=FAKE_EMBEDDING_LATENCY, error_rate=FAKE_LLM_ERROR_RATE
         )
+    return GeminiEmbeddingsProvider(model=LLMGeminiSettings.embeddings_model)
+
+
+# Part of the LLM answer cache keys, like the embeddings model of the embedding keys
+llm_model_name = (
+    FakeLLMProvider.model
+    if LLM_PROVIDER == LLMProviderName.FAKE
+    else LLMGeminiSettings.model
+)
 
-    def invoke_llm(self, prompt: str) -> str:
-        response = self.model.invoke(prompt)
-        result = response.content.strip()
-        return result
+
+class LLMClient:
+    def __init__(self, provider: LLMProvider | None = None):
+        self.provider = provider or build_llm_provider()
+
+    async def ainvoke_llm(
+        self, prompt: str, response_schema: dict | None = None
+    ) -> LLMResponse:
+        async with llm_calls_limiter:
+            return await self.provider.ainvoke(prompt, response_schema=response_schema)
 
 
 class LLMSolverState(BaseModel):
@@ -40,41 +93,95 @@ class LLMSolverState(BaseModel):
     attempts: int = 0
     error: Optional[str] = None
     context_chunks: list[str] = []
+    use_cache: bool = True
+    cache_key: Optional[str] = None
+    cache_hit: bool = False
 
     def increment_attempts(self):
         self.attempts += 1
 
+    def pending_questions(self) -> LLMQuestionsListIn:
+        """Questions without a valid answer yet."""
+        answered = (
+            {a.question_id for a in self.validated_answers.questions}
+            if self.validated_answers
+            else set()
+        )
+        return LLMQuestionsListIn(
+            questions=[q for q in self.questions.questions if q.id not in answered]
+        )
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, Gemini averages about 4 characters per token."""
+    return len(text) // 4 + 1
+
+
+def serialize_question(question: LLMQuestionIn) -> str:
+    """One line of terse JSON, type descriptions are given once in the legend."""
+    data = {"id": question.id, "q": question.question, "t": question.type.type_id}
+    if question.options:
+        data["o"] = question.options
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def select_context_chunks(
+    context_chunks: list[str], token_budget: int = LLM_CONTEXT_TOKEN_BUDGET
+) -> list[str]:
+    """Unique chunks in retrieval order that fit in the token budget."""
+    selected = []
+    used_tokens = 0
+    for chunk in dict.fromkeys(chunk.strip() for chunk in context_chunks):
+        chunk_tokens = estimate_tokens(chunk)
+        if not chunk or used_tokens + chunk_tokens > token_budget:
+            continue
+        selected.append(chunk)
+        used_tokens += chunk_tokens
+    return selected
+
 
 def build_test_solver_prompt(
-    questions: LLMQuestionsListIn, context_chunks: list[str]
+    questions: LLMQuestionsListIn,
+    context_chunks: list[str],
+    include_schema: bool = True,
 ) -> str:
-    return f"""
-            {LLM_SYSTEM_MESSAGE}
-            - Questions:
-            {questions.model_dump()}
-            {f'{LLM_CONTEXT} : {context_chunks}' if context_chunks else ''}
-            - Return ONLY a JSON array matching this Pydantic schema:
-            {LLMQuestionsListOut.model_json_schema()}
-            {LLM_SOLVER_RESPONSE_RULES}
-            """
-
-
-LLM_SYSTEM_MESSAGE = """
-You are the intelligent assistant of a Test Solving app.
-You are given a list of questions in JSON format below:"""
-
-LLM_SOLVER_RESPONSE_RULES = """
-  Rules:
+    """
+    Compact solver prompt: a legend of the question types in use, one JSON line
+    per question and the context trimmed to its token budget. The schema is left
+    out when the provider already enforces it.
+    """
+    types = {q.type.type_id: q.type.description for q in questions.questions}
+    sections = [
+        LLM_SYSTEM_MESSAGE,
+        "Types:\n" + "\n".join(f"{i}: {d}" for i, d in sorted(types.items())),
+        "Questions:\n" + "\n".join(map(serialize_question, questions.questions)),
+    ]
+    context_chunks = select_context_chunks(context_chunks)
+    if context_chunks:
+        sections.append(LLM_CONTEXT + "\n---\n".join(context_chunks))
+    if include_schema:
+        sections.append(LLM_ANSWER_SCHEMA)
+    sections.append(LLM_SOLVER_RESPONSE_RULES)
+    return "\n\n".join(sections)
+
+
+LLM_SYSTEM_MESSAGE = """You are the intelligent assistant of a Test Solving app.
+Questions are given one JSON object per line: id, q (question), t (type), \
+o (options)."""
+
+LLM_SOLVER_RESPONSE_RULES = """Rules:
 - First search in provided context
-- If options exist, choose one or many depending on type description
-- if there is option where you have to select multiple answers you should send "answer": ["option1", "option2"]]
+- If options exist, choose one or many depending on the type, copying them exactly
+- For multiple answers send "answer": ["option1", "option2"]
 - If not, generate a concise answer
-- ALLWAYS Do NOT add any explanations, Markdowns, //, or Python code"""
+- ALWAYS return only JSON, no explanations, Markdown or code"""
 
-LLM_CONTEXT = """
-   - This is additional context provided by user, please review it carefully: 
-"""
+LLM_CONTEXT = "Context provided by the user, review it carefully:\n"
 
-embeddings_model = GoogleGenerativeAIEmbeddings(
-    model=LLMGeminiSettings.embeddings_model
+# Built once, the schema does not change between calls
+LLM_ANSWER_SCHEMA = "Return ONLY JSON matching this schema:\n" + json.dumps(
+    LLMQuestionsListOut.model_json_schema(), separators=(",", ":")
 )
+
+# The model name is part of embedding cache keys, fake vectors never mix with real ones
+embeddings_provider = build_embeddings_provider()
@@ -1,123 +1,478 @@
 import asyncio
 import json
 import logging
+import re
+import time
+from datetime import datetime
 
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
 from langgraph.graph.state import CompiledStateGraph
 from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.services.llm.embeddings import retrieve_context_from_db
+from app.services.llm.cache import llm_answer_cache
+from app.services.llm.embeddings import (
+    merge_question_chunks,
+    retrieve_context_from_db,
+    retrieve_context_for_questions,
+)
 from app.services.llm.llm_config import (
     LLMClient,
     LLMSolverState,
     build_test_solver_prompt,
+    estimate_tokens,
+    serialize_question,
     LLMGeminiSettings,
 )
 from app.schemas.llm import (
+    LLMQuestionIn,
+    LLMQuestionOut,
     LLMQuestionsListIn,
     LLMQuestionsListOut,
+    LLMUsage,
+)
+from app.settings import (
+    RETRIEVAL_MODE,
+    LLM_GROUP_TOKEN_BUDGET,
+    LLM_GROUP_MAX_QUESTIONS,
+    LLM_STRUCTURED_OUTPUT,
 )
+from app.utils.enums import RetrievalMode
 
 logger = logging.getLogger(__name__)
 
 
+def split_questions(
+    questions: LLMQuestionsListIn,
+    token_budget: int = LLM_GROUP_TOKEN_BUDGET,
+    max_questions: int = LLM_GROUP_MAX_QUESTIONS,
+) -> list[LLMQuestionsListIn]:
+    """Split questions in form order into groups that fit the token budget."""
+    groups = []
+    group = []
+    group_tokens = 0
+    for question in questions.questions:
+        question_tokens = estimate_tokens(serialize_question(question))
+        if group and (
+            group_tokens + question_tokens > token_budget or len(group) >= max_questions
+        ):
+            groups.append(LLMQuestionsListIn(questions=group))
+            group = []
+            group_tokens = 0
+        group.append(question)
+        group_tokens += question_tokens
+    if group:
+        groups.append(LLMQuestionsListIn(questions=group))
+    return groups
+
+
+MARKDOWN_FENCE = re.compile(r"```[a-zA-Z]*")
+
+# Process-wide outcome of parsing model responses, "repaired" responses would have
+# cost a retry with strict parsing
+response_parse_stats = {"parsed": 0, "repaired": 0, "failed": 0}
+
+
+def parse_llm_json(raw: str) -> tuple[dict | list, bool]:
+    """
+    Parse the model response, tolerating markdown fences and prose around the JSON.
+    Returns the first JSON object or array and whether the response had to be
+    repaired, raises JSONDecodeError when there is none.
+    """
+    try:
+        return json.loads(raw), False
+    except json.JSONDecodeError:
+        pass
+    text = MARKDOWN_FENCE.sub("", raw)
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r"[{\[]", text):
+        try:
+            value, _ = decoder.raw_decode(text, match.start())
+        except json.JSONDecodeError:
+            continue
+        return value, True
+    raise json.JSONDecodeError("No JSON object or array in the response", raw, 0)
+
+
+# Google Form type ids, see get_form_type_description
+SINGLE_CHOICE_TYPES = {2, 3, 5, 7}
+CHECKBOXES_TYPE = 4
+DATE_TYPE, TIME_TYPE = 9, 10
+ANSWER_FORMATS = {DATE_TYPE: "%Y-%m-%d", TIME_TYPE: "%H:%M"}
+
+
+def check_answer(
+    question: LLMQuestionIn, answer: str | list[str]
+) -> tuple[str | list[str], str | None]:
+    """
+    Check an answer against the type and options of its question.
+    Returns the normalized answer and the reason it is invalid (None when valid).
+    """
+    type_id = question.type.type_id
+    if type_id == CHECKBOXES_TYPE:
+        answers = [answer] if isinstance(answer, str) else answer
+        if not answers:
+            return answers, "select at least one option"
+        if question.options:
+            unknown = [a for a in answers if a not in question.options]
+            if unknown:
+                return answers, f"{unknown} are not among the options"
+        return answers, None
+
+    if isinstance(answer, list):
+        if len(answer) != 1:
+            return answer, "exactly one answer is expected"
+        answer = answer[0]
+    if not answer.strip():
+        return answer, "the answer is empty"
+    if type_id in SINGLE_CHOICE_TYPES and question.options:
+        if answer not in question.options:
+            return answer, f"'{answer}' is not one of the options"
+    if type_id in ANSWER_FORMATS:
+        try:
+            datetime.strptime(answer, ANSWER_FORMATS[type_id])
+        except ValueError:
+            return answer, f"'{answer}' does not match {question.type.description}"
+    return answer, None
+
+
 class LLMTestSolverAgent:
-    def __init__(self, llm_model: LLMClient, test_id: int, db_session: AsyncSession):
+    """
+    Answers test questions with Gemini, grounded in the test documents.
+    Context is retrieved once for the whole form, then every group of questions
+    runs through the graph: look up the answer cache, generate and validate
+    (retrying on invalid output), store.
+    """
+
+    def __init__(
+        self,
+        llm_model: LLMClient,
+        test_id: int,
+        db_session: AsyncSession,
+        retrieval_mode: str = RETRIEVAL_MODE,
+        structured_output: bool = LLM_STRUCTURED_OUTPUT,
+    ):
         self.llm_model = llm_model
         self.test_id = test_id
         self.db_session = db_session
-        self.workflow = StateGraph(LLMSolverState)
+        self.retrieval_mode = retrieval_mode
+        self.structured_output = structured_output
+        # Summed over every group and attempt, saved with the test run
+        self.usage = LLMUsage()
 
-    async def retrieve_context(self, state: LLMSolverState) -> LLMSolverState:
-        questions_text = " ".join(q.question for q in state.questions.questions)
+    async def retrieve_group_contexts(
+        self, groups: list[LLMQuestionsListIn]
+    ) -> list[list[str]]:
+        """
+        Context of every group from one retrieval for the whole form: one embedding
+        call and one search. Per question, a group gets the chunks of its own
+        questions, in combined mode all groups share the chunks of the form.
+        """
+        questions = [q.question for group in groups for q in group.questions]
 
-        chunks_db = await retrieve_context_from_db(
-            question_text=questions_text,
-            db_session=self.db_session,
-            test_id=self.test_id,
-        )
-        if chunks_db:
-            state.context_chunks = chunks_db
+        started = time.perf_counter()
+        if self.retrieval_mode == RetrievalMode.PER_QUESTION:
+            chunks_by_question = await retrieve_context_for_questions(
+                db_session=self.db_session,
+                questions=questions,
+                test_id=self.test_id,
+            )
+            contexts = []
+            offset = 0
+            for group in groups:
+                group_size = len(group.questions)
+                contexts.append(
+                    merge_question_chunks(
+                        [
+                            chunk
+                            for index in range(offset, offset + group_size)
+                            for chunk in chunks_by_question.get(index, [])
+                        ]
+                    )
+                )
+                offset += group_size
+        else:
+            chunks_db = await retrieve_context_from_db(
+                question_text=" ".join(questions),
+                db_session=self.db_session,
+                test_id=self.test_id,
+            )
+            contexts = [chunks_db or [] for _ in groups]
+        self.usage.retrieval_time += time.perf_counter() - started
         logger.info(
             "Retrieved context",
             extra={
-                "chunks_count": len(state.context_chunks),
+                "chunks_count": [len(context) for context in contexts],
+                "test_id": self.test_id,
+                "retrieval_mode": self.retrieval_mode,
+            },
+        )
+        return contexts
+
+    async def lookup_cached_answers(self, state: LLMSolverState) -> LLMSolverState:
+        if not state.use_cache:
+            return state
+
+        state.cache_key = llm_answer_cache.build_key(
+            state.questions, state.context_chunks
+        )
+        cached_answers = await llm_answer_cache.get(state.cache_key)
+        if cached_answers is not None:
+            state.validated_answers = cached_answers
+            state.cache_hit = True
+        logger.info(
+            "LLM answer cache lookup",
+            extra={
+                "cache_hit": state.cache_hit,
                 "test_id": self.test_id,
+                **llm_answer_cache.stats,
             },
         )
+        return state
 
+    async def store_answers(self, state: LLMSolverState) -> LLMSolverState:
+        if state.use_cache and state.cache_key and not state.error:
+            await llm_answer_cache.set(state.cache_key, state.validated_answers)
         return state
 
-    @staticmethod
     def __create_prompt(
-        questions: LLMQuestionsListIn, context_chunks: list[str]
+        self, questions: LLMQuestionsListIn, context_chunks: list[str]
     ) -> str:
-        message = build_test_solver_prompt(questions, context_chunks)
+        message = build_test_solver_prompt(
+            questions, context_chunks, include_schema=not self.structured_output
+        )
         return message
 
-    def generate_attempt(self, state: LLMSolverState) -> LLMSolverState:
-        prompt = self.__create_prompt(state.questions, state.context_chunks)
+    async def generate_attempt(self, state: LLMSolverState) -> LLMSolverState:
+        # A retry only asks again for the questions without a valid answer
+        questions = state.pending_questions()
+        prompt = self.__create_prompt(questions, state.context_chunks)
         if state.error:
             prompt += f"\nPlease change you answers it solver error in previous call:{state.error}"
         logger.info(
             "Generating LLM attempt",
-            extra={"attempt": state.attempts + 1, "prompt": prompt},
+            extra={
+                "attempt": state.attempts + 1,
+                "questions": len(questions.questions),
+                "prompt": prompt,
+            },
+        )
+        started = time.perf_counter()
+        response = await self.llm_model.ainvoke_llm(
+            prompt,
+            response_schema=(
+                LLMQuestionsListOut.model_json_schema()
+                if self.structured_output
+                else None
+            ),
         )
-        state.raw_answers = self.llm_model.invoke_llm(prompt)
+        self.usage.generation_time += time.perf_counter() - started
+        self.usage.model = response.model or self.usage.model
+        self.usage.attempts += 1
+        self.usage.prompt_tokens += response.prompt_tokens
+        self.usage.completion_tokens += response.completion_tokens
+        state.raw_answers = response.content
         return state
 
     @staticmethod
     def validate_llm_answer(state: LLMSolverState) -> LLMSolverState:
+        """
+        Keep every valid answer, the rest of the questions are asked again.
+        The error lists the invalid answers, so the retry prompt can fix them.
+        """
         try:
-            parsed = json.loads(state.raw_answers)
-            validated_data = TypeAdapter(LLMQuestionsListOut).validate_python(parsed)
-            state.validated_answers = validated_data
-            state.error = None
+            parsed, repaired = parse_llm_json(state.raw_answers)
+            if isinstance(parsed, list):
+                parsed = {"questions": parsed}
+            response = TypeAdapter(LLMQuestionsListOut).validate_python(parsed)
         except (json.JSONDecodeError, ValidationError) as e:
-            state.increment_attempts()
-            state.error = str(e)
-
-            logger.warning(
-                "LLM validation failed",
-                extra={"attempt": state.attempts, "error": state.error},
+            response_parse_stats["failed"] += 1
+            errors = {"response": str(e)}
+        else:
+            response_parse_stats["repaired" if repaired else "parsed"] += 1
+            if repaired:
+                logger.info(
+                    "Repaired LLM response without a retry",
+                    extra=response_parse_stats,
+                )
+            answers = {a.question_id: a.answer for a in response.questions}
+            valid = (
+                {a.question_id: a for a in state.validated_answers.questions}
+                if state.validated_answers
+                else {}
+            )
+            errors = {}
+            for question in state.pending_questions().questions:
+                if question.id not in answers:
+                    errors[f"question {question.id}"] = "the answer is missing"
+                    continue
+                answer, error = check_answer(question, answers[question.id])
+                if error:
+                    errors[f"question {question.id}"] = error
+                else:
+                    valid[question.id] = LLMQuestionOut(
+                        question_id=question.id, answer=answer
+                    )
+            state.validated_answers = LLMQuestionsListOut(
+                questions=[
+                    valid[q.id] for q in state.questions.questions if q.id in valid
+                ]
             )
 
-            if state.attempts >= LLMGeminiSettings.max_retries:
-                state.error = f"Reached Maximum retries with error {e}"
-                logger.error(
-                    "LLM reached Maximum retries with error",
-                    extra={"error": state.error},
-                )
+        if not errors:
+            state.error = None
+            return state
+
+        state.increment_attempts()
+        state.error = "; ".join(f"{key}: {error}" for key, error in errors.items())
+        logger.warning(
+            "LLM validation failed",
+            extra={"attempt": state.attempts, "error": state.error},
+        )
+        if state.attempts >= LLMGeminiSettings.max_retries:
+            state.error = f"Reached Maximum retries with error {state.error}"
+            logger.error(
+                "LLM reached Maximum retries with error",
+                extra={"error": state.error},
+            )
         return state
 
     @staticmethod
     def decision_edge(state: LLMSolverState) -> str:
-        return "retry" if state.error else "success"
+        if not state.error:
+            return "success"
+        if state.attempts >= LLMGeminiSettings.max_retries:
+            return "give_up"
+        return "retry"
+
+    @staticmethod
+    def cache_edge(state: LLMSolverState) -> str:
+        return "hit" if state.cache_hit else "miss"
 
-    def _build_graph(self) -> CompiledStateGraph:
-        self.workflow.add_node("retrieve_context", self.retrieve_context)
-        self.workflow.add_node("generate_attempt", self.generate_attempt)
-        self.workflow.add_node("validate_llm_answer", self.validate_llm_answer)
+    async def call_llm_async(self, state: LLMSolverState) -> LLMSolverState:
+        result = await solver_graph.ainvoke(
+            state, config={"configurable": {"solver_agent": self}}
+        )
+        return result
 
-        self.workflow.set_entry_point("retrieve_context")
+    async def solve(
+        self, questions: LLMQuestionsListIn, use_cache: bool = True
+    ) -> LLMQuestionsListOut:
+        """
+        Solve the questions in token-budgeted groups, concurrently under the LLM
+        limiter. Every group has its own context, cache entry and retries, so a
+        failed validation only repeats its group. Answers are merged by question id,
+        token usage and timings of all groups are added up in self.usage.
+        """
+        groups = split_questions(questions)
+        started = time.perf_counter()
+        contexts = await self.retrieve_group_contexts(groups)
+        async with asyncio.TaskGroup() as tg:
+            group_tasks = [
+                tg.create_task(
+                    self.call_llm_async(
+                        LLMSolverState(
+                            questions=group,
+                            context_chunks=context,
+                            use_cache=use_cache,
+                        )
+                    )
+                )
+                for group, context in zip(groups, contexts)
+            ]
+        self.usage.answering_time += time.perf_counter() - started
 
-        self.workflow.add_edge("retrieve_context", "generate_attempt")
-        self.workflow.add_edge("generate_attempt", "validate_llm_answer")
+        answers = {}
+        for group, task in zip(groups, group_tasks):
+            result = task.result()
+            group_ids = {q.id for q in group.questions}
+            validated_answers = result.get("validated_answers")
+            if result.get("error"):
+                # Answers that passed validation are still used
+                logger.error(
+                    "LLM group was not fully solved",
+                    extra={"question_ids": sorted(group_ids), "error": result["error"]},
+                )
+            if validated_answers is None:
+                continue
+            for answer in validated_answers.questions:
+                if answer.question_id in group_ids:
+                    answers[answer.question_id] = answer
 
-        self.workflow.add_conditional_edges(
-            "validate_llm_answer",
-            lambda s: "retry" if s.error else "success",
-            {
-                "retry": "generate_attempt",
-                "success": END,
+        logger.info(
+            "Solved LLM questions",
+            extra={
+                "test_id": self.test_id,
+                "groups": len(groups),
+                "questions": len(questions.questions),
+                "answers": len(answers),
+                **self.usage.model_dump(),
             },
         )
+        return LLMQuestionsListOut(questions=list(answers.values()))
 
-        compiled_graph = self.workflow.compile()
-        return compiled_graph
 
-    async def call_llm_async(self, state: LLMSolverState) -> LLMSolverState:
-        graph = self._build_graph()
-        result = await graph.ainvoke(state)
-        return result
+def get_solver_agent(config: RunnableConfig) -> LLMTestSolverAgent:
+    """The agent of the current run holds its test id, db session and LLM client."""
+    return config["configurable"]["solver_agent"]
+
+
+async def lookup_cached_answers_node(
+    state: LLMSolverState, config: RunnableConfig
+) -> LLMSolverState:
+    return await get_solver_agent(config).lookup_cached_answers(state)
+
+
+async def generate_attempt_node(
+    state: LLMSolverState, config: RunnableConfig
+) -> LLMSolverState:
+    return await get_solver_agent(config).generate_attempt(state)
+
+
+async def store_answers_node(
+    state: LLMSolverState, config: RunnableConfig
+) -> LLMSolverState:
+    return await get_solver_agent(config).store_answers(state)
+
+
+def build_solver_graph() -> CompiledStateGraph:
+    """
+    Solver workflow, compiled once per process. Per-call dependencies are not
+    part of the graph, the nodes take the agent from the run config.
+    """
+    workflow = StateGraph(LLMSolverState)
+    workflow.add_node("lookup_cached_answers", lookup_cached_answers_node)
+    workflow.add_node("generate_attempt", generate_attempt_node)
+    workflow.add_node("validate_llm_answer", LLMTestSolverAgent.validate_llm_answer)
+    workflow.add_node("store_answers", store_answers_node)
+
+    workflow.set_entry_point("lookup_cached_answers")
+
+    workflow.add_conditional_edges(
+        "lookup_cached_answers",
+        LLMTestSolverAgent.cache_edge,
+        {
+            "hit": END,
+            "miss": "generate_attempt",
+        },
+    )
+    workflow.add_edge("generate_attempt", "validate_llm_answer")
+
+    workflow.add_conditional_edges(
+        "validate_llm_answer",
+        LLMTestSolverAgent.decision_edge,
+        {
+            "retry": "generate_attempt",
+            # Valid answers are kept, but a partial result is not cached
+            "give_up": END,
+            "success": "store_answers",
+        },
+    )
+
+    workflow.add_edge("store_answers", END)
+
+    return workflow.compile()
+
+
+solver_graph = build_solver_graph()
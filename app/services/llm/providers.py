@@ -0,0 +1,185 @@
+"""
+Chat and embeddings providers behind the solver and document ingestion.
+Gemini is used in production, the fake answers locally with a configurable latency
+and error rate so whole pipelines can be load tested without a network.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+from abc import ABC, abstractmethod
+
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+
+from app.schemas.llm import LLMResponse
+
+# Google Form type ids, see get_form_type_description
+CHECKBOXES_TYPE, DATE_TYPE, TIME_TYPE = 4, 9, 10
+
+
+class LLMProvider(ABC):
+    """Chat model answering one prompt at a time."""
+
+    model: str
+
+    @abstractmethod
+    async def ainvoke(
+        self, prompt: str, response_schema: dict | None = None
+    ) -> LLMResponse:
+        """
+        Return the stripped answer with its token usage.
+        With a response schema the answer is JSON constrained to that schema.
+        """
+
+
+class EmbeddingsProvider(ABC):
+    """Embedding model for document chunks and search queries."""
+
+    model: str
+
+    @abstractmethod
+    async def aembed(
+        self, texts: list[str], dimensions: int, task_type: str = "RETRIEVAL_DOCUMENT"
+    ) -> list[list[float]]:
+        """Return one vector of the given dimensions per text."""
+
+
+class GeminiLLMProvider(LLMProvider):
+
+    def __init__(self, model: str, temperature: float, timeout: int, max_retries: int):
+        self.model = model
+        self.chat_model = ChatGoogleGenerativeAI(
+            model=model,
+            temperature=temperature,
+            timeout=timeout,
+            max_retries=max_retries,
+        )
+
+    async def ainvoke(
+        self, prompt: str, response_schema: dict | None = None
+    ) -> LLMResponse:
+        if response_schema is None:
+            response = await self.chat_model.ainvoke(prompt)
+        else:
+            response = await self.chat_model.ainvoke(
+                prompt,
+                response_mime_type="application/json",
+                response_json_schema=response_schema,
+            )
+        usage = response.usage_metadata or {}
+        return LLMResponse(
+            content=response.content.strip(),
+            model=self.model,
+            prompt_tokens=usage.get("input_tokens", 0),
+            completion_tokens=usage.get("output_tokens", 0),
+        )
+
+
+class GeminiEmbeddingsProvider(EmbeddingsProvider):
+
+    def __init__(self, model: str):
+        self.model = model
+        self.embeddings_model = GoogleGenerativeAIEmbeddings(model=model)
+
+    async def aembed(
+        self, texts: list[str], dimensions: int, task_type: str = "RETRIEVAL_DOCUMENT"
+    ) -> list[list[float]]:
+        # The Gemini embeddings client is synchronous, keep it off the event loop
+        return await asyncio.to_thread(
+            self.embeddings_model.embed_documents,
+            texts,
+            task_type=task_type,
+            output_dimensionality=dimensions,
+        )
+
+
+class FakeProviderError(ConnectionError):
+    """Injected failure of the fake providers."""
+
+
+class FakeProvider:
+    """Latency and failure injection shared by the fake providers."""
+
+    def __init__(self, latency: float, error_rate: float, seed: int | None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    async def simulate_call(self) -> None:
+        await asyncio.sleep(self.latency)
+        if self._random.random() < self.error_rate:
+            raise FakeProviderError(f"{self.model} failed on purpose")
+
+
+def parse_prompt_questions(prompt: str) -> list[dict]:
+    """Questions of a solver prompt, one terse JSON object per line."""
+    return [
+        json.loads(line) for line in prompt.splitlines() if line.startswith('{"id":')
+    ]
+
+
+def fake_answer(question: dict) -> str | list[str]:
+    """Answer that passes validation, picked by the hash of the question."""
+    digest = int(hashlib.sha256(str(question["q"]).encode()).hexdigest(), 16)
+    type_id = question["t"]
+    if question.get("o"):
+        option = question["o"][digest % len(question["o"])]
+        return [option] if type_id == CHECKBOXES_TYPE else option
+    if type_id == DATE_TYPE:
+        return "2024-01-01"
+    if type_id == TIME_TYPE:
+        return "12:00"
+    return f"Answer {digest % 1000}"
+
+
+class FakeLLMProvider(FakeProvider, LLMProvider):
+    """Answers every question of the solver prompt with a deterministic answer."""
+
+    model = "fake-llm"
+
+    def __init__(
+        self, latency: float = 0, error_rate: float = 0, seed: int | None = None
+    ):
+        super().__init__(latency, error_rate, seed)
+
+    async def ainvoke(
+        self, prompt: str, response_schema: dict | None = None
+    ) -> LLMResponse:
+        await self.simulate_call()
+        answers = [
+            {"question_id": question["id"], "answer": fake_answer(question)}
+            for question in parse_prompt_questions(prompt)
+        ]
+        content = json.dumps({"questions": answers})
+        return LLMResponse(
+            content=content,
+            model=self.model,
+            prompt_tokens=len(prompt) // 4 + 1,
+            completion_tokens=len(content) // 4 + 1,
+        )
+
+
+class FakeEmbeddingsProvider(FakeProvider, EmbeddingsProvider):
+    """Unit vectors derived from the text hash, equal texts get equal vectors."""
+
+    model = "fake-embedding"
+
+    def __init__(
+        self, latency: float = 0, error_rate: float = 0, seed: int | None = None
+    ):
+        super().__init__(latency, error_rate, seed)
+
+    async def aembed(
+        self, texts: list[str], dimensions: int, task_type: str = "RETRIEVAL_DOCUMENT"
+    ) -> list[list[float]]:
+        await self.simulate_call()
+        return [self.embed(text, dimensions) for text in texts]
+
+    @staticmethod
+    def embed(text: str, dimensions: int) -> list[float]:
+        digest = hashlib.shake_256(text.encode()).digest(dimensions)
+        vector = [byte - 127.5 for byte in digest]
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector]
@@ -1,23 +1,36 @@
-import io
+import asyncio
+import codecs
 import logging
+import os
+from contextlib import aclosing
+from typing import AsyncIterator, Iterator
 
-import pdfplumber
 from fastapi import UploadFile
-from sqlalchemy import select
+from pgvector.asyncpg import register_vector
+from sqlalchemy import delete, exists, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.database.postgres_config import async_postgres_session, connect_raw_postgres
+from app.database.models.orm.chunk_embedding import ChunkEmbedding
 from app.database.models.orm.document import Document
 from app.database.models.orm.document_embedding import DocumentEmbedding
 from app.services.llm.embeddings import (
-    get_document_chunks,
+    get_chunk_content_hash,
     generate_embeddings,
+    StreamingTextSplitter,
 )
-from app.services.llm.llm_config import embeddings_model
+from app.services.llm.llm_config import embeddings_provider
+from app.services.tests.pdf_extraction import extract_pdf_pages
+from app.services.jobs.store import job_store
 from app.settings import (
     ALLOWED_DOCUMENT_TYPES,
     MAX_DOCUMENT_SIZE,
-    UPLOAD_DOCUMENT_JOBS_STORAGE,
     PDF_DOCUMENT_TYPE,
+    DOCUMENT_SPOOL_DIR,
+    BATCH_SIZE,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_DIM,
+    EMBEDDING_MAX_CONCURRENT_BATCHES,
 )
 from app.utils.enums import JobStatus
 from app.utils.exception_types import WrongRequestError
@@ -25,89 +38,348 @@ from app.utils.exception_types import WrongRequestError
 logger = logging.getLogger(__name__)
 
 
-async def check_request_document(document: UploadFile) -> bytes:
-    if document.content_type not in ALLOWED_DOCUMENT_TYPES:
+SPOOL_READ_SIZE = 1024 * 1024  # 1 MB
+# Text blocks are split on the event loop, keep them small
+TEXT_BLOCK_SIZE = 64 * 1024  # 64 KB
+
+
+def check_request_document(content_type: str, size_bytes: int) -> None:
+    if content_type not in ALLOWED_DOCUMENT_TYPES:
         raise WrongRequestError(
             message="Unsupported file type. Only TXT and PDF allowed."
         )
-    document_content = await document.read()
-    if len(document_content) > MAX_DOCUMENT_SIZE:
-        raise WrongRequestError(message="File too large. Max 5 MB allowed.")
+    if size_bytes > MAX_DOCUMENT_SIZE:
+        raise WrongRequestError(
+            message=f"File too large. Max {MAX_DOCUMENT_SIZE // 2**20} MB allowed."
+        )
+
 
-    logger.info("Saving Document:", extra={"document": document})
+async def spool_document(document: UploadFile, job_id: str) -> str:
+    """
+    Copy the upload to the spool dir so the job does not depend on the request.
+    The size limit is enforced while copying, so uploads without a declared size
+    are never written past MAX_DOCUMENT_SIZE.
+    """
+    await asyncio.to_thread(os.makedirs, DOCUMENT_SPOOL_DIR, exist_ok=True)
+    document_path = os.path.join(DOCUMENT_SPOOL_DIR, job_id)
+    spool_file = await asyncio.to_thread(open, document_path, "wb")
+    size_bytes = 0
+    try:
+        while chunk := await document.read(SPOOL_READ_SIZE):
+            size_bytes += len(chunk)
+            check_request_document(document.content_type, size_bytes)
+            await asyncio.to_thread(spool_file.write, chunk)
+    except Exception:
+        await asyncio.to_thread(spool_file.close)
+        await asyncio.to_thread(os.remove, document_path)
+        raise
+    await asyncio.to_thread(spool_file.close)
 
-    return document_content
+    logger.info(
+        "Document spooled",
+        extra={
+            "job_id": job_id,
+            "file_name": document.filename,
+            "path": document_path,
+            "size_bytes": size_bytes,
+        },
+    )
+    return document_path
 
 
-async def extract_text_from_document(document_content: bytes, content_type: str) -> str:
+def iter_text_blocks(document_path: str) -> Iterator[str]:
+    """Text file in blocks cut at line ends, so no block ends inside a word."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    tail = ""
+    with open(document_path, "rb") as document:
+        while block := document.read(TEXT_BLOCK_SIZE):
+            text, _, tail = (tail + decoder.decode(block)).rpartition("\n")
+            if text:
+                yield text
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def stream_document_pages(
+    document_path: str, content_type: str
+) -> AsyncIterator[str]:
+    """Text of the spooled document page by page (64 KB blocks for text files)."""
     if content_type == PDF_DOCUMENT_TYPE:
-        try:
-            with pdfplumber.open(io.BytesIO(document_content)) as pdf:
-                text = "\n".join(page.extract_text() or "" for page in pdf.pages)
-        except Exception as e:
-            logger.error(f"PDF parsing error: {e}")
-            return ""
-    else:
-        text = document_content.decode("utf-8")
-    return text.strip()
+        async with aclosing(extract_pdf_pages(document_path)) as pages:
+            async for text in pages:
+                yield text
+        return
+
+    blocks = iter_text_blocks(document_path)
+    try:
+        while (text := await asyncio.to_thread(next, blocks, None)) is not None:
+            yield text
+    finally:
+        blocks.close()
+
+
+async def stream_document_chunks(
+    document_path: str, content_type: str, batch_size: int = EMBEDDING_BATCH_SIZE
+) -> AsyncIterator[list[str]]:
+    """
+    Yield batches of document chunks while the document is being read, only the
+    current pages and batch are held in memory.
+    """
+    text_splitter = StreamingTextSplitter()
+    batch = []
+    async with aclosing(stream_document_pages(document_path, content_type)) as pages:
+        async for text in pages:
+            batch.extend(text_splitter.split(text))
+            while len(batch) >= batch_size:
+                yield batch[:batch_size]
+                batch = batch[batch_size:]
+
+    batch.extend(text_splitter.flush())
+    for batch_start in range(0, len(batch), batch_size):
+        yield batch[batch_start : batch_start + batch_size]
+
+
+async def get_saved_chunk_indexes(db_session: AsyncSession, document_id: int) -> set:
+    result = await db_session.execute(
+        select(DocumentEmbedding.chunk_index).where(
+            DocumentEmbedding.document_id == document_id
+        )
+    )
+    return set(result.scalars().all())
+
+
+async def find_shared_embeddings(content_hashes: list[str]) -> dict[str, int]:
+    """Ids of the already embedded chunks among the given content hashes."""
+    async with async_postgres_session() as db_session:
+        result = await db_session.execute(
+            select(ChunkEmbedding.content_hash, ChunkEmbedding.id).where(
+                ChunkEmbedding.content_hash.in_(content_hashes)
+            )
+        )
+        return dict(result.all())
 
 
 async def save_document_embeddings(
-    db_session: AsyncSession,
     document_id: int,
+    chunk_indexes: list[int],
     chunks: list[str],
-    embeddings: list[list[float]],
-):
-    db_embeddings = [
-        DocumentEmbedding(
-            document_id=document_id,
-            chunk_index=i,
-            chunk_text=chunk,
-            embedding=embedding,
+    content_hashes: list[str],
+    new_embeddings: dict[str, list[float]],
+    batch_size: int = BATCH_SIZE,
+) -> None:
+    """
+    Bulk load document chunks with binary COPY instead of one ORM INSERT per row.
+    New vectors are merged into the shared chunk_embeddings first, when another
+    ingest saved the same chunk meanwhile its vector is reused. Every call is one
+    transaction, so a failed ingest keeps the saved chunks and can be resumed.
+    """
+    connection = await connect_raw_postgres()
+    try:
+        await register_vector(connection)
+        async with connection.transaction():
+            if new_embeddings:
+                await connection.execute(
+                    "CREATE TEMP TABLE new_chunk_embeddings "
+                    "(content_hash text, embedding halfvec) ON COMMIT DROP"
+                )
+                await connection.copy_records_to_table(
+                    "new_chunk_embeddings", records=list(new_embeddings.items())
+                )
+                await connection.execute(
+                    f"INSERT INTO {ChunkEmbedding.__tablename__} "
+                    "(content_hash, embeddings_model, dimensions, embedding) "
+                    "SELECT content_hash, $1, $2, embedding FROM new_chunk_embeddings "
+                    "ON CONFLICT (content_hash) DO NOTHING",
+                    embeddings_provider.model,
+                    EMBEDDING_DIM,
+                )
+            # Locked until the document rows reference them, so the orphan cleanup
+            # cannot delete the shared vectors in between
+            rows = await connection.fetch(
+                f"SELECT content_hash, id FROM {ChunkEmbedding.__tablename__} "
+                "WHERE content_hash = ANY($1::text[]) FOR KEY SHARE",
+                list(set(content_hashes)),
+            )
+            embedding_ids = {row["content_hash"]: row["id"] for row in rows}
+
+            for batch_start in range(0, len(chunks), batch_size):
+                batch_end = min(batch_start + batch_size, len(chunks))
+                records = [
+                    (
+                        document_id,
+                        chunk_indexes[i],
+                        chunks[i],
+                        embedding_ids[content_hashes[i]],
+                    )
+                    for i in range(batch_start, batch_end)
+                ]
+                await connection.copy_records_to_table(
+                    DocumentEmbedding.__tablename__,
+                    records=records,
+                    columns=[
+                        "document_id",
+                        "chunk_index",
+                        "chunk_text",
+                        "embedding_id",
+                    ],
+                )
+        logger.info(
+            "Saved document embeddings",
+            extra={
+                "document_id": document_id,
+                "first_chunk_index": chunk_indexes[0],
+                "chunks": len(chunks),
+                "new_embeddings": len(new_embeddings),
+            },
+        )
+    finally:
+        await connection.close()
+
+
+async def embed_and_save_chunks(
+    job_id: str,
+    document_id: int,
+    chunk_batches: AsyncIterator[list[str]],
+    saved_chunk_indexes: set = frozenset(),
+    max_concurrent_batches: int = EMBEDDING_MAX_CONCURRENT_BATCHES,
+) -> int:
+    """
+    Embed and save chunk batches as they are read, a bounded number at a time.
+    Reading waits while max_concurrent_batches are in flight, so memory does not
+    grow with the document. Chunks embedded before (by any document) reuse the
+    stored vector, chunks saved by a failed run are skipped. Every finished batch
+    is counted in processed_chunks right away. Returns the number of chunks.
+    """
+    semaphore = asyncio.Semaphore(max_concurrent_batches)
+
+    async def ingest_batch(pending_chunks: dict[int, str]) -> None:
+        batch_indexes = list(pending_chunks)
+        batch_chunks = list(pending_chunks.values())
+        content_hashes = [get_chunk_content_hash(chunk) for chunk in batch_chunks]
+        shared_embeddings = await find_shared_embeddings(content_hashes)
+        # Keyed by hash, so repeated chunks of the batch are embedded once
+        missing_chunks = {
+            content_hash: chunk
+            for content_hash, chunk in zip(content_hashes, batch_chunks)
+            if content_hash not in shared_embeddings
+        }
+        new_embeddings = {}
+        if missing_chunks:
+            embeddings = await generate_embeddings(list(missing_chunks.values()))
+            new_embeddings = dict(zip(missing_chunks, embeddings))
+
+        await save_document_embeddings(
+            document_id, batch_indexes, batch_chunks, content_hashes, new_embeddings
+        )
+        await job_store.increment(job_id, "processed_chunks", len(batch_indexes))
+
+    chunk_count = 0
+    async with aclosing(chunk_batches), asyncio.TaskGroup() as tg:
+        async for batch in chunk_batches:
+            pending_chunks = {
+                chunk_index: chunk
+                for chunk_index, chunk in enumerate(batch, start=chunk_count)
+                if chunk_index not in saved_chunk_indexes
+            }
+            chunk_count += len(batch)
+            await job_store.update(job_id, total_chunks=chunk_count)
+            if not pending_chunks:
+                continue
+            await semaphore.acquire()
+            task = tg.create_task(ingest_batch(pending_chunks))
+            task.add_done_callback(lambda _: semaphore.release())
+    return chunk_count
+
+
+async def delete_document(document_id: int) -> None:
+    """Drop a partially ingested document together with its embeddings."""
+    async with async_postgres_session() as db_session:
+        await db_session.execute(delete(Document).where(Document.id == document_id))
+        await db_session.commit()
+
+
+async def delete_orphan_chunk_embeddings() -> int:
+    """
+    Remove shared vectors no document chunk refers to anymore, left behind by
+    deleted documents. Rows locked by a running ingest are skipped.
+    """
+    async with async_postgres_session() as db_session:
+        orphans = (
+            select(ChunkEmbedding.id)
+            .where(~exists().where(DocumentEmbedding.embedding_id == ChunkEmbedding.id))
+            .with_for_update(skip_locked=True)
         )
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
-    ]
-    logger.info("Saving document embeddings", extra={"embeddings": len(db_embeddings)})
-    db_session.add_all(db_embeddings)
-    await db_session.commit()
+        result = await db_session.execute(
+            delete(ChunkEmbedding).where(ChunkEmbedding.id.in_(orphans))
+        )
+        await db_session.commit()
+        return result.rowcount
 
 
 async def process_document_job(
     job_id: str,
     test_id: int,
     user_id: int,
-    document: UploadFile,
+    document_path: str,
+    file_name: str,
+    content_type: str,
     scope: str,
-    db_session: AsyncSession,
 ):
-    UPLOAD_DOCUMENT_JOBS_STORAGE[job_id]["status"] = JobStatus.PROCESSING
+    """
+    Ingest a spooled upload. The job owns everything it uses (the spool file and
+    its own database sessions), nothing from the upload request.
+    """
+    await job_store.update(job_id, status=JobStatus.PROCESSING)
 
     try:
-        document_content = await check_request_document(document=document)
-        text = await extract_text_from_document(document_content, document.content_type)
-        chunks = await get_document_chunks(
-            text=text, storage=UPLOAD_DOCUMENT_JOBS_STORAGE, job_id=job_id
-        )
-        embeddings = await generate_embeddings(chunks)
-
-        document_db = Document(
-            file_name=document.filename,
-            original_file_name=document.filename,
-            user_id=user_id,
-            file_type=document.content_type,
-            size_bytes=len(document_content),
-            test_id=test_id,
-            scope=scope,
-        )
-        db_session.add(document_db)
-        await db_session.flush()
+        size_bytes = os.path.getsize(document_path)
+        check_request_document(content_type, size_bytes)
 
-        await save_document_embeddings(db_session, document_db.id, chunks, embeddings)
+        # A retried job reuses its document and skips the chunks already saved
+        job = await job_store.get(job_id) or {}
+        document_id = job.get("document_id")
+        async with async_postgres_session() as db_session:
+            if document_id is None:
+                document_db = Document(
+                    file_name=file_name,
+                    original_file_name=file_name,
+                    user_id=user_id,
+                    file_type=content_type,
+                    size_bytes=size_bytes,
+                    test_id=test_id,
+                    scope=scope,
+                )
+                db_session.add(document_db)
+                await db_session.commit()
+                document_id = document_db.id
+                await job_store.update(job_id, document_id=document_id)
+            saved_chunk_indexes = await get_saved_chunk_indexes(db_session, document_id)
 
-        return document_db.id, len(chunks)
+        await job_store.update(job_id, processed_chunks=len(saved_chunk_indexes))
+        chunk_count = await embed_and_save_chunks(
+            job_id,
+            document_id,
+            stream_document_chunks(document_path, content_type),
+            saved_chunk_indexes,
+        )
+
+        await job_store.update(
+            job_id,
+            status=JobStatus.COMPLETED,
+            document_id=document_id,
+            processed_chunks=chunk_count,
+            error=None,
+        )
+        logger.info(
+            "Document processed",
+            extra={"job_id": job_id, "document_id": document_id, "chunks": chunk_count},
+        )
+        return document_id, chunk_count
 
     except Exception as e:
-        logger.exception("Document processing failed")
-        UPLOAD_DOCUMENT_JOBS_STORAGE[job_id]["status"] = JobStatus.FAILED
-        UPLOAD_DOCUMENT_JOBS_STORAGE[job_id]["error"] = str(e)
-        return None
+        # The worker retries the task and marks the job failed without attempts left,
+        # a final status here would end the progress streams of a retried job
+        logger.exception("Document processing failed", extra={"job_id": job_id})
+        await job_store.update(job_id, error=str(e))
+        raise
@@ -0,0 +1,134 @@
+"""
+PDF text extraction in worker processes.
+pdfplumber layout analysis is pure Python and CPU bound, in a thread it still holds
+the GIL and stalls the event loop, so pages are extracted by a process pool.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator
+
+import pdfplumber
+
+from app.settings import (
+    PDF_EXTRACT_PROCESSES,
+    PDF_PAGES_PER_TASK,
+    PDF_EXTRACT_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PDFExtractionPool:
+    """
+    Process wide pool of PDF extraction processes, bounded so concurrent ingests
+    cannot start a process per page. Started lazily, closed on worker shutdown.
+    """
+
+    def __init__(self, max_workers: int = PDF_EXTRACT_PROCESSES):
+        self.max_workers = max_workers
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, forking a process with running threads can deadlock the child
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(
+                "PDF extraction pool started", extra={"processes": self.max_workers}
+            )
+        return self._executor
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            logger.info("PDF extraction pool closed")
+        self._executor = None
+
+
+pdf_extraction_pool = PDFExtractionPool()
+
+
+def count_pdf_pages(document_path: str) -> int:
+    with pdfplumber.open(document_path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pdf_page_range(document_path: str, start: int, end: int) -> list[str]:
+    with pdfplumber.open(document_path, pages=range(start + 1, end + 1)) as pdf:
+        texts = []
+        for page in pdf.pages:
+            texts.append(page.extract_text() or "")
+            page.close()
+        return texts
+
+
+async def extract_pdf_pages(
+    document_path: str,
+    timeout: float = PDF_EXTRACT_TIMEOUT,
+    pages_per_task: int = PDF_PAGES_PER_TASK,
+) -> AsyncIterator[str]:
+    """
+    Yield the text of every page in order, page ranges are extracted in parallel.
+    The timeout limits the total time spent waiting for extraction, on timeout or
+    when the caller stops reading, the queued page ranges are cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    executor = pdf_extraction_pool.executor
+    waited = 0.0
+
+    async def wait(future: asyncio.Future):
+        nonlocal waited
+        started = loop.time()
+        try:
+            return await asyncio.wait_for(future, timeout=max(timeout - waited, 0))
+        except TimeoutError as e:
+            raise TimeoutError(
+                f"PDF text extraction took longer than {timeout} seconds"
+            ) from e
+        finally:
+            waited += loop.time() - started
+
+    page_count = await wait(
+        loop.run_in_executor(executor, count_pdf_pages, document_path)
+    )
+    page_ranges = iter(range(0, page_count, pages_per_task))
+    pending: deque[asyncio.Future] = deque()
+
+    def submit_next_range() -> None:
+        start = next(page_ranges, None)
+        if start is not None:
+            end = min(start + pages_per_task, page_count)
+            pending.append(
+                loop.run_in_executor(
+                    executor, extract_pdf_page_range, document_path, start, end
+                )
+            )
+
+    try:
+        # One range per process ahead of the reader keeps memory bounded
+        for _ in range(pdf_extraction_pool.max_workers):
+            submit_next_range()
+        while pending:
+            texts = await wait(pending.popleft())
+            submit_next_range()
+            for text in texts:
+                yield text
+    finally:
+        for future in pending:
+            future.cancel()
+
+    logger.info(
+        "PDF text extracted",
+        extra={
+            "document_path": document_path,
+            "pages": page_count,
+            "wait_s": round(waited, 3),
+        },
+    )
@@ -5,17 +5,17 @@ import random
 
 import aiohttp
 from fastapi import HTTPException
-from sqlalchemy import Select
+from sqlalchemy import Select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.postgres_config import async_postgres_session
-from app.services.llm.llm_config import LLMClient, LLMSolverState
+from app.services.llm.llm_config import LLMClient
 from app.services.llm.llm_test_solver import LLMTestSolverAgent
 from app.database.models.orm.test import Test
 from app.database.models.orm.test_run import TestRun
 from app.database.models.orm.user import User
 from app.parsers.google_form import get_form_response_url
-from app.schemas.llm import LLMQuestionIn, LLMQuestionsListIn
+from app.schemas.llm import LLMQuestionIn, LLMQuestionsListIn, LLMUsage
 from app.schemas.tests.test import (
     TestQuestions,
     QuestionStructure,
@@ -26,8 +26,11 @@ from app.schemas.tests.test import (
     TestSubmitPayload,
     TestResponse,
     JobResult,
+    TestRunsLLMUsage,
 )
-from app.settings import TEST_RUNS_JOBS_STORAGE, MAX_PARALLEL_TASKS
+from app.services.http_client import http_client
+from app.services.jobs.store import job_store
+from app.settings import MAX_PARALLEL_TASKS, GOOGLE_FORM_SUBMIT_TIMEOUT
 from app.utils.configs import get_form_type_description
 from app.utils.enums import JobStatus
 from app.utils.exception_types import ServerError
@@ -129,8 +132,12 @@ def fill_random_value(type_id, entry_id, options, required=False, entry_name="")
 
 
 async def answer_llm_questions(
-    llm_input_questions: list[QuestionStructure], test_id: int, db_session: AsyncSession
-):
+    llm_input_questions: list[QuestionStructure],
+    test_id: int,
+    db_session: AsyncSession,
+    use_cache: bool = True,
+) -> tuple[dict | None, LLMUsage | None]:
+    """Answer the LLM questions, returns the answers by question id and the usage."""
     if llm_input_questions:
         llm_questions_list_in = LLMQuestionsListIn(
             questions=[
@@ -146,17 +153,43 @@ async def answer_llm_questions(
             llm_client, test_id=test_id, db_session=db_session
         )
 
-        state = LLMSolverState(questions=llm_questions_list_in)
-
-        result_state: LLMSolverState = await solver_agent.call_llm_async(state)
-        validated_llm_answers = result_state.get("validated_answers")
+        validated_llm_answers = await solver_agent.solve(
+            llm_questions_list_in, use_cache=use_cache
+        )
 
         llm_answers_map = {
             q.question_id: q.answer for q in validated_llm_answers.questions
         }
 
-        return llm_answers_map
-    return None
+        return llm_answers_map, solver_agent.usage
+    return None, None
+
+
+def collect_llm_questions(
+    test_content: TestQuestions, payload_answers: list[Answer]
+) -> list[QuestionStructure]:
+    llm_question_ids = {
+        a.question_id for a in payload_answers if a.answer_mode == "llm"
+    }
+    return [q for q in test_content.questions if q.id in llm_question_ids]
+
+
+async def build_llm_answer_plan(
+    test_id: int, payload: TestSubmitPayload, current_user: User
+) -> tuple[dict, LLMUsage | None]:
+    """Solve the LLM questions of a test once so every copy of a batch reuses them"""
+    async with async_postgres_session() as session:
+        test_db = await get_test_from_db(
+            test_id=test_id, current_user=current_user, async_db_session=session
+        )
+        llm_input_questions = collect_llm_questions(test_db.content, payload.answers)
+        llm_answers_map, llm_usage = await answer_llm_questions(
+            llm_input_questions,
+            test_id=test_id,
+            db_session=session,
+            use_cache=payload.use_llm_cache,
+        )
+    return llm_answers_map or {}, llm_usage
 
 
 async def answer_test_questions(
@@ -164,8 +197,14 @@ async def answer_test_questions(
     payload_answers: list[Answer],
     test_id: int,
     db_session: AsyncSession,
-) -> AnsweredTestContent:
-    """Fill form entries with fill_algorithm"""
+    llm_answers_map: dict | None = None,
+    use_llm_cache: bool = True,
+) -> tuple[AnsweredTestContent, LLMUsage | None]:
+    """Fill form entries with fill_algorithm.
+
+    When llm_answers_map is given (a batch-level answer plan) the LLM is not called.
+    Returns the answered content and the LLM usage when the LLM was called.
+    """
     answers_map = {a.question_id: a for a in payload_answers}
     answered_questions = []
     llm_input_questions = []
@@ -206,16 +245,21 @@ async def answer_test_questions(
                 )
         answered_questions.append(answered_question)
 
-    llm_answers_map = await answer_llm_questions(
-        llm_input_questions, test_id=test_id, db_session=db_session
-    )
+    llm_usage = None
+    if llm_answers_map is None:
+        llm_answers_map, llm_usage = await answer_llm_questions(
+            llm_input_questions,
+            test_id=test_id,
+            db_session=db_session,
+            use_cache=use_llm_cache,
+        )
 
     for aq in answered_questions:
-        if aq.answer_mode == "llm" and aq.id in llm_answers_map:
+        if aq.answer_mode == "llm" and llm_answers_map and aq.id in llm_answers_map:
             aq.llm_answer = llm_answers_map[aq.id]
 
     logger.info("Answered Test Content", extra={"questions": answered_questions})
-    return AnsweredTestContent(questions=answered_questions)
+    return AnsweredTestContent(questions=answered_questions), llm_usage
 
 
 def build_google_form_payload(questions: list[AnsweredQuestionStructure]):
@@ -230,19 +274,24 @@ async def submit_results_to_google_form(
     test_db: Test, data: dict, user_id: int
 ) -> None:
     formed_url = get_form_response_url(url=test_db.url)
-    async with aiohttp.ClientSession() as client:
-        async with client.post(formed_url, data=data, timeout=5) as resp:
-            if resp.status != 200:
-                logger.error(
-                    "Error submitting test to Google form",
-                    extra={
-                        "test_id": test_db.id,
-                        "user_id": user_id,
-                        "status_code": resp.status,
-                        "url": test_db.url,
-                    },
-                )
-                raise ServerError(message="Error submitting test to Google form")
+    async with http_client.session.post(
+        formed_url,
+        data=data,
+        timeout=aiohttp.ClientTimeout(total=GOOGLE_FORM_SUBMIT_TIMEOUT),
+    ) as resp:
+        if resp.status != 200:
+            logger.error(
+                "Error submitting test to Google form",
+                extra={
+                    "test_id": test_db.id,
+                    "user_id": user_id,
+                    "status_code": resp.status,
+                    "url": test_db.url,
+                },
+            )
+            raise ServerError(message="Error submitting test to Google form")
+        # Drain the body so the connection goes back to the pool
+        await resp.read()
 
 
 async def save_test_run(
@@ -251,6 +300,7 @@ async def save_test_run(
     user_id: int,
     answered_test_content: AnsweredTestContent,
     async_db_session: AsyncSession,
+    llm_usage: LLMUsage | None = None,
 ) -> TestRun:
     answered_test_db = TestRun(
         test_id=test_db.id,
@@ -259,6 +309,14 @@ async def save_test_run(
         run_content=answered_test_content,
         submitted_date=datetime.now(UTC),
     )
+    if llm_usage is not None:
+        answered_test_db.llm_model = llm_usage.model
+        answered_test_db.llm_prompt_tokens = llm_usage.prompt_tokens
+        answered_test_db.llm_completion_tokens = llm_usage.completion_tokens
+        answered_test_db.llm_attempts = llm_usage.attempts
+        answered_test_db.llm_retrieval_time = llm_usage.retrieval_time
+        answered_test_db.llm_generation_time = llm_usage.generation_time
+        answered_test_db.llm_answering_time = llm_usage.answering_time
 
     async_db_session.add(answered_test_db)
     await async_db_session.commit()
@@ -272,6 +330,8 @@ async def submit_single_test(
     job_id: str,
     payload: TestSubmitPayload,
     current_user: User,
+    llm_answers_map: dict | None = None,
+    plan_usage: dict | None = None,
 ) -> TestResponse:
     async with async_postgres_session() as session:
         test_db = await get_test_from_db(
@@ -284,11 +344,14 @@ async def submit_single_test(
             "Submitting test",
             extra={"test_id": test_db.id, "user_id": current_user.id},
         )
-        answered_test_content = await answer_test_questions(
+        answered_test_content, solved_usage = await answer_test_questions(
             test_content=test_db.content,
             test_id=test_id,
             payload_answers=payload.answers,
             db_session=session,
+            llm_answers_map=llm_answers_map,
+            # Diverse mode asks for independent samples, a cached answer defeats it
+            use_llm_cache=payload.use_llm_cache and not payload.diverse_llm_answers,
         )
 
         data = build_google_form_payload(answered_test_content.questions)
@@ -300,13 +363,22 @@ async def submit_single_test(
 
         test_db.is_submitted = True
 
-        test_run_db = await save_test_run(
-            test_db=test_db,
-            job_id=job_id,
-            user_id=current_user.id,
-            answered_test_content=answered_test_content,
-            async_db_session=session,
-        )
+        # The usage of a shared answer plan is saved with the first copy that gets
+        # here, a copy failing to save hands it back to the others
+        claimed_usage = plan_usage.pop("usage", None) if plan_usage else None
+        try:
+            test_run_db = await save_test_run(
+                test_db=test_db,
+                job_id=job_id,
+                user_id=current_user.id,
+                answered_test_content=answered_test_content,
+                async_db_session=session,
+                llm_usage=solved_usage or claimed_usage,
+            )
+        except Exception:
+            if claimed_usage is not None:
+                plan_usage["usage"] = claimed_usage
+            raise
 
         return TestResponse(test_id=test_db.id, run_id=test_run_db.id)
 
@@ -317,9 +389,57 @@ async def run_background_tests(
     payload: TestSubmitPayload,
     current_user: User,
 ):
-    TEST_RUNS_JOBS_STORAGE[job_id]["status"] = "processing"
+    # A retried job resumes, copies with a recorded result are not submitted again
+    job = await job_store.get(job_id) or {}
+    previous_results = job.get("results") or []
+    already_processed = len(previous_results)
+    remaining = payload.quantity - already_processed
+    await job_store.update(
+        job_id, status=JobStatus.PROCESSING, processed_tests=already_processed
+    )
+    if already_processed:
+        logger.info(
+            "Resuming test batch",
+            extra={"job_id": job_id, "processed_tests": already_processed},
+        )
     sem = Semaphore(MAX_PARALLEL_TASKS)
 
+    # Solve the LLM part once per job, copies only redo random fills and the form POST
+    llm_answers_map, llm_usage = None, None
+    if not payload.diverse_llm_answers:
+        try:
+            llm_answers_map, llm_usage = await build_llm_answer_plan(
+                test_id=test_id, payload=payload, current_user=current_user
+            )
+        except Exception as e:
+            # Nothing is submitted yet, the worker retries the task with backoff and
+            # marks the job failed once it runs out of attempts
+            logger.error(
+                "Error building LLM answer plan",
+                extra={
+                    "test_id": test_id,
+                    "user_id": current_user.id,
+                    "job_id": job_id,
+                    "error": str(e),
+                },
+            )
+            await job_store.update(job_id, error=str(e))
+            raise
+
+    async def record_result(result: dict) -> None:
+        # A failing progress update must not cancel the other copies of the batch
+        try:
+            await job_store.append_result(job_id, result)
+            await job_store.increment(job_id, "processed_tests")
+        except Exception as e:
+            logger.error(
+                "Error recording test instance result",
+                extra={"job_id": job_id, "result": result, "error": str(e)},
+            )
+
+    # The plan is solved once, its usage is saved with one run so sums stay real
+    plan_usage = {"usage": llm_usage}
+
     async def worker():
         async with sem:
             try:
@@ -328,46 +448,40 @@ async def run_background_tests(
                     job_id=job_id,
                     payload=payload,
                     current_user=current_user,
-                )
-                TEST_RUNS_JOBS_STORAGE[job_id]["results"].append(
-                    JobResult(
-                        status=JobStatus.COMPLETED,
-                        run_id=result.run_id,
-                    )
-                )
-                logger.info(
-                    "Test submitted successfully",
-                    extra={
-                        "test_id": test_id,
-                        "user_id": current_user.id,
-                        "job_id": job_id,
-                        "run_id": result.run_id,
-                    },
+                    llm_answers_map=llm_answers_map,
+                    plan_usage=plan_usage,
                 )
             except Exception as e:
-                TEST_RUNS_JOBS_STORAGE[job_id]["results"].append(
-                    {
-                        "status": JobStatus.FAILED,
-                    }
-                )
                 logger.error(
                     "Error submitting test instance",
                     extra={
                         "test_id": test_id,
                         "user_id": current_user.id,
                         "job_id": job_id,
-                        "attempt": TEST_RUNS_JOBS_STORAGE[job_id]["processed_tests"],
                         "error": str(e),
                     },
                 )
-            finally:
-                TEST_RUNS_JOBS_STORAGE[job_id]["processed_tests"] += 1
+                await record_result({"status": JobStatus.FAILED})
+                return
+
+            logger.info(
+                "Test submitted successfully",
+                extra={
+                    "test_id": test_id,
+                    "user_id": current_user.id,
+                    "job_id": job_id,
+                    "run_id": result.run_id,
+                },
+            )
+            await record_result(
+                JobResult(status=JobStatus.COMPLETED, run_id=result.run_id).model_dump()
+            )
 
     async with TaskGroup() as tg:
-        for _ in range(payload.quantity):
+        for _ in range(remaining):
             tg.create_task(worker())
 
-    TEST_RUNS_JOBS_STORAGE[job_id]["status"] = JobStatus.COMPLETED
+    await job_store.update(job_id, status=JobStatus.COMPLETED, error=None)
 
 
 async def get_runs_of_test_db(
@@ -380,3 +494,26 @@ async def get_runs_of_test_db(
     )
     test_runs = list(result.scalars().all())
     return test_runs
+
+
+async def get_llm_usage_of_test_db(
+    test_id: int, current_user: User, db_session: AsyncSession
+) -> TestRunsLLMUsage:
+    """Aggregate token usage and timings of the runs of a test in one query."""
+    result = await db_session.execute(
+        Select(
+            func.count(TestRun.id).label("runs"),
+            func.count(TestRun.llm_model).label("llm_runs"),
+            func.coalesce(func.sum(TestRun.llm_prompt_tokens), 0).label(
+                "prompt_tokens"
+            ),
+            func.coalesce(func.sum(TestRun.llm_completion_tokens), 0).label(
+                "completion_tokens"
+            ),
+            func.avg(TestRun.llm_attempts).label("avg_attempts"),
+            func.avg(TestRun.llm_retrieval_time).label("avg_retrieval_time"),
+            func.avg(TestRun.llm_generation_time).label("avg_generation_time"),
+            func.avg(TestRun.llm_answering_time).label("avg_answering_time"),
+        ).where(TestRun.test_id == test_id, TestRun.user_id == current_user.id)
+    )
+    return TestRunsLLMUsage.model_validate(result.one()._asdict())
@@ -45,6 +45,14 @@ async def get_user_from_token(
     return user
 
 
+async def get_user_by_id(user_id: int, db_session: AsyncSession) -> User:
+    result = await db_session.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
+    if user is None:
+        raise NotFoundError("User does not exist")
+    return user
+
+
 async def get_user_tests_db(
     current_user: User,
     db_session: Annotated[AsyncSession, Depends(get_async_postgres_session)],
@@ -11,16 +11,87 @@ LOGGING_LEVEL: str = "DEBUG"
 MAX_PARALLEL_TASKS = 9
 ENV: str = os.getenv("ENV", "prod")
 
-TEST_RUNS_JOBS_STORAGE = {}
+# "postgres" shares jobs between workers and replicas, "memory" is for tests
+JOB_STORE_BACKEND: str = os.getenv("JOB_STORE_BACKEND", "postgres")
+JOB_TTL = 24 * 60 * 60  # 24 hours
+JOB_CLEANUP_INTERVAL = 10 * 60  # 10 minutes
+# Progress streams are woken up by NOTIFY, the poll is a fallback while the listener
+# connection is down
+JOB_STREAM_POLL_INTERVAL = 15.0  # seconds
+JOB_EVENTS_CHANNEL = "job_events"
+JOB_EVENTS_RECONNECT_INTERVAL = 5.0  # seconds
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+JOB_QUEUE_POLL_INTERVAL = 1.0  # seconds
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF = 5  # seconds, doubled on every attempt
+# Running tasks refresh their lock every heartbeat, tasks whose lock is older than
+# the timeout are considered abandoned by a crashed worker
+JOB_HEARTBEAT_INTERVAL = 30  # seconds
+JOB_LOCK_TIMEOUT = 5 * 60  # 5 minutes
+# Uploads are spooled here by the API and read by the worker, API and worker
+# nodes must mount the same directory (a shared volume)
+DOCUMENT_SPOOL_DIR: str = os.getenv("DOCUMENT_SPOOL_DIR", "/tmp/llmtesthelper/uploads")
 
-UPLOAD_DOCUMENT_JOBS_STORAGE = {}
-MAX_DOCUMENT_SIZE = 5 * 1024 * 1024  # 5 MB
+# Documents are spooled to disk and ingested page by page, not read into memory
+MAX_DOCUMENT_SIZE = 50 * 1024 * 1024  # 50 MB
 PDF_DOCUMENT_TYPE, TXT_DOCUMENT_TYPE = "application/pdf", "text/plain"
 ALLOWED_DOCUMENT_TYPES = [PDF_DOCUMENT_TYPE, TXT_DOCUMENT_TYPE]
+# PDF pages are extracted by a process pool, ranges of pages run in parallel
+PDF_EXTRACT_PROCESSES = int(os.getenv("PDF_EXTRACT_PROCESSES", "2"))
+PDF_PAGES_PER_TASK = 8
+PDF_EXTRACT_TIMEOUT = 5 * 60  # seconds waited for the pages of one document
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 50
+# Document chunks per COPY, every embedding batch is saved in one transaction
 BATCH_SIZE = 50
 EMBEDDING_DIM = 3072
+# Chunks per embeddings API call and how many calls of one document run at once
+EMBEDDING_BATCH_SIZE = 100
+EMBEDDING_MAX_CONCURRENT_BATCHES = 4
+EMBEDDING_MAX_ATTEMPTS = 4
+EMBEDDING_RETRY_BACKOFF = 2  # seconds, doubled on every attempt
+# "approximate" uses the HNSW index, "exact" scans every chunk of the test
+VECTOR_SEARCH_MODE: str = os.getenv("VECTOR_SEARCH_MODE", "approximate")
+# Candidates visited by an HNSW search, higher means better recall and slower queries
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "100"))
+# "per_question" searches the top chunks of every question in one query,
+# "combined" searches once with all questions joined into one text
+RETRIEVAL_MODE: str = os.getenv("RETRIEVAL_MODE", "per_question")
+RETRIEVAL_TOP_K_PER_QUESTION = 3
+RETRIEVAL_MAX_CHUNKS = 40
+# Large forms are solved in groups of questions, one LLM call per group, so no
+# prompt or answer gets near the model limits (tokens estimated from characters)
+LLM_GROUP_TOKEN_BUDGET = 2000
+LLM_GROUP_MAX_QUESTIONS = 15
+# Retrieved context beyond this many (estimated) tokens is left out of the prompt
+LLM_CONTEXT_TOKEN_BUDGET = 3000
+# "gemini" calls Google, "fake" answers locally for load tests without a network
+LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "gemini")
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.5"))
+FAKE_EMBEDDING_LATENCY = float(os.getenv("FAKE_EMBEDDING_LATENCY", "0.05"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+# Ask the provider for JSON matching the answer schema instead of describing it
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "true") == "true"
+# Process-wide limit of in-flight LLM requests
+LLM_MAX_CONCURRENT_CALLS = int(os.getenv("LLM_MAX_CONCURRENT_CALLS", "8"))
+LLM_ANSWER_CACHE_MAX_SIZE = 1024
+LLM_ANSWER_CACHE_TTL = 24 * 60 * 60  # 24 hours
+# Query embeddings are kept as float32 arrays in memory, about 12 KB each
+QUERY_EMBEDDING_CACHE_MAX_SIZE = 1024
+QUERY_EMBEDDING_CACHE_TTL = 30 * 24 * 60 * 60  # 30 days
+# Shared aiohttp session used for Google Forms requests
+HTTP_POOL_LIMIT = 100
+HTTP_POOL_LIMIT_PER_HOST = 30
+HTTP_KEEPALIVE_TIMEOUT = 30  # seconds
+HTTP_DNS_CACHE_TTL = 5 * 60  # 5 minutes
+HTTP_TIMEOUT = 30  # seconds
+GOOGLE_FORM_SUBMIT_TIMEOUT = 5  # seconds
+GOOGLE_FORM_FETCH_TIMEOUT = 10  # seconds
+# Parsed forms are served from memory while fresh, afterwards revalidated with
+# ETag / Last-Modified until they expire
+GOOGLE_FORM_CACHE_MAX_SIZE = 256
+GOOGLE_FORM_CACHE_FRESH_FOR = 5 * 60  # 5 minutes
+GOOGLE_FORM_CACHE_TTL = 60 * 60  # 1 hour
 
 
 class PostgresDBSettings(BaseSettings):
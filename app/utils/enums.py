@@ -6,3 +6,23 @@ class JobStatus(str, Enum):
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
+
+
+class JobKind(str, Enum):
+    TEST_RUN = "test_run"
+    DOCUMENT_UPLOAD = "document_upload"
+
+
+class VectorSearchMode(str, Enum):
+    APPROXIMATE = "approximate"
+    EXACT = "exact"
+
+
+class RetrievalMode(str, Enum):
+    COMBINED = "combined"
+    PER_QUESTION = "per_question"
+
+
+class LLMProviderName(str, Enum):
+    GEMINI = "gemini"
+    FAKE = "fake"
@@ -143,6 +143,15 @@ async def log_headers(request: Request) -> dict:
     return useful_headers
 
 
+# Only these bodies are read for logging, uploads and other bodies are streamed
+LOGGED_BODY_CONTENT_TYPES = ("application/json", "application/x-www-form-urlencoded")
+
+
+def is_logged_body(request: Request) -> bool:
+    content_type = request.headers.get("content-type", "")
+    return content_type.split(";")[0].strip() in LOGGED_BODY_CONTENT_TYPES
+
+
 @sanitize_result
 async def log_request_body(request: Request) -> Tuple[dict, bytes]:
     try:
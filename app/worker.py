@@ -0,0 +1,171 @@
+"""Job worker entrypoint: python -m app.worker --concurrency 4"""
+
+import argparse
+import asyncio
+import logging
+import signal
+import socket
+import uuid
+
+from app.database.postgres_config import postgres_db_engine
+from app.services.http_client import http_client
+from app.services.jobs.handlers import TASK_HANDLERS
+from app.services.jobs.queue import (
+    claim_next_task,
+    complete_task,
+    fail_task,
+    fail_abandoned_tasks,
+    heartbeat_task,
+)
+from app.services.jobs.store import job_store
+from app.services.tests.pdf_extraction import pdf_extraction_pool
+from app.settings import (
+    JOB_WORKER_CONCURRENCY,
+    JOB_QUEUE_POLL_INTERVAL,
+    JOB_HEARTBEAT_INTERVAL,
+)
+from app.utils.enums import JobKind, JobStatus
+from app.utils.logging import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorker:
+    """
+    Pulls test-run and document jobs from the job_queue table.
+    Every slot handles one task at a time, on shutdown the slots stop claiming
+    new tasks and wait for the running ones to finish. Running tasks keep their
+    lock alive with a heartbeat so other workers do not reclaim them.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = JOB_WORKER_CONCURRENCY,
+        poll_interval: float = JOB_QUEUE_POLL_INTERVAL,
+        heartbeat_interval: float = JOB_HEARTBEAT_INTERVAL,
+    ):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.worker_id = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        logger.info("Worker shutdown requested", extra={"worker_id": self.worker_id})
+        self._stopping.set()
+
+    async def run_task(self, task) -> None:
+        log_extra = {
+            "worker_id": self.worker_id,
+            "task_id": task.id,
+            "job_id": task.job_id,
+            "kind": task.kind,
+            "attempt": task.attempts,
+        }
+        logger.info("Task started", extra=log_extra)
+        heartbeat = asyncio.create_task(self.keep_lock(task.id))
+        try:
+            handler = TASK_HANDLERS[JobKind(task.kind)]
+            await handler(task)
+        except Exception as e:
+            will_retry = await fail_task(task.id, error=str(e))
+            logger.exception(
+                "Task failed", extra={**log_extra, "will_retry": will_retry}
+            )
+            if not will_retry:
+                await job_store.update(
+                    task.job_id, status=JobStatus.FAILED, error=str(e)
+                )
+            return
+        finally:
+            heartbeat.cancel()
+        await complete_task(task.id)
+        logger.info("Task completed", extra=log_extra)
+
+    async def keep_lock(self, task_id: int) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                if not await heartbeat_task(task_id, self.worker_id):
+                    logger.warning(
+                        "Task lock lost",
+                        extra={"worker_id": self.worker_id, "task_id": task_id},
+                    )
+            except Exception as e:
+                logger.error("Task heartbeat failed", extra={"error": str(e)})
+
+    async def reap_abandoned_tasks(self) -> None:
+        """Mark jobs of tasks that crashed their workers too many times as failed."""
+        while not self._stopping.is_set():
+            try:
+                for job_id in await fail_abandoned_tasks():
+                    await job_store.update(
+                        job_id,
+                        status=JobStatus.FAILED,
+                        error="Worker stopped responding",
+                    )
+            except Exception as e:
+                logger.error("Cannot fail abandoned tasks", extra={"error": str(e)})
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), timeout=self.heartbeat_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_slot(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                task = await claim_next_task(self.worker_id)
+            except Exception as e:
+                logger.error("Cannot claim task", extra={"error": str(e)})
+                task = None
+
+            if task is None:
+                try:
+                    await asyncio.wait_for(
+                        self._stopping.wait(), timeout=self.poll_interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self.run_task(task)
+
+    async def run(self) -> None:
+        logger.info(
+            "Worker started",
+            extra={"worker_id": self.worker_id, "concurrency": self.concurrency},
+        )
+        try:
+            async with asyncio.TaskGroup() as tg:
+                for _ in range(self.concurrency):
+                    tg.create_task(self.run_slot())
+                tg.create_task(self.reap_abandoned_tasks())
+        finally:
+            await http_client.close()
+            pdf_extraction_pool.close()
+            await postgres_db_engine.dispose()
+        logger.info("Worker stopped", extra={"worker_id": self.worker_id})
+
+
+async def main(concurrency: int) -> None:
+    worker = JobWorker(concurrency=concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    await worker.run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLMTestHelper job worker")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=JOB_WORKER_CONCURRENCY,
+        help="How many jobs this process runs at the same time",
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    asyncio.run(main(args.concurrency))
@@ -13,6 +13,11 @@ from app.database.models.orm.test import Test
 from app.database.models.orm.refresh_token import RefreshToken
 from app.database.models.orm.document import Document
 from app.database.models.orm.document_embedding import DocumentEmbedding
+from app.database.models.orm.chunk_embedding import ChunkEmbedding
+from app.database.models.orm.llm_answer_cache import LLMAnswerCacheEntry
+from app.database.models.orm.query_embedding_cache import QueryEmbeddingCacheEntry
+from app.database.models.orm.job import Job
+from app.database.models.orm.queued_task import QueuedTask
 
 load_dotenv()
 # Alembic Config object
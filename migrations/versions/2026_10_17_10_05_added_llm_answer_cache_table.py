@@ -0,0 +1,55 @@
+"""Added llm answer cache table
+
+Revision ID: 3c1f7a9e2b40
+Revises: 9fdccdd9faa6
+Create Date: 2026-10-17 10:05:12.418305
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+# revision identifiers, used by Alembic.
+revision: str = "3c1f7a9e2b40"
+down_revision: Union[str, Sequence[str], None] = "9fdccdd9faa6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "llm_answer_cache",
+        sa.Column("cache_key", sa.String(), nullable=False),
+        sa.Column("llm_model", sa.String(), nullable=False),
+        sa.Column("answers", JSONB(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("cache_key"),
+    )
+    op.create_index(
+        op.f("ix_llm_answer_cache_expires_at"),
+        "llm_answer_cache",
+        ["expires_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_llm_answer_cache_expires_at"), table_name="llm_answer_cache")
+    op.drop_table("llm_answer_cache")
@@ -0,0 +1,43 @@
+"""Store document embeddings as halfvec with an HNSW index
+
+Revision ID: c81d5f3a9e27
+Revises: a4e9c27d61f8
+Create Date: 2026-10-17 13:30:41.508112
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c81d5f3a9e27"
+down_revision: Union[str, Sequence[str], None] = "a4e9c27d61f8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# HNSW indexes support up to 2000 dimensions for vector and 4000 for halfvec
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "ALTER TABLE document_embeddings "
+        "ALTER COLUMN embedding TYPE halfvec(3072) USING embedding::halfvec(3072)"
+    )
+    op.execute(
+        "CREATE INDEX ix_document_embeddings_embedding_hnsw "
+        "ON document_embeddings USING hnsw (embedding halfvec_l2_ops) "
+        f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_document_embeddings_embedding_hnsw")
+    op.execute(
+        "ALTER TABLE document_embeddings "
+        "ALTER COLUMN embedding TYPE vector(3072) USING embedding::vector(3072)"
+    )
@@ -0,0 +1,124 @@
+"""Share chunk embeddings between documents by content hash
+
+Revision ID: e5b2d7a41c93
+Revises: c81d5f3a9e27
+Create Date: 2026-10-17 14:15:27.903614
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import HALFVEC
+
+# revision identifiers, used by Alembic.
+revision: str = "e5b2d7a41c93"
+down_revision: Union[str, Sequence[str], None] = "c81d5f3a9e27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Existing rows were embedded with this model, must match get_chunk_content_hash
+EMBEDDINGS_MODEL = "gemini-embedding-001"
+EMBEDDING_DIM = 3072
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+
+CONTENT_HASH_SQL = (
+    "encode(sha256(convert_to("
+    f"'{EMBEDDINGS_MODEL}:{EMBEDDING_DIM}:' || document_embeddings.chunk_text, "
+    "'UTF8')), 'hex')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "chunk_embeddings",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("content_hash", sa.String(), nullable=False),
+        sa.Column("embeddings_model", sa.String(), nullable=False),
+        sa.Column("dimensions", sa.Integer(), nullable=False),
+        sa.Column("embedding", HALFVEC(EMBEDDING_DIM), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("content_hash"),
+    )
+    op.execute(
+        "INSERT INTO chunk_embeddings (content_hash, embeddings_model, dimensions, "
+        "embedding) "
+        f"SELECT DISTINCT ON ({CONTENT_HASH_SQL}) {CONTENT_HASH_SQL}, "
+        f"'{EMBEDDINGS_MODEL}', {EMBEDDING_DIM}, embedding "
+        "FROM document_embeddings"
+    )
+
+    op.add_column(
+        "document_embeddings", sa.Column("embedding_id", sa.Integer(), nullable=True)
+    )
+    op.execute(
+        "UPDATE document_embeddings SET embedding_id = chunk_embeddings.id "
+        "FROM chunk_embeddings "
+        f"WHERE chunk_embeddings.content_hash = {CONTENT_HASH_SQL}"
+    )
+    op.alter_column("document_embeddings", "embedding_id", nullable=False)
+    op.create_foreign_key(
+        "document_embeddings_embedding_id_fkey",
+        "document_embeddings",
+        "chunk_embeddings",
+        ["embedding_id"],
+        ["id"],
+    )
+    op.create_index(
+        op.f("ix_document_embeddings_embedding_id"),
+        "document_embeddings",
+        ["embedding_id"],
+        unique=False,
+    )
+    op.execute("DROP INDEX IF EXISTS ix_document_embeddings_embedding_hnsw")
+    op.drop_column("document_embeddings", "embedding")
+
+    op.execute(
+        "CREATE INDEX ix_chunk_embeddings_embedding_hnsw "
+        "ON chunk_embeddings USING hnsw (embedding halfvec_l2_ops) "
+        f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column(
+        "document_embeddings",
+        sa.Column("embedding", HALFVEC(EMBEDDING_DIM), nullable=True),
+    )
+    op.execute(
+        "UPDATE document_embeddings SET embedding = chunk_embeddings.embedding "
+        "FROM chunk_embeddings "
+        "WHERE chunk_embeddings.id = document_embeddings.embedding_id"
+    )
+    op.alter_column("document_embeddings", "embedding", nullable=False)
+    op.execute(
+        "CREATE INDEX ix_document_embeddings_embedding_hnsw "
+        "ON document_embeddings USING hnsw (embedding halfvec_l2_ops) "
+        f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})"
+    )
+    op.drop_index(
+        op.f("ix_document_embeddings_embedding_id"), table_name="document_embeddings"
+    )
+    op.drop_constraint(
+        "document_embeddings_embedding_id_fkey",
+        "document_embeddings",
+        type_="foreignkey",
+    )
+    op.drop_column("document_embeddings", "embedding_id")
+    op.drop_table("chunk_embeddings")
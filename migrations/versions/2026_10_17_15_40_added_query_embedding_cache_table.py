@@ -0,0 +1,57 @@
+"""Added query embedding cache table
+
+Revision ID: 2f8a6c1d9b57
+Revises: e5b2d7a41c93
+Create Date: 2026-10-17 15:40:09.215873
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import HALFVEC
+
+# revision identifiers, used by Alembic.
+revision: str = "2f8a6c1d9b57"
+down_revision: Union[str, Sequence[str], None] = "e5b2d7a41c93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "query_embedding_cache",
+        sa.Column("cache_key", sa.String(), nullable=False),
+        sa.Column("embeddings_model", sa.String(), nullable=False),
+        sa.Column("embedding", HALFVEC(3072), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("cache_key"),
+    )
+    op.create_index(
+        op.f("ix_query_embedding_cache_expires_at"),
+        "query_embedding_cache",
+        ["expires_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f("ix_query_embedding_cache_expires_at"), table_name="query_embedding_cache"
+    )
+    op.drop_table("query_embedding_cache")
@@ -0,0 +1,36 @@
+"""Added LLM usage columns to test runs
+
+Revision ID: 7d3e9b1a4c62
+Revises: 2f8a6c1d9b57
+Create Date: 2026-10-17 16:30:41.508213
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "7d3e9b1a4c62"
+down_revision: Union[str, Sequence[str], None] = "2f8a6c1d9b57"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("test_runs", sa.Column("llm_attempts", sa.Integer(), nullable=True))
+    op.add_column(
+        "test_runs", sa.Column("llm_retrieval_time", sa.Float(), nullable=True)
+    )
+    op.add_column(
+        "test_runs", sa.Column("llm_generation_time", sa.Float(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("test_runs", "llm_generation_time")
+    op.drop_column("test_runs", "llm_retrieval_time")
+    op.drop_column("test_runs", "llm_attempts")
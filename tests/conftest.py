@@ -1,10 +1,11 @@
 import pytest
 import pytest_asyncio
-from unittest.mock import AsyncMock, MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 from httpx import AsyncClient, ASGITransport
 
 from app.database.models.orm.user import User
 from app.database.postgres_config import get_async_postgres_session
+from app.services.jobs.store import InMemoryJobStore
 from app.services.users import get_user_from_token
 
 
@@ -35,6 +36,26 @@ def mock_db() -> AsyncMock:
     return session
 
 
+JOB_STORE_IMPORT_PATHS = [
+    "app.controllers.tests.job_store",
+    "app.services.tests.tests.job_store",
+    "app.services.tests.documents.job_store",
+    "app.services.llm.embeddings.job_store",
+    "app.services.jobs.progress.job_store",
+]
+
+
+@pytest.fixture
+def memory_job_store() -> InMemoryJobStore:
+    store = InMemoryJobStore()
+    patchers = [patch(path, store) for path in JOB_STORE_IMPORT_PATHS]
+    for patcher in patchers:
+        patcher.start()
+    yield store
+    for patcher in patchers:
+        patcher.stop()
+
+
 @pytest.fixture
 def registration_payload() -> dict:
     return {
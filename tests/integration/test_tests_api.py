@@ -3,6 +3,7 @@ from unittest.mock import MagicMock, patch
 from datetime import datetime, UTC
 
 from app.schemas.tests.test import TestQuestions, QuestionStructure, QuestionType
+from app.utils.enums import JobKind
 
 
 class TestGetTestEndpoint:
@@ -52,25 +53,24 @@ class TestGetTestEndpoint:
 class TestSubmitStatusEndpoint:
 
     @pytest.mark.asyncio
-    @patch("app.controllers.tests.TEST_RUNS_JOBS_STORAGE", {})
-    async def test_status_not_found(self, client):
+    async def test_status_not_found(self, client, memory_job_store):
         response = await client.get("/api/v1/tests/submit-status/nonexistent-job")
 
         assert response.status_code == 404
 
     @pytest.mark.asyncio
-    @patch(
-        "app.controllers.tests.TEST_RUNS_JOBS_STORAGE",
-        {
-            "job-abc": {
+    async def test_status_processing(self, client, memory_job_store):
+        await memory_job_store.create(
+            "job-abc",
+            kind=JobKind.TEST_RUN,
+            data={
                 "status": "processing",
                 "processed_tests": 1,
                 "total_tests": 3,
                 "results": [],
-            }
-        },
-    )
-    async def test_status_processing(self, client):
+            },
+        )
+
         response = await client.get("/api/v1/tests/submit-status/job-abc")
 
         assert response.status_code == 200
@@ -78,3 +78,29 @@ class TestSubmitStatusEndpoint:
         assert body["status"] == "processing"
         assert body["processed_runs_count"] == 1
         assert body["total_runs"] == 3
+
+    @pytest.mark.asyncio
+    async def test_status_stream_of_finished_job(self, client, memory_job_store):
+        await memory_job_store.create(
+            "job-done",
+            kind=JobKind.TEST_RUN,
+            data={
+                "status": "completed",
+                "processed_tests": 1,
+                "total_tests": 1,
+                "results": [{"run_id": 5, "status": "completed"}],
+            },
+        )
+
+        response = await client.get("/api/v1/tests/submit-status/job-done/stream")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert "event: progress" in response.text
+        assert '"run_id": 5' in response.text
+
+    @pytest.mark.asyncio
+    async def test_status_stream_not_found(self, client, memory_job_store):
+        response = await client.get("/api/v1/tests/submit-status/missing/stream")
+
+        assert response.status_code == 404
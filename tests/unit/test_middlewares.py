@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from app.middlewares import LoggingMiddleware
+
+
+def make_scope(content_type: str) -> dict:
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": "/upload",
+        "raw_path": b"/upload",
+        "query_string": b"",
+        "headers": [(b"content-type", content_type.encode())],
+        "client": ("127.0.0.1", 1234),
+        "server": ("testserver", 80),
+        "scheme": "http",
+    }
+
+
+def make_receive(chunks: list[bytes]):
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+
+    async def receive():
+        received.append(messages[len(received)])
+        return received[-1]
+
+    received = []
+    receive.received = received
+    return receive
+
+
+async def read_body_app(scope, receive, send):
+    """Endpoint stub answering with the sizes of the body messages it read."""
+    sizes = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        sizes.append(len(message["body"]))
+        more_body = message["more_body"]
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": json.dumps(sizes).encode()})
+
+
+async def run_request(content_type: str, chunks: list[bytes]) -> tuple[list, list]:
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    receive = make_receive(chunks)
+    await LoggingMiddleware(read_body_app)(make_scope(content_type), receive, send)
+    return json.loads(sent[-1]["body"]), receive.received
+
+
+class TestLoggingMiddleware:
+
+    @pytest.mark.asyncio
+    async def test_multipart_body_is_streamed_to_the_endpoint(self):
+        sizes, received = await run_request(
+            "multipart/form-data; boundary=x", [b"a" * 10, b"b" * 20]
+        )
+
+        # The endpoint reads the upload message by message, nothing is buffered
+        assert sizes == [10, 20]
+        assert len(received) == 2
+
+    @pytest.mark.asyncio
+    async def test_json_body_is_replayed_after_logging(self):
+        sizes, _ = await run_request("application/json", [b'{"a":', b" 1}"])
+
+        assert sizes == [8]
@@ -0,0 +1,141 @@
+import json
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from unittest.mock import patch
+
+from app.parsers.google_form import (
+    extract_script_variables,
+    fetch_form_data,
+    form_data_cache,
+    normalize_form_url,
+    parse_entries,
+)
+from app.services.http_client import HTTPClient
+
+FORMS_CORPUS_DIR = Path(__file__).parent.parent / "fixtures" / "google_forms"
+FORM_PAGES = sorted(FORMS_CORPUS_DIR.glob("*.html"))
+
+FORM_DATA = [None, [None, [[1, "Capital of France?", None, 2, [[10, [["Paris"]], 1]]]]]]
+
+
+@pytest.fixture
+async def form_server():
+    """Serves a form page with an ETag and answers conditional requests with 304."""
+    requests_seen = []
+
+    async def view_form(request: web.Request) -> web.Response:
+        requests_seen.append(dict(request.headers))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        html = f"<script>var FB_PUBLIC_LOAD_DATA_ = {json.dumps(FORM_DATA)};</script>"
+        return web.Response(
+            text=html, content_type="text/html", headers={"ETag": '"v1"'}
+        )
+
+    app = web.Application()
+    app.router.add_get("/forms/d/e/abc/formResponse", view_form)
+    server = TestServer(app)
+    await server.start_server()
+    server.requests_seen = requests_seen
+    yield server
+    await server.close()
+
+
+@pytest.fixture
+async def shared_http_client():
+    http_client = HTTPClient()
+    form_data_cache.clear()
+    with patch("app.parsers.google_form.http_client", http_client):
+        yield http_client
+    form_data_cache.clear()
+    await http_client.close()
+
+
+class TestExtractScriptVariables:
+
+    @pytest.mark.parametrize("page", FORM_PAGES, ids=lambda page: page.stem)
+    def test_extracts_saved_form_pages(self, page):
+        expected = json.loads(page.with_suffix(".json").read_text(encoding="utf-8"))
+
+        data = extract_script_variables(
+            "FB_PUBLIC_LOAD_DATA_", page.read_text(encoding="utf-8")
+        )
+
+        assert data == expected
+        assert parse_entries(data)
+
+    def test_semicolons_and_brackets_inside_strings(self):
+        html = (
+            'var FB_PUBLIC_LOAD_DATA_ = [null, ["a; b", "]\\"; {"]];'
+            "var OTHER = 1;</script>"
+        )
+
+        assert extract_script_variables("FB_PUBLIC_LOAD_DATA_", html) == [
+            None,
+            ["a; b", ']"; {'],
+        ]
+
+    @pytest.mark.parametrize("page", FORM_PAGES[:1], ids=lambda page: page.stem)
+    def test_works_without_orjson(self, page):
+        html = page.read_text(encoding="utf-8")
+
+        with patch("app.parsers.google_form.json_loads", json.loads):
+            data = extract_script_variables("FB_PUBLIC_LOAD_DATA_", html)
+
+        assert data == json.loads(page.with_suffix(".json").read_text("utf-8"))
+
+    def test_missing_or_broken_variable(self):
+        assert extract_script_variables("FB_PUBLIC_LOAD_DATA_", "<html/>") is None
+        assert (
+            extract_script_variables(
+                "FB_PUBLIC_LOAD_DATA_", "var FB_PUBLIC_LOAD_DATA_ = [1,"
+            )
+            is None
+        )
+
+
+class TestNormalizeFormUrl:
+
+    def test_view_and_response_urls_share_a_key(self):
+        assert normalize_form_url(
+            "https://DOCS.google.com/forms/d/e/abc/viewform?usp=sf_link#top"
+        ) == normalize_form_url("https://docs.google.com/forms/d/e/abc/formResponse")
+
+
+class TestFetchFormData:
+
+    @pytest.mark.asyncio
+    async def test_fresh_form_is_served_from_cache(
+        self, form_server, shared_http_client
+    ):
+        url = str(form_server.make_url("/forms/d/e/abc/viewform"))
+
+        assert await fetch_form_data(url) == FORM_DATA
+        assert await fetch_form_data(url + "?usp=sf_link") == FORM_DATA
+
+        assert len(form_server.requests_seen) == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_form_is_revalidated_with_etag(
+        self, form_server, shared_http_client
+    ):
+        url = str(form_server.make_url("/forms/d/e/abc/viewform"))
+
+        with patch("app.parsers.google_form.GOOGLE_FORM_CACHE_FRESH_FOR", 0):
+            await fetch_form_data(url)
+            result = await fetch_form_data(url)
+
+        assert result == FORM_DATA
+        assert len(form_server.requests_seen) == 2
+        assert form_server.requests_seen[1]["If-None-Match"] == '"v1"'
+
+    @pytest.mark.asyncio
+    async def test_returns_none_for_unavailable_form(
+        self, form_server, shared_http_client
+    ):
+        url = str(form_server.make_url("/forms/d/e/missing/viewform"))
+
+        assert await fetch_form_data(url) is None
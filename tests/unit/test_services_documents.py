@@ -0,0 +1,364 @@
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+from sqlalchemy.dialects import postgresql
+from starlette.datastructures import Headers
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.llm.embeddings import get_chunk_content_hash
+from app.services.tests.documents import (
+    delete_orphan_chunk_embeddings,
+    embed_and_save_chunks,
+    stream_document_chunks,
+    process_document_job,
+    save_document_embeddings,
+    spool_document,
+)
+from app.settings import PDF_DOCUMENT_TYPE, TXT_DOCUMENT_TYPE
+from app.utils.enums import JobKind, JobStatus
+from app.utils.exception_types import WrongRequestError
+
+
+async def as_batches(*items):
+    for item in items:
+        yield item
+
+
+def make_upload(content: bytes) -> UploadFile:
+    # No size, like a chunked upload without Content-Length
+    return UploadFile(
+        file=io.BytesIO(content),
+        filename="lecture.pdf",
+        headers=Headers({"content-type": PDF_DOCUMENT_TYPE}),
+    )
+
+
+class TestSpoolDocument:
+
+    @pytest.mark.asyncio
+    async def test_copies_upload_to_spool_dir(self, tmp_path):
+        with patch("app.services.tests.documents.DOCUMENT_SPOOL_DIR", str(tmp_path)):
+            document_path = await spool_document(make_upload(b"%PDF-1.4"), "job-1")
+
+        assert document_path == os.path.join(tmp_path, "job-1")
+        with open(document_path, "rb") as spooled:
+            assert spooled.read() == b"%PDF-1.4"
+
+    @pytest.mark.asyncio
+    async def test_enforces_size_limit_while_copying(self, tmp_path):
+        with (
+            patch("app.services.tests.documents.DOCUMENT_SPOOL_DIR", str(tmp_path)),
+            patch("app.services.tests.documents.MAX_DOCUMENT_SIZE", 10),
+            patch("app.services.tests.documents.SPOOL_READ_SIZE", 4),
+        ):
+            with pytest.raises(WrongRequestError):
+                await spool_document(make_upload(b"x" * 20), "job-1")
+
+        assert not os.path.exists(os.path.join(tmp_path, "job-1"))
+
+
+class TestStreamDocumentChunks:
+
+    @pytest.mark.asyncio
+    async def test_decodes_text_split_inside_a_character(self, tmp_path):
+        document_path = tmp_path / "notes.txt"
+        document_path.write_bytes("añb".encode())
+
+        with patch("app.services.tests.documents.TEXT_BLOCK_SIZE", 2):
+            batches = [
+                batch
+                async for batch in stream_document_chunks(
+                    str(document_path), TXT_DOCUMENT_TYPE
+                )
+            ]
+
+        assert batches == [["añb"]]
+
+    @pytest.mark.asyncio
+    async def test_text_blocks_do_not_split_words(self, tmp_path):
+        document_path = tmp_path / "notes.txt"
+        document_path.write_bytes(b"first line\nsecond line")
+
+        with patch("app.services.tests.documents.TEXT_BLOCK_SIZE", 4):
+            batches = [
+                batch
+                async for batch in stream_document_chunks(
+                    str(document_path), TXT_DOCUMENT_TYPE
+                )
+            ]
+
+        assert batches == [["first line\nsecond line"]]
+
+    @pytest.mark.asyncio
+    @patch("app.services.llm.embeddings.CHUNK_OVERLAP", 0)
+    @patch("app.services.llm.embeddings.CHUNK_SIZE", 12)
+    @patch("app.services.tests.documents.extract_pdf_pages")
+    async def test_batches_chunks_of_pdf_pages(self, mock_pages, tmp_path):
+        mock_pages.return_value = as_batches("one two three four", "five six", "seven")
+
+        batches = [
+            batch
+            async for batch in stream_document_chunks(
+                str(tmp_path / "lecture.pdf"), PDF_DOCUMENT_TYPE, batch_size=3
+            )
+        ]
+
+        assert batches == [["one two", "three four", "five six"], ["seven"]]
+
+
+class TestSaveDocumentEmbeddings:
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.documents.register_vector", new_callable=AsyncMock)
+    @patch("app.services.tests.documents.connect_raw_postgres", new_callable=AsyncMock)
+    async def test_copies_rows_in_batches(self, mock_connect, mock_register):
+        connection = MagicMock()
+        connection.close = AsyncMock()
+        connection.copy_records_to_table = AsyncMock()
+        connection.fetch = AsyncMock(
+            return_value=[{"content_hash": f"h{i}", "id": 100 + i} for i in range(5)]
+        )
+        mock_connect.return_value = connection
+        chunks = [f"chunk {i}" for i in range(5)]
+        content_hashes = [f"h{i}" for i in range(5)]
+
+        await save_document_embeddings(
+            7, list(range(10, 15)), chunks, content_hashes, {}, batch_size=2
+        )
+
+        mock_register.assert_awaited_once_with(connection)
+        batches = [
+            call.kwargs["records"]
+            for call in connection.copy_records_to_table.await_args_list
+        ]
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert batches[0][0] == (7, 10, "chunk 0", 100)
+        assert batches[2][0] == (7, 14, "chunk 4", 104)
+        # Shared vectors stay locked against the orphan cleanup until committed
+        assert "FOR KEY SHARE" in connection.fetch.await_args.args[0]
+        connection.close.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.documents.register_vector", new_callable=AsyncMock)
+    @patch("app.services.tests.documents.connect_raw_postgres", new_callable=AsyncMock)
+    async def test_merges_new_vectors_into_shared_store(
+        self, mock_connect, _mock_register
+    ):
+        connection = MagicMock()
+        connection.close = AsyncMock()
+        connection.execute = AsyncMock()
+        connection.copy_records_to_table = AsyncMock()
+        connection.fetch = AsyncMock(return_value=[{"content_hash": "h0", "id": 1}])
+        mock_connect.return_value = connection
+
+        await save_document_embeddings(7, [0], ["chunk"], ["h0"], {"h0": [0.5]})
+
+        first_copy = connection.copy_records_to_table.await_args_list[0]
+        assert first_copy.args[0] == "new_chunk_embeddings"
+        assert first_copy.kwargs["records"] == [("h0", [0.5])]
+        insert_sql = connection.execute.await_args_list[-1].args[0]
+        assert "ON CONFLICT (content_hash) DO NOTHING" in insert_sql
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.documents.register_vector", new_callable=AsyncMock)
+    @patch("app.services.tests.documents.connect_raw_postgres", new_callable=AsyncMock)
+    async def test_closes_connection_on_failure(self, mock_connect, _mock_register):
+        connection = MagicMock()
+        connection.close = AsyncMock()
+        connection.fetch = AsyncMock(side_effect=ConnectionError("reset"))
+        mock_connect.return_value = connection
+
+        with pytest.raises(ConnectionError):
+            await save_document_embeddings(7, [0], ["chunk"], ["h0"], {})
+
+        connection.close.assert_awaited_once()
+
+
+class TestDeleteOrphanChunkEmbeddings:
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.documents.async_postgres_session")
+    async def test_skips_vectors_locked_by_an_ingest(self, mock_session, mock_db):
+        mock_session.return_value.__aenter__.return_value = mock_db
+        mock_db.execute = AsyncMock(return_value=MagicMock(rowcount=3))
+
+        removed = await delete_orphan_chunk_embeddings()
+
+        assert removed == 3
+        sql = str(
+            mock_db.execute.await_args.args[0].compile(dialect=postgresql.dialect())
+        )
+        assert "DELETE FROM chunk_embeddings" in sql
+        assert "NOT (EXISTS (SELECT" in sql
+        assert "FOR UPDATE SKIP LOCKED" in sql
+        mock_db.commit.assert_awaited_once()
+
+
+class TestEmbedAndSaveChunks:
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.documents.find_shared_embeddings", return_value={})
+    @patch("app.services.tests.documents.save_document_embeddings")
+    @patch("app.services.tests.documents.generate_embeddings")
+    async def test_saves_and_reports_every_batch(
+        self, mock_embeddings, mock_save, _mock_shared, memory_job_store
+    ):
+        await memory_job_store.create(
+            "job-1", kind=JobKind.DOCUMENT_UPLOAD, data={"processed_chunks": 0}
+        )
+        mock_embeddings.side_effect = lambda chunks: [[0.5]] * len(chunks)
+        chunk_batches = as_batches(["c0", "c1"], ["c2", "c3"], ["c4"])
+
+        chunk_count = await embed_and_save_chunks("job-1", 3, chunk_batches)
+
+        assert chunk_count == 5
+        assert mock_embeddings.await_count == 3
+        saved_indexes = sorted(
+            index for call in mock_save.await_args_list for index in call.args[1]
+        )
+        assert saved_indexes == [0, 1, 2, 3, 4]
+        job = await memory_job_store.get("job-1")
+        assert job["processed_chunks"] == 5
+        assert job["total_chunks"] == 5
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.documents.find_shared_embeddings")
+    @patch("app.services.tests.documents.save_document_embeddings")
+    @patch("app.services.tests.documents.generate_embeddings")
+    async def test_embeds_only_new_chunk_texts(
+        self, mock_embeddings, mock_save, mock_shared, memory_job_store
+    ):
+        known_hash = get_chunk_content_hash("known")
+        mock_shared.return_value = {known_hash: 1}
+        mock_embeddings.return_value = [[0.5]]
+
+        await embed_and_save_chunks("job-1", 3, as_batches(["known", "new", "new"]))
+
+        mock_embeddings.assert_awaited_once_with(["new"])
+        _, chunk_indexes, _, content_hashes, new_embeddings = mock_save.await_args.args
+        assert chunk_indexes == [0, 1, 2]
+        assert content_hashes[0] == known_hash
+        assert new_embeddings == {get_chunk_content_hash("new"): [0.5]}
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.documents.find_shared_embeddings", return_value={})
+    @patch("app.services.tests.documents.save_document_embeddings")
+    @patch("app.services.tests.documents.generate_embeddings")
+    async def test_limits_concurrent_batches(
+        self, mock_embeddings, _mock_save, _mock_shared, memory_job_store
+    ):
+        running = 0
+        max_running = 0
+
+        async def embed(chunks):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return [[0.5]] * len(chunks)
+
+        mock_embeddings.side_effect = embed
+        chunk_batches = as_batches(*([f"chunk {i}"] for i in range(10)))
+
+        await embed_and_save_chunks("job-1", 3, chunk_batches, max_concurrent_batches=3)
+
+        assert max_running == 3
+
+
+class TestProcessDocumentJob:
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.documents.find_shared_embeddings", return_value={})
+    @patch("app.services.tests.documents.save_document_embeddings")
+    @patch("app.services.tests.documents.generate_embeddings")
+    @patch("app.services.tests.documents.get_saved_chunk_indexes")
+    @patch("app.services.tests.documents.stream_document_chunks")
+    @patch("app.services.tests.documents.async_postgres_session")
+    async def test_retry_embeds_only_missing_chunks(
+        self,
+        mock_session,
+        mock_chunks,
+        mock_saved,
+        mock_embeddings,
+        mock_save,
+        _mock_shared,
+        tmp_path,
+        mock_db,
+        memory_job_store,
+    ):
+        document_path = tmp_path / "job-1"
+        document_path.write_bytes(b"some text")
+        await memory_job_store.create(
+            "job-1", kind=JobKind.DOCUMENT_UPLOAD, data={"document_id": 3}
+        )
+        mock_session.return_value.__aenter__.return_value = mock_db
+        mock_chunks.return_value = as_batches(["a", "b"], ["c"])
+        # Batches finish out of order, the failed run saved the last batch only
+        mock_saved.return_value = {2}
+        mock_embeddings.return_value = [[0.5], [0.6]]
+
+        result = await process_document_job(
+            job_id="job-1",
+            test_id=1,
+            user_id=1,
+            document_path=str(document_path),
+            file_name="notes.txt",
+            content_type=TXT_DOCUMENT_TYPE,
+            scope="test",
+        )
+
+        assert result == (3, 3)
+        mock_db.add.assert_not_called()
+        mock_embeddings.assert_awaited_once_with(["a", "b"])
+        content_hashes = [get_chunk_content_hash("a"), get_chunk_content_hash("b")]
+        mock_save.assert_awaited_once_with(
+            3,
+            [0, 1],
+            ["a", "b"],
+            content_hashes,
+            dict(zip(content_hashes, [[0.5], [0.6]])),
+        )
+        job = await memory_job_store.get("job-1")
+        assert job["status"] == JobStatus.COMPLETED
+        assert job["document_id"] == 3
+        assert job["processed_chunks"] == 3
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.documents.stream_document_chunks")
+    @patch("app.services.tests.documents.get_saved_chunk_indexes", return_value=set())
+    @patch("app.services.tests.documents.async_postgres_session")
+    async def test_failure_leaves_final_status_to_the_worker(
+        self,
+        mock_session,
+        _mock_saved,
+        mock_chunks,
+        tmp_path,
+        mock_db,
+        memory_job_store,
+    ):
+        document_path = tmp_path / "job-1"
+        document_path.write_bytes(b"some text")
+        await memory_job_store.create(
+            "job-1", kind=JobKind.DOCUMENT_UPLOAD, data={"document_id": 3}
+        )
+        mock_session.return_value.__aenter__.return_value = mock_db
+        mock_chunks.side_effect = TimeoutError("PDF text extraction took too long")
+
+        with pytest.raises(TimeoutError):
+            await process_document_job(
+                job_id="job-1",
+                test_id=1,
+                user_id=1,
+                document_path=str(document_path),
+                file_name="notes.txt",
+                content_type=TXT_DOCUMENT_TYPE,
+                scope="test",
+            )
+
+        job = await memory_job_store.get("job-1")
+        assert job["status"] == JobStatus.PROCESSING
+        assert job["error"] == "PDF text extraction took too long"
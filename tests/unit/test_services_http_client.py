@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from unittest.mock import MagicMock, patch
+
+from app.services.http_client import HTTPClient
+from app.services.tests.tests import submit_results_to_google_form
+from app.utils.exception_types import ServerError
+
+
+@pytest.fixture
+async def form_stub_server():
+    """Local stand-in for Google Forms that records the connections it accepted."""
+    connections = set()
+
+    async def form_response(request: web.Request) -> web.Response:
+        connections.add(id(request.transport))
+        status = 500 if request.path.startswith("/broken") else 200
+        return web.Response(status=status, text="ok")
+
+    app = web.Application()
+    app.router.add_post("/{path:.*}", form_response)
+    server = TestServer(app)
+    await server.start_server()
+    server.connections = connections
+    yield server
+    await server.close()
+
+
+@pytest.fixture
+async def shared_http_client():
+    http_client = HTTPClient()
+    with patch("app.services.tests.tests.http_client", http_client):
+        yield http_client
+    await http_client.close()
+
+
+class TestSubmitResultsToGoogleForm:
+
+    @pytest.mark.asyncio
+    async def test_submissions_reuse_pooled_connections(
+        self, form_stub_server, shared_http_client
+    ):
+        test_db = MagicMock(id=1, url=str(form_stub_server.make_url("/form/viewform")))
+
+        for _ in range(20):
+            await submit_results_to_google_form(test_db, {"entry.1": "a"}, user_id=1)
+        await asyncio.gather(
+            *(
+                submit_results_to_google_form(test_db, {"entry.1": "a"}, user_id=1)
+                for _ in range(5)
+            )
+        )
+
+        assert len(form_stub_server.connections) <= 5
+
+    @pytest.mark.asyncio
+    async def test_raises_on_rejected_submission(
+        self, form_stub_server, shared_http_client
+    ):
+        test_db = MagicMock(
+            id=1, url=str(form_stub_server.make_url("/broken/viewform"))
+        )
+
+        with pytest.raises(ServerError):
+            await submit_results_to_google_form(test_db, {}, user_id=1)
+
+
+class TestHTTPClient:
+
+    @pytest.mark.asyncio
+    async def test_session_is_shared_and_reopened_after_close(self):
+        http_client = HTTPClient()
+        session = http_client.session
+
+        assert http_client.session is session
+        await http_client.close()
+        assert session.closed
+        assert http_client.session is not session
+        await http_client.close()
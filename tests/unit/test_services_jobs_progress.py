@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+from unittest.mock import patch
+
+from app.services.jobs.events import JobEventBroker
+from app.services.jobs.progress import stream_job_progress
+from app.utils.enums import JobKind, JobStatus
+
+
+def parse_events(raw_events: list[str]) -> list[tuple[str, dict]]:
+    parsed = []
+    for raw_event in raw_events:
+        event_line, data_line = raw_event.strip().split("\n")
+        parsed.append(
+            (event_line.removeprefix("event: "), json.loads(data_line[len("data: ") :]))
+        )
+    return parsed
+
+
+class TestJobEventBroker:
+
+    @pytest.mark.asyncio
+    async def test_publish_wakes_up_subscribers_of_the_job(self):
+        broker = JobEventBroker()
+
+        async with broker.subscribe("job-1") as queue_1:
+            async with broker.subscribe("job-2") as queue_2:
+                broker.publish("job-1", {"processed_tests": 1})
+
+                assert queue_1.get_nowait() == {"processed_tests": 1}
+                assert queue_2.empty()
+
+        broker.publish("job-1")
+
+
+class TestStreamJobProgress:
+
+    @pytest.mark.asyncio
+    async def test_streams_progress_and_results_until_completed(self, memory_job_store):
+        broker = JobEventBroker()
+        await memory_job_store.create(
+            "job-1",
+            kind=JobKind.TEST_RUN,
+            data={
+                "status": JobStatus.PROCESSING,
+                "total_tests": 2,
+                "processed_tests": 0,
+                "results": [],
+            },
+        )
+
+        with (
+            patch("app.services.jobs.progress.job_store", memory_job_store),
+            patch("app.services.jobs.progress.job_events", broker),
+            patch("app.services.jobs.store.job_events", broker),
+        ):
+
+            async def run_job():
+                for run_id in (1, 2):
+                    await asyncio.sleep(0.01)
+                    await memory_job_store.append_result(
+                        "job-1", {"run_id": run_id, "status": JobStatus.COMPLETED}
+                    )
+                    await memory_job_store.increment("job-1", "processed_tests")
+                await memory_job_store.update("job-1", status=JobStatus.COMPLETED)
+
+            runner = asyncio.create_task(run_job())
+            raw_events = [
+                event async for event in stream_job_progress("job-1", poll_interval=5)
+            ]
+            await runner
+
+        events = parse_events(raw_events)
+        results = [data["run_id"] for name, data in events if name == "result"]
+        assert results == [1, 2]
+        assert events[-1][0] == "progress"
+        assert events[-1][1]["status"] == JobStatus.COMPLETED
+        assert events[-1][1]["processed_tests"] == 2
+
+    @pytest.mark.asyncio
+    async def test_stops_when_job_expires(self, memory_job_store):
+        with patch("app.services.jobs.progress.job_store", memory_job_store):
+            raw_events = [event async for event in stream_job_progress("missing")]
+
+        assert parse_events(raw_events)[0][0] == "error"
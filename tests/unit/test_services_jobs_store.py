@@ -0,0 +1,79 @@
+import json
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.jobs.store import PostgresJobStore
+from app.settings import JOB_EVENTS_CHANNEL
+
+
+class FakeSession:
+    def __init__(self):
+        self.statements = []
+        self.execute = AsyncMock(side_effect=self._execute)
+        self.commit = AsyncMock()
+
+    async def _execute(self, statement, params=None):
+        self.statements.append((str(statement), params))
+        return MagicMock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+@pytest.fixture
+def fake_session():
+    session = FakeSession()
+    with patch("app.services.jobs.store.async_postgres_session", return_value=session):
+        yield session
+
+
+class TestPostgresJobStore:
+
+    @pytest.mark.asyncio
+    async def test_update_merges_fields_and_notifies(self, fake_session):
+        await PostgresJobStore().update("job-1", status="completed", error=None)
+
+        (update_sql, update_params), (notify_sql, notify_params) = (
+            fake_session.statements
+        )
+        assert "data || CAST(:fields AS jsonb)" in update_sql
+        assert update_params["job_id"] == "job-1"
+        assert json.loads(update_params["fields"]) == {
+            "status": "completed",
+            "error": None,
+        }
+        assert "pg_notify" in notify_sql
+        assert notify_params == {"channel": JOB_EVENTS_CHANNEL, "job_id": "job-1"}
+        fake_session.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_increment_is_a_single_atomic_statement(self, fake_session):
+        await PostgresJobStore().increment("job-1", "processed_tests", 2)
+
+        update_sql, params = fake_session.statements[0]
+        assert update_sql.startswith("UPDATE jobs SET data = jsonb_set(")
+        assert "CAST(:amount AS integer)" in update_sql
+        assert params == {"job_id": "job-1", "field": "processed_tests", "amount": 2}
+
+    @pytest.mark.asyncio
+    async def test_append_result_sends_result_as_json(self, fake_session):
+        await PostgresJobStore().append_result("job-1", {"run_id": 3})
+
+        update_sql, params = fake_session.statements[0]
+        assert "jsonb_build_array(CAST(:result AS jsonb))" in update_sql
+        assert json.loads(params["result"]) == {"run_id": 3}
+
+    @pytest.mark.asyncio
+    async def test_create_stores_kind_in_data(self, fake_session):
+        fake_session.add = MagicMock()
+
+        await PostgresJobStore().create("job-1", kind="test_run", data={"total": 2})
+
+        job = fake_session.add.call_args.args[0]
+        assert job.id == "job-1"
+        assert job.data == {"kind": "test_run", "total": 2}
+        fake_session.commit.assert_awaited_once()
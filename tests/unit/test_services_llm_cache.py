@@ -0,0 +1,158 @@
+from array import array
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.schemas.llm import (
+    LLMQuestionIn,
+    LLMQuestionsListIn,
+    LLMQuestionOut,
+    LLMQuestionsListOut,
+)
+from app.schemas.tests.test import QuestionType
+from pgvector import HalfVector
+
+from app.services.llm.cache import LLMAnswerCache, QueryEmbeddingCache
+
+
+def patch_cache_session(session):
+    session.__aenter__.return_value = session
+    return patch("app.services.llm.cache.async_postgres_session", return_value=session)
+
+
+@pytest.fixture
+def questions() -> LLMQuestionsListIn:
+    return LLMQuestionsListIn(
+        questions=[
+            LLMQuestionIn(
+                id=1,
+                question="Capital of France?",
+                type=QuestionType(type_id=2, description="Multiple choice"),
+                options=["Paris", "Rome"],
+            )
+        ]
+    )
+
+
+@pytest.fixture
+def answers() -> LLMQuestionsListOut:
+    return LLMQuestionsListOut(
+        questions=[LLMQuestionOut(question_id=1, answer="Paris")]
+    )
+
+
+class TestLLMAnswerCache:
+
+    def test_key_depends_on_context(self, questions):
+        key = LLMAnswerCache.build_key(questions, ["chunk 1"])
+
+        assert key == LLMAnswerCache.build_key(questions, ["chunk 1"])
+        assert key != LLMAnswerCache.build_key(questions, ["chunk 2"])
+
+    @pytest.mark.asyncio
+    async def test_memory_hit_skips_db(self, questions, answers, mock_db):
+        cache = LLMAnswerCache(max_size=10, ttl=60)
+        key = cache.build_key(questions, [])
+        cache.memory.set(key, answers)
+
+        with patch_cache_session(mock_db):
+            result = await cache.get(key)
+
+        assert result == answers
+        mock_db.execute.assert_not_called()
+        assert cache.stats["memory_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_db_hit_populates_memory(self, questions, answers, mock_db):
+        cache = LLMAnswerCache(max_size=10, ttl=60)
+        key = cache.build_key(questions, [])
+        mock_result = MagicMock()
+        mock_result.scalar_one_or_none.return_value = answers
+        mock_db.execute = AsyncMock(return_value=mock_result)
+
+        with patch_cache_session(mock_db):
+            result = await cache.get(key)
+
+        assert result == answers
+        assert cache.memory.get(key) == answers
+        assert cache.stats["db_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_miss_is_counted(self, questions, mock_db):
+        cache = LLMAnswerCache(max_size=10, ttl=60)
+        mock_result = MagicMock()
+        mock_result.scalar_one_or_none.return_value = None
+        mock_db.execute = AsyncMock(return_value=mock_result)
+
+        with patch_cache_session(mock_db):
+            result = await cache.get(cache.build_key(questions, []))
+
+        assert result is None
+        assert cache.stats["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_db_failure_is_a_miss(self, questions, mock_db):
+        cache = LLMAnswerCache(max_size=10, ttl=60)
+        mock_db.execute = AsyncMock(side_effect=ConnectionError("db down"))
+
+        with patch_cache_session(mock_db):
+            result = await cache.get(cache.build_key(questions, []))
+
+        assert result is None
+        assert cache.stats["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_set_commits_own_session(self, questions, answers, mock_db):
+        cache = LLMAnswerCache(max_size=10, ttl=60)
+        key = cache.build_key(questions, [])
+
+        with patch_cache_session(mock_db):
+            await cache.set(key, answers)
+
+        assert cache.memory.get(key) == answers
+        mock_db.execute.assert_awaited_once()
+        mock_db.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_cleanup_removes_expired_rows(self, mock_db):
+        mock_db.execute = AsyncMock(return_value=MagicMock(rowcount=4))
+
+        with patch_cache_session(mock_db):
+            removed = await LLMAnswerCache(max_size=10, ttl=60).cleanup_expired()
+
+        assert removed == 4
+        assert "DELETE FROM llm_answer_cache" in str(mock_db.execute.await_args.args[0])
+        mock_db.commit.assert_awaited_once()
+
+
+class TestQueryEmbeddingCache:
+
+    @pytest.mark.asyncio
+    async def test_db_is_asked_only_for_memory_misses(self, mock_db):
+        cache = QueryEmbeddingCache(max_size=10, ttl=60)
+        cached_key, stored_key, missing_key = (
+            cache.build_key(query) for query in ("cached", "stored", "missing")
+        )
+        cache.memory.set(cached_key, array("f", [0.5]))
+        mock_db.execute.return_value = MagicMock(
+            all=lambda: [(stored_key, HalfVector([0.25]))]
+        )
+
+        with patch_cache_session(mock_db):
+            result = await cache.get_many([cached_key, stored_key, missing_key])
+
+        assert result == {cached_key: [0.5], stored_key: [0.25]}
+        query_params = mock_db.execute.await_args.args[0].compile().params
+        assert cached_key not in str(query_params)
+        assert cache.memory.get(stored_key).tolist() == [0.25]
+        assert cache.stats == {"memory_hits": 1, "db_hits": 1, "misses": 1}
+
+    @pytest.mark.asyncio
+    async def test_store_failure_keeps_memory_entry(self, mock_db):
+        cache = QueryEmbeddingCache(max_size=10, ttl=60)
+        mock_db.execute.side_effect = ConnectionError("db down")
+
+        with patch_cache_session(mock_db):
+            await cache.set_many({"key": [0.5]})
+
+        assert cache.memory.get("key").tolist() == [0.5]
@@ -0,0 +1,189 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.llm.embeddings import (
+    embed_queries,
+    generate_embeddings,
+    retrieve_context_from_db,
+    retrieve_context_for_questions,
+    merge_question_chunks,
+    StreamingTextSplitter,
+)
+from app.utils.enums import VectorSearchMode
+
+
+def executed_sql(mock_db) -> list[str]:
+    return [str(call.args[0]) for call in mock_db.execute.await_args_list]
+
+
+@pytest.fixture
+def mock_embeddings():
+    with patch("app.services.llm.embeddings.embeddings_provider") as provider:
+        provider.aembed = AsyncMock(return_value=[[0.1, 0.2, 0.3]])
+        yield provider
+
+
+@pytest.fixture
+def mock_query_cache():
+    with patch("app.services.llm.embeddings.query_embedding_cache") as cache:
+        cache.build_key.side_effect = lambda query: f"key:{query}"
+        cache.get_many = AsyncMock(return_value={})
+        cache.set_many = AsyncMock()
+        yield cache
+
+
+class TestStreamingTextSplitter:
+
+    @patch("app.services.llm.embeddings.CHUNK_OVERLAP", 0)
+    @patch("app.services.llm.embeddings.CHUNK_SIZE", 12)
+    def test_carries_last_chunk_over_to_the_next_page(self):
+        text_splitter = StreamingTextSplitter()
+        pages = ["one two three four", "five six", "", "seven"]
+
+        chunks = [chunk for page in pages for chunk in text_splitter.split(page)]
+        chunks += text_splitter.flush()
+
+        assert chunks == ["one two", "three four", "five six", "seven"]
+
+    def test_empty_document_has_no_chunks(self):
+        text_splitter = StreamingTextSplitter()
+
+        assert not text_splitter.split("") + text_splitter.flush()
+
+
+class TestGenerateEmbeddings:
+
+    @pytest.mark.asyncio
+    @patch("app.services.llm.embeddings.EMBEDDING_DIM", 3)
+    @patch("app.services.llm.embeddings.asyncio.sleep")
+    async def test_retries_rate_limited_batch(self, mock_sleep, mock_embeddings):
+        mock_embeddings.aembed.side_effect = [
+            RuntimeError("429 Resource has been exhausted"),
+            [[0.1, 0.2, 0.3]],
+        ]
+
+        result = await generate_embeddings(["chunk"])
+
+        assert result == [[0.1, 0.2, 0.3]]
+        assert mock_embeddings.aembed.call_count == 2
+        mock_sleep.assert_awaited_once()
+        assert mock_embeddings.aembed.call_args.args == (["chunk"], 3)
+
+    @pytest.mark.asyncio
+    @patch("app.services.llm.embeddings.EMBEDDING_MAX_ATTEMPTS", 2)
+    @patch("app.services.llm.embeddings.asyncio.sleep")
+    async def test_gives_up_after_max_attempts(self, _mock_sleep, mock_embeddings):
+        mock_embeddings.aembed.side_effect = RuntimeError("429")
+
+        with pytest.raises(RuntimeError):
+            await generate_embeddings(["chunk"])
+
+        assert mock_embeddings.aembed.call_count == 2
+
+
+class TestRetrieveContextFromDb:
+
+    @pytest.mark.asyncio
+    async def test_approximate_search_scans_the_index_iteratively(
+        self, mock_db, mock_embeddings, mock_query_cache
+    ):
+        mock_db.execute.return_value = MagicMock(
+            scalars=MagicMock(
+                return_value=MagicMock(all=lambda: ["Paris is the capital"])
+            )
+        )
+
+        result = await retrieve_context_from_db(
+            mock_db, "Capital?", test_id=1, search_mode=VectorSearchMode.APPROXIMATE
+        )
+
+        assert result == ["Paris is the capital"]
+        settings_call = mock_db.execute.await_args_list[0]
+        assert "hnsw.ef_search" in str(settings_call.args[0])
+        assert "'hnsw.iterative_scan', 'relaxed_order'" in str(settings_call.args[0])
+        assert settings_call.args[1] == {"ef_search": "100"}
+        # Relaxed order results are re-sorted outside the materialized search
+        assert "AS MATERIALIZED" in str(mock_db.execute.await_args_list[1].args[0])
+
+    @pytest.mark.asyncio
+    async def test_exact_search_keeps_btree_indexes(
+        self, mock_db, mock_embeddings, mock_query_cache
+    ):
+        mock_db.execute.return_value = MagicMock(
+            scalars=MagicMock(return_value=MagicMock(all=lambda: []))
+        )
+
+        result = await retrieve_context_from_db(
+            mock_db, "Capital?", test_id=1, search_mode=VectorSearchMode.EXACT
+        )
+
+        assert result is None
+        statements = executed_sql(mock_db)
+        assert len(statements) == 1
+        assert "enable_indexscan" not in statements[0]
+        assert "ORDER BY (chunk_embeddings.embedding <-> " in statements[0]
+
+
+class TestEmbedQueries:
+
+    @pytest.mark.asyncio
+    async def test_embeds_only_uncached_queries(
+        self, mock_embeddings, mock_query_cache
+    ):
+        mock_query_cache.get_many.return_value = {"key:cached": [0.5]}
+        mock_embeddings.aembed.return_value = [[0.7]]
+
+        result = await embed_queries(["cached", "new", "new"])
+
+        assert result == [[0.5], [0.7], [0.7]]
+        assert mock_embeddings.aembed.call_args.args[0] == ["new"]
+        mock_query_cache.set_many.assert_awaited_once_with({"key:new": [0.7]})
+
+    @pytest.mark.asyncio
+    async def test_fully_cached_queries_skip_the_api(
+        self, mock_embeddings, mock_query_cache
+    ):
+        mock_query_cache.get_many.return_value = {"key:cached": [0.5]}
+
+        assert await embed_queries(["cached"]) == [[0.5]]
+        mock_embeddings.aembed.assert_not_called()
+        mock_query_cache.set_many.assert_not_called()
+
+
+class TestRetrieveContextForQuestions:
+
+    @pytest.mark.asyncio
+    async def test_embeds_all_questions_in_one_call(
+        self, mock_db, mock_embeddings, mock_query_cache
+    ):
+        mock_embeddings.aembed.return_value = [[0.1], [0.2]]
+        mock_db.execute.return_value = MagicMock(
+            all=lambda: [
+                MagicMock(question_index=2, chunk_text="Rome", distance=0.1),
+                MagicMock(question_index=1, chunk_text="Paris", distance=0.2),
+                MagicMock(question_index=2, chunk_text="Paris", distance=0.3),
+            ]
+        )
+
+        result = await retrieve_context_for_questions(
+            mock_db, ["Capital of France?", "Capital of Italy?"], test_id=1
+        )
+
+        assert result == {1: [("Rome", 0.1), ("Paris", 0.3)], 0: [("Paris", 0.2)]}
+        mock_embeddings.aembed.assert_called_once()
+        assert mock_embeddings.aembed.call_args.args[0] == [
+            "Capital of France?",
+            "Capital of Italy?",
+        ]
+        search_call = mock_db.execute.await_args_list[1]
+        assert "CROSS JOIN LATERAL" in str(search_call.args[0])
+        assert "ORDER BY chunk_embeddings.embedding <->" in str(search_call.args[0])
+        assert search_call.args[1]["embeddings"] == ["[0.1]", "[0.2]"]
+
+
+class TestMergeQuestionChunks:
+
+    def test_keeps_closest_chunks_once(self):
+        chunks = [("Paris", 0.2), ("Rome", 0.1), ("Paris", 0.05), ("Berlin", 0.3)]
+
+        assert merge_question_chunks(chunks, max_chunks=2) == ["Paris", "Rome"]
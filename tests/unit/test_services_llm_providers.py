@@ -0,0 +1,90 @@
+import math
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.schemas.llm import LLMQuestionIn, LLMQuestionsListIn
+from app.schemas.tests.test import QuestionType
+from app.services.llm.llm_config import LLMClient, build_test_solver_prompt
+from app.services.llm.llm_test_solver import LLMTestSolverAgent
+from app.services.llm.providers import (
+    FakeEmbeddingsProvider,
+    FakeLLMProvider,
+    FakeProviderError,
+    parse_prompt_questions,
+)
+
+
+@pytest.fixture
+def form_questions() -> LLMQuestionsListIn:
+    question_types = [
+        (0, None),
+        (2, ["Paris", "Rome"]),
+        (4, ["Red", "Green", "Blue"]),
+        (9, None),
+        (10, None),
+    ]
+    return LLMQuestionsListIn(
+        questions=[
+            LLMQuestionIn(
+                id=i,
+                question=f"Question {i}?",
+                type=QuestionType(type_id=type_id, description=f"Type {type_id}"),
+                options=options,
+            )
+            for i, (type_id, options) in enumerate(question_types, start=1)
+        ]
+    )
+
+
+class TestFakeLLMProvider:
+
+    def test_parses_questions_of_the_solver_prompt(self, form_questions):
+        prompt = build_test_solver_prompt(form_questions, ["context"])
+
+        questions = parse_prompt_questions(prompt)
+
+        assert [q["id"] for q in questions] == [1, 2, 3, 4, 5]
+        assert questions[2]["o"] == ["Red", "Green", "Blue"]
+
+    @pytest.mark.asyncio
+    @patch(
+        "app.services.llm.llm_test_solver.retrieve_context_for_questions",
+        new_callable=AsyncMock,
+        return_value={},
+    )
+    async def test_solver_answers_pass_validation(self, _mock_retrieve, form_questions):
+        client = LLMClient(FakeLLMProvider())
+        agent = LLMTestSolverAgent(client, test_id=1, db_session=MagicMock())
+
+        result = await agent.solve(form_questions, use_cache=False)
+
+        assert [a.question_id for a in result.questions] == [1, 2, 3, 4, 5]
+        assert agent.usage.attempts == 1
+        assert agent.usage.model == FakeLLMProvider.model
+        assert agent.usage.prompt_tokens > 0
+
+    @pytest.mark.asyncio
+    async def test_latency_and_errors_are_injected(self):
+        provider = FakeLLMProvider(latency=0.05, error_rate=1)
+
+        started = time.perf_counter()
+        with pytest.raises(FakeProviderError):
+            await provider.ainvoke("prompt")
+
+        assert time.perf_counter() - started >= 0.05
+
+
+class TestFakeEmbeddingsProvider:
+
+    @pytest.mark.asyncio
+    async def test_embeddings_are_deterministic_unit_vectors(self):
+        provider = FakeEmbeddingsProvider()
+
+        first, second, other = await provider.aembed(["text", "text", "other"], 64)
+
+        assert first == second
+        assert first != other
+        assert len(first) == 64
+        assert math.isclose(sum(value * value for value in first), 1)
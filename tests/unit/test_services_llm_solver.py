@@ -0,0 +1,687 @@
+import asyncio
+import json
+import re
+import time
+
+import pytest
+from langgraph.graph import StateGraph
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.schemas.llm import (
+    LLMQuestionIn,
+    LLMQuestionsListIn,
+    LLMQuestionOut,
+    LLMQuestionsListOut,
+    LLMResponse,
+)
+from app.schemas.tests.test import QuestionType
+from app.services.llm.embeddings import retrieve_context_from_db
+from app.services.llm.llm_config import (
+    LLMClient,
+    LLMGeminiSettings,
+    LLMSolverState,
+    build_test_solver_prompt,
+    select_context_chunks,
+)
+from app.services.llm.providers import GeminiEmbeddingsProvider, GeminiLLMProvider
+from app.services.llm.llm_test_solver import (
+    LLMTestSolverAgent,
+    check_answer,
+    parse_llm_json,
+    response_parse_stats,
+    split_questions,
+)
+from app.utils.configs import get_form_type_description
+from app.utils.enums import RetrievalMode
+
+
+@pytest.fixture
+def solver_state() -> LLMSolverState:
+    return LLMSolverState(
+        questions=LLMQuestionsListIn(
+            questions=[
+                LLMQuestionIn(
+                    id=1,
+                    question="Capital of France?",
+                    type=QuestionType(type_id=2, description="Multiple choice"),
+                    options=["Paris", "Rome"],
+                )
+            ]
+        )
+    )
+
+
+def make_slow_llm_client(delay: float, tracker: dict | None = None) -> LLMClient:
+    async def slow_ainvoke(_prompt, **_kwargs):
+        if tracker is not None:
+            tracker["in_flight"] += 1
+            tracker["max_in_flight"] = max(
+                tracker["max_in_flight"], tracker["in_flight"]
+            )
+        await asyncio.sleep(delay)
+        if tracker is not None:
+            tracker["in_flight"] -= 1
+        return MagicMock(content=' {"questions": []} ', usage_metadata=None)
+
+    with patch("app.services.llm.providers.ChatGoogleGenerativeAI"):
+        provider = GeminiLLMProvider("gemini", temperature=0, timeout=1, max_retries=1)
+    provider.chat_model.ainvoke = slow_ainvoke
+    return LLMClient(provider)
+
+
+async def measure_loop_gaps(duration: float) -> list[float]:
+    """Intervals between ticks of a 20ms ticker, long gaps mean a blocked loop."""
+    gaps = []
+    last = time.perf_counter()
+    while sum(gaps) < duration:
+        await asyncio.sleep(0.02)
+        now = time.perf_counter()
+        gaps.append(now - last)
+        last = now
+    return gaps
+
+
+def make_questions(count: int) -> LLMQuestionsListIn:
+    return LLMQuestionsListIn(
+        questions=[
+            LLMQuestionIn(
+                id=i,
+                question=f"Question {i}?",
+                type=QuestionType(type_id=0, description="Short answer"),
+            )
+            for i in range(1, count + 1)
+        ]
+    )
+
+
+def answer_prompt_questions(
+    prompt: str, response_schema: dict | None = None
+) -> LLMResponse:
+    """LLM stub answering every question of the prompt."""
+    question_ids = [int(i) for i in re.findall(r'"id":(\d+)', prompt)]
+    answers = json.dumps(
+        {"questions": [{"question_id": i, "answer": f"A{i}"} for i in question_ids]}
+    )
+    return LLMResponse(content=answers, prompt_tokens=100, completion_tokens=10)
+
+
+def make_sample_form(count: int) -> LLMQuestionsListIn:
+    """Form mixing the common Google Form question types."""
+    type_ids = [0, 1, 2, 3, 4, 5, 9, 10]
+    questions = []
+    for i in range(count):
+        type_id = type_ids[i % len(type_ids)]
+        questions.append(
+            LLMQuestionIn(
+                id=1000 + i,
+                question=f"Which statement about topic {i} of the course is correct?",
+                type=get_form_type_description(type_id),
+                options=(
+                    [f"Option {j} for topic {i}" for j in range(4)]
+                    if type_id in (2, 3, 4, 5)
+                    else None
+                ),
+            )
+        )
+    return LLMQuestionsListIn(questions=questions)
+
+
+class TestBuildTestSolverPrompt:
+
+    def test_type_legend_is_emitted_once(self):
+        prompt = build_test_solver_prompt(make_sample_form(16), [])
+
+        description = get_form_type_description(4).description
+        assert prompt.count(description) == 1
+        assert prompt.count('"t":4') == 2
+
+    def test_schema_is_left_out_for_structured_output(self):
+        assert "schema" in build_test_solver_prompt(make_questions(1), [])
+        assert "schema" not in build_test_solver_prompt(
+            make_questions(1), [], include_schema=False
+        )
+
+    def test_context_is_deduplicated_and_trimmed_to_budget(self):
+        chunks = ["first " * 10, "first " * 10, "second " * 10, "third " * 200]
+
+        selected = select_context_chunks(chunks, token_budget=50)
+
+        assert selected == [chunks[0].strip(), chunks[2].strip()]
+
+    def test_prompt_size_reduction_on_sample_form(self):
+        """Benchmark against the previous Python repr serialization."""
+        questions = make_sample_form(20)
+        chunks = [f"Chunk {i} " + "lecture text " * 60 for i in range(8)]
+        chunks += chunks[:3]
+        previous_prompt = (
+            f"{questions.model_dump()}\n{chunks}\n"
+            f"{LLMQuestionsListOut.model_json_schema()}"
+        )
+
+        prompt = build_test_solver_prompt(questions, chunks)
+
+        reduction = 1 - len(prompt) / len(previous_prompt)
+        assert reduction > 0.2, f"prompt only {reduction:.0%} smaller"
+
+
+class TestSplitQuestions:
+
+    def test_groups_respect_question_limit(self):
+        groups = split_questions(make_questions(5), max_questions=2)
+
+        assert [[q.id for q in group.questions] for group in groups] == [
+            [1, 2],
+            [3, 4],
+            [5],
+        ]
+
+    def test_groups_respect_token_budget(self):
+        groups = split_questions(make_questions(4), token_budget=20)
+
+        assert len(groups) == 2
+        assert sum(len(group.questions) for group in groups) == 4
+
+    def test_oversized_question_gets_its_own_group(self):
+        groups = split_questions(make_questions(2), token_budget=1)
+
+        assert [len(group.questions) for group in groups] == [1, 1]
+
+
+class TestSolve:
+
+    @pytest.mark.asyncio
+    @patch(
+        "app.services.llm.llm_test_solver.retrieve_context_for_questions",
+        new_callable=AsyncMock,
+        return_value={},
+    )
+    async def test_groups_run_concurrently_and_merge(self, mock_retrieve):
+        tracker = {"in_flight": 0, "max_in_flight": 0}
+
+        async def ainvoke_llm(prompt, response_schema=None):
+            tracker["in_flight"] += 1
+            tracker["max_in_flight"] = max(
+                tracker["max_in_flight"], tracker["in_flight"]
+            )
+            await asyncio.sleep(0.05)
+            tracker["in_flight"] -= 1
+            return answer_prompt_questions(prompt)
+
+        client = MagicMock(ainvoke_llm=AsyncMock(side_effect=ainvoke_llm))
+        agent = LLMTestSolverAgent(client, test_id=1, db_session=MagicMock())
+
+        with patch(
+            "app.services.llm.llm_test_solver.split_questions",
+            side_effect=lambda questions: split_questions(questions, max_questions=2),
+        ):
+            result = await agent.solve(make_questions(5), use_cache=False)
+
+        assert sorted(a.question_id for a in result.questions) == [1, 2, 3, 4, 5]
+        assert client.ainvoke_llm.await_count == 3
+        assert tracker["max_in_flight"] == 3
+        mock_retrieve.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    @patch(
+        "app.services.llm.llm_test_solver.retrieve_context_for_questions",
+        new_callable=AsyncMock,
+        return_value={},
+    )
+    async def test_only_the_failed_group_is_retried(self, _mock_retrieve):
+        prompts = []
+
+        async def ainvoke_llm(prompt, response_schema=None):
+            prompts.append(prompt)
+            if '"id":3,' in prompt and len(prompts) <= 2:
+                return LLMResponse(content="not json")
+            return answer_prompt_questions(prompt)
+
+        client = MagicMock(ainvoke_llm=AsyncMock(side_effect=ainvoke_llm))
+        agent = LLMTestSolverAgent(client, test_id=1, db_session=MagicMock())
+
+        with patch(
+            "app.services.llm.llm_test_solver.split_questions",
+            side_effect=lambda questions: split_questions(questions, max_questions=2),
+        ):
+            result = await agent.solve(make_questions(3), use_cache=False)
+
+        assert sorted(a.question_id for a in result.questions) == [1, 2, 3]
+        assert len(prompts) == 3
+        assert sum('"id":1,' in prompt for prompt in prompts) == 1
+
+    @pytest.mark.asyncio
+    @patch(
+        "app.services.llm.llm_test_solver.retrieve_context_for_questions",
+        new_callable=AsyncMock,
+        return_value={},
+    )
+    async def test_usage_is_summed_over_groups(self, _mock_retrieve):
+        client = MagicMock(ainvoke_llm=AsyncMock(side_effect=answer_prompt_questions))
+        agent = LLMTestSolverAgent(client, test_id=1, db_session=MagicMock())
+
+        with patch(
+            "app.services.llm.llm_test_solver.split_questions",
+            side_effect=lambda questions: split_questions(questions, max_questions=2),
+        ):
+            await agent.solve(make_questions(5), use_cache=False)
+
+        assert agent.usage.attempts == 3
+        assert agent.usage.prompt_tokens == 300
+        assert agent.usage.completion_tokens == 30
+        assert agent.usage.answering_time >= agent.usage.generation_time / 3
+
+
+class TestGenerateAttempt:
+
+    @pytest.mark.asyncio
+    async def test_client_uses_async_model_call(self):
+        def blocking_invoke(_prompt):
+            time.sleep(0.3)
+            return MagicMock(content="blocking")
+
+        with patch("app.services.llm.providers.ChatGoogleGenerativeAI"):
+            provider = GeminiLLMProvider(
+                "gemini", temperature=0, timeout=1, max_retries=1
+            )
+        client = LLMClient(provider)
+        provider.chat_model.invoke = MagicMock(side_effect=blocking_invoke)
+        provider.chat_model.ainvoke = AsyncMock(
+            return_value=MagicMock(
+                content=" async ",
+                usage_metadata={"input_tokens": 120, "output_tokens": 30},
+            )
+        )
+
+        result = await client.ainvoke_llm("prompt")
+
+        assert result == LLMResponse(
+            content="async", model="gemini", prompt_tokens=120, completion_tokens=30
+        )
+        provider.chat_model.ainvoke.assert_awaited_once_with("prompt")
+        provider.chat_model.invoke.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_structured_output_sends_the_answer_schema(self, solver_state):
+        with patch("app.services.llm.providers.ChatGoogleGenerativeAI"):
+            provider = GeminiLLMProvider(
+                "gemini", temperature=0, timeout=1, max_retries=1
+            )
+        provider.chat_model.ainvoke = AsyncMock(
+            return_value=MagicMock(content='{"questions": []}', usage_metadata=None)
+        )
+        agent = LLMTestSolverAgent(
+            LLMClient(provider),
+            test_id=1,
+            db_session=MagicMock(),
+            structured_output=True,
+        )
+
+        await agent.generate_attempt(solver_state)
+
+        prompt = provider.chat_model.ainvoke.await_args.args[0]
+        kwargs = provider.chat_model.ainvoke.await_args.kwargs
+        assert kwargs["response_mime_type"] == "application/json"
+        assert kwargs["response_json_schema"] == LLMQuestionsListOut.model_json_schema()
+        assert "Pydantic schema" not in prompt
+
+    @pytest.mark.asyncio
+    async def test_solver_awaits_llm_client(self, solver_state):
+        agent = LLMTestSolverAgent(
+            make_slow_llm_client(delay=0.3), test_id=1, db_session=MagicMock()
+        )
+
+        result, gaps = await asyncio.gather(
+            agent.generate_attempt(solver_state), measure_loop_gaps(0.2)
+        )
+
+        assert result.raw_answers == '{"questions": []}'
+        assert max(gaps) < 0.15
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_are_limited(self, solver_state):
+        tracker = {"in_flight": 0, "max_in_flight": 0}
+        client = make_slow_llm_client(delay=0.05, tracker=tracker)
+
+        with patch(
+            "app.services.llm.llm_config.llm_calls_limiter", asyncio.Semaphore(2)
+        ):
+            await asyncio.gather(*(client.ainvoke_llm("prompt") for _ in range(6)))
+
+        assert tracker["max_in_flight"] == 2
+
+
+def make_question(type_id: int, options: list[str] | None = None) -> LLMQuestionIn:
+    return LLMQuestionIn(
+        id=1,
+        question="Question?",
+        type=QuestionType(type_id=type_id, description=f"Type {type_id}"),
+        options=options,
+    )
+
+
+class TestCheckAnswer:
+
+    @pytest.mark.parametrize(
+        "question, answer, expected",
+        [
+            (make_question(2, ["Paris", "Rome"]), ["Paris"], "Paris"),
+            (make_question(4, ["A", "B"]), "A", ["A"]),
+            (make_question(9), "2024-02-29", "2024-02-29"),
+            (make_question(10), "09:30", "09:30"),
+            (make_question(0), "Free text", "Free text"),
+        ],
+    )
+    def test_valid_answers_are_normalized(self, question, answer, expected):
+        assert check_answer(question, answer) == (expected, None)
+
+    @pytest.mark.parametrize(
+        "question, answer",
+        [
+            (make_question(2, ["Paris", "Rome"]), "Berlin"),
+            (make_question(3, ["Paris", "Rome"]), ["Paris", "Rome"]),
+            (make_question(4, ["A", "B"]), ["A", "C"]),
+            (make_question(4, ["A", "B"]), []),
+            (make_question(9), "29.02.2024"),
+            (make_question(10), "9:30 PM"),
+            (make_question(1), " "),
+        ],
+    )
+    def test_invalid_answers_have_an_error(self, question, answer):
+        _, error = check_answer(question, answer)
+
+        assert error
+
+
+class TestParseLlmJson:
+
+    def test_plain_json_is_not_repaired(self):
+        assert parse_llm_json('{"questions": []}') == ({"questions": []}, False)
+
+    @pytest.mark.parametrize(
+        "raw, expected",
+        [
+            ('```json\n{"questions": []}\n```', {"questions": []}),
+            ('Here are the answers: [{"question_id": 1}] Done.', [{"question_id": 1}]),
+            ('Note {not json} then {"questions": []}', {"questions": []}),
+        ],
+    )
+    def test_extracts_json_around_fences_and_prose(self, raw, expected):
+        assert parse_llm_json(raw) == (expected, True)
+
+    def test_raises_without_json(self):
+        with pytest.raises(json.JSONDecodeError):
+            parse_llm_json("I cannot answer that")
+
+
+class TestValidateLlmAnswer:
+
+    @pytest.fixture
+    def choice_state(self) -> LLMSolverState:
+        return LLMSolverState(
+            questions=LLMQuestionsListIn(
+                questions=[
+                    LLMQuestionIn(
+                        id=i,
+                        question=f"Question {i}?",
+                        type=QuestionType(type_id=2, description="Multiple choice"),
+                        options=["Yes", "No"],
+                    )
+                    for i in range(1, 4)
+                ]
+            )
+        )
+
+    def test_keeps_valid_answers_and_reports_the_rest(self, choice_state):
+        choice_state.raw_answers = json.dumps(
+            {
+                "questions": [
+                    {"question_id": 1, "answer": "Yes"},
+                    {"question_id": 2, "answer": "Maybe"},
+                ]
+            }
+        )
+
+        state = LLMTestSolverAgent.validate_llm_answer(choice_state)
+
+        assert [a.question_id for a in state.validated_answers.questions] == [1]
+        assert "question 2: 'Maybe' is not one of the options" in state.error
+        assert "question 3: the answer is missing" in state.error
+        assert [q.id for q in state.pending_questions().questions] == [2, 3]
+        assert state.attempts == 1
+
+    def test_fenced_response_needs_no_retry(self, choice_state):
+        choice_state.raw_answers = "```json\n" + json.dumps(
+            [{"question_id": i, "answer": "Yes"} for i in range(1, 4)]
+        )
+        repaired = response_parse_stats["repaired"]
+
+        state = LLMTestSolverAgent.validate_llm_answer(choice_state)
+
+        assert state.error is None
+        assert state.attempts == 0
+        assert len(state.validated_answers.questions) == 3
+        assert response_parse_stats["repaired"] == repaired + 1
+
+    @pytest.mark.asyncio
+    async def test_retry_asks_only_for_invalid_answers(self, choice_state):
+        prompts = []
+
+        async def ainvoke_llm(prompt, response_schema=None):
+            prompts.append(prompt)
+            answer = "Maybe" if len(prompts) == 1 else "No"
+            question_ids = [int(i) for i in re.findall(r'"id":(\d+)', prompt)]
+            return LLMResponse(
+                content=json.dumps(
+                    {
+                        "questions": [
+                            {"question_id": i, "answer": "Yes" if i == 1 else answer}
+                            for i in question_ids
+                        ]
+                    }
+                )
+            )
+
+        client = MagicMock(ainvoke_llm=AsyncMock(side_effect=ainvoke_llm))
+        agent = LLMTestSolverAgent(client, test_id=1, db_session=MagicMock())
+        choice_state.use_cache = False
+
+        result = LLMSolverState(**await agent.call_llm_async(choice_state))
+
+        assert len(prompts) == 2
+        assert '"id":1,' not in prompts[1]
+        assert '"id":2,' in prompts[1] and '"id":3,' in prompts[1]
+        assert [a.answer for a in result.validated_answers.questions] == [
+            "Yes",
+            "No",
+            "No",
+        ]
+        assert result.error is None
+
+    @pytest.mark.asyncio
+    async def test_exhausted_retries_return_partial_answers(self, choice_state):
+        client = MagicMock(
+            ainvoke_llm=AsyncMock(
+                return_value=LLMResponse(
+                    content=json.dumps(
+                        {
+                            "questions": [
+                                {"question_id": 1, "answer": "Yes"},
+                                {"question_id": 2, "answer": "Maybe"},
+                            ]
+                        }
+                    )
+                )
+            )
+        )
+        agent = LLMTestSolverAgent(client, test_id=1, db_session=MagicMock())
+        choice_state.use_cache = False
+
+        result = LLMSolverState(**await agent.call_llm_async(choice_state))
+
+        assert client.ainvoke_llm.await_count == LLMGeminiSettings.max_retries
+        assert [a.question_id for a in result.validated_answers.questions] == [1]
+        assert result.error.startswith("Reached Maximum retries")
+
+
+class TestSolverGraph:
+
+    @pytest.mark.asyncio
+    async def test_agent_can_be_called_again(self):
+        client = MagicMock(ainvoke_llm=AsyncMock(side_effect=answer_prompt_questions))
+        agent = LLMTestSolverAgent(client, test_id=1, db_session=MagicMock())
+
+        for _ in range(2):
+            result = await agent.call_llm_async(
+                LLMSolverState(questions=make_questions(2), use_cache=False)
+            )
+            assert len(result["validated_answers"].questions) == 2
+
+    @pytest.mark.asyncio
+    async def test_calls_do_not_compile_the_graph(self):
+        client = MagicMock(ainvoke_llm=AsyncMock(side_effect=answer_prompt_questions))
+        agents = [
+            LLMTestSolverAgent(client, test_id=i, db_session=MagicMock())
+            for i in range(10)
+        ]
+
+        with patch.object(StateGraph, "compile") as mock_compile:
+            started = time.perf_counter()
+            await asyncio.gather(
+                *(
+                    agent.call_llm_async(
+                        LLMSolverState(questions=make_questions(2), use_cache=False)
+                    )
+                    for agent in agents
+                )
+            )
+            elapsed = time.perf_counter() - started
+
+        mock_compile.assert_not_called()
+        assert client.ainvoke_llm.await_count == 10
+        assert elapsed < 1
+
+
+class TestSolverAnswerCache:
+
+    @pytest.fixture
+    def answers(self) -> LLMQuestionsListOut:
+        return LLMQuestionsListOut(
+            questions=[LLMQuestionOut(question_id=1, answer="Paris")]
+        )
+
+    @pytest.mark.asyncio
+    @patch("app.services.llm.llm_test_solver.llm_answer_cache")
+    async def test_cache_hit_ends_graph_without_llm_call(
+        self, mock_cache, solver_state, answers
+    ):
+        solver_state.context_chunks = ["chunk"]
+        mock_cache.build_key.return_value = "key"
+        mock_cache.get = AsyncMock(return_value=answers)
+        mock_cache.stats = {}
+        client = MagicMock(ainvoke_llm=AsyncMock())
+        agent = LLMTestSolverAgent(client, test_id=1, db_session=MagicMock())
+
+        result = await agent.call_llm_async(solver_state)
+
+        assert result["validated_answers"] == answers
+        assert result["cache_hit"] is True
+        client.ainvoke_llm.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch("app.services.llm.llm_test_solver.llm_answer_cache")
+    async def test_bypass_flag_skips_cache(self, mock_cache, solver_state, answers):
+        mock_cache.get = AsyncMock(return_value=answers)
+        mock_cache.set = AsyncMock()
+        client = MagicMock(
+            ainvoke_llm=AsyncMock(
+                return_value=LLMResponse(content=answers.model_dump_json())
+            )
+        )
+        agent = LLMTestSolverAgent(client, test_id=1, db_session=MagicMock())
+        solver_state.use_cache = False
+
+        result = await agent.call_llm_async(solver_state)
+
+        assert result["validated_answers"] == answers
+        client.ainvoke_llm.assert_awaited_once()
+        mock_cache.get.assert_not_called()
+        mock_cache.set.assert_not_called()
+
+
+class TestRetrieveContext:
+
+    @pytest.mark.asyncio
+    @patch(
+        "app.services.llm.llm_test_solver.retrieve_context_from_db",
+        new_callable=AsyncMock,
+    )
+    async def test_combined_mode_shares_one_search(self, mock_retrieve):
+        mock_retrieve.return_value = ["chunk"]
+        agent = LLMTestSolverAgent(
+            MagicMock(),
+            test_id=1,
+            db_session=MagicMock(),
+            retrieval_mode=RetrievalMode.COMBINED,
+        )
+        groups = split_questions(make_questions(3), max_questions=2)
+
+        contexts = await agent.retrieve_group_contexts(groups)
+
+        assert contexts == [["chunk"], ["chunk"]]
+        mock_retrieve.assert_awaited_once()
+        assert mock_retrieve.await_args.kwargs["question_text"] == (
+            "Question 1? Question 2? Question 3?"
+        )
+
+    @pytest.mark.asyncio
+    @patch(
+        "app.services.llm.llm_test_solver.retrieve_context_for_questions",
+        new_callable=AsyncMock,
+    )
+    async def test_groups_get_the_chunks_of_their_questions(self, mock_retrieve):
+        mock_retrieve.return_value = {
+            0: [("Paris", 0.2)],
+            1: [("Rome", 0.1), ("Paris", 0.3)],
+            2: [("Berlin", 0.1)],
+        }
+        agent = LLMTestSolverAgent(
+            MagicMock(),
+            test_id=1,
+            db_session=MagicMock(),
+            retrieval_mode=RetrievalMode.PER_QUESTION,
+        )
+        groups = split_questions(make_questions(3), max_questions=2)
+
+        contexts = await agent.retrieve_group_contexts(groups)
+
+        assert contexts == [["Rome", "Paris"], ["Berlin"]]
+        mock_retrieve.assert_awaited_once()
+        assert len(mock_retrieve.await_args.kwargs["questions"]) == 3
+
+    @pytest.mark.asyncio
+    @patch("app.services.llm.embeddings.query_embedding_cache")
+    async def test_query_embedding_does_not_block_event_loop(
+        self, mock_query_cache, mock_db
+    ):
+        def blocking_embed_documents(texts, **_kwargs):
+            time.sleep(0.3)
+            return [[0.0] * 3 for _ in texts]
+
+        mock_query_cache.get_many = AsyncMock(return_value={})
+        mock_query_cache.set_many = AsyncMock()
+        with patch("app.services.llm.providers.GoogleGenerativeAIEmbeddings"):
+            provider = GeminiEmbeddingsProvider("gemini-embedding")
+        mock_embeddings = provider.embeddings_model
+        mock_embeddings.embed_documents.side_effect = blocking_embed_documents
+        mock_db.execute.return_value = MagicMock()
+
+        with patch("app.services.llm.embeddings.embeddings_provider", provider):
+            _, gaps = await asyncio.gather(
+                retrieve_context_from_db(mock_db, "Capital of France?", test_id=1),
+                measure_loop_gaps(0.2),
+            )
+
+        assert mock_embeddings.embed_documents.call_args.args[0] == [
+            "Capital of France?"
+        ]
+        assert max(gaps) < 0.15
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.tests.pdf_extraction import PDFExtractionPool, extract_pdf_pages
+
+
+def make_pdf(pages: list[list[str]]) -> bytes:
+    """Minimal PDF with one Helvetica text line per item of every page."""
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (b" ".join(b"%d 0 R" % page_id for page_id in page_ids), len(pages)),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page_id, lines in zip(page_ids, pages):
+        stream = b"BT /F1 10 Tf 12 TL 40 800 Td "
+        stream += b" ".join(b"(%s) '" % line.encode() for line in lines) + b" ET"
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (page_id + 1)
+        )
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for object_id, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (object_id, body)
+    xref_offset = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref_offset,
+    )
+    return pdf
+
+
+async def measure_loop_gaps(stop: asyncio.Event) -> list[float]:
+    """Intervals between ticks of a 20ms ticker, long gaps mean a blocked loop."""
+    gaps = []
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.02)
+        now = time.perf_counter()
+        gaps.append(now - last)
+        last = now
+    return gaps
+
+
+@pytest.fixture
+def extraction_pool(monkeypatch):
+    pool = PDFExtractionPool(max_workers=2)
+    monkeypatch.setattr("app.services.tests.pdf_extraction.pdf_extraction_pool", pool)
+    yield pool
+    pool.close()
+
+
+class TestExtractPdfPages:
+
+    @pytest.mark.asyncio
+    async def test_yields_pages_in_order(self, tmp_path, extraction_pool):
+        document_path = tmp_path / "lecture.pdf"
+        document_path.write_bytes(
+            make_pdf([[f"Page {i} line {j}" for j in range(3)] for i in range(5)])
+        )
+
+        pages = [
+            text
+            async for text in extract_pdf_pages(str(document_path), pages_per_task=2)
+        ]
+
+        assert len(pages) == 5
+        assert pages[3].splitlines() == [f"Page 3 line {j}" for j in range(3)]
+
+    @pytest.mark.asyncio
+    async def test_event_loop_keeps_running_during_extraction(
+        self, tmp_path, extraction_pool
+    ):
+        # Extraction in the event loop thread stalls this ticker for seconds
+        document_path = tmp_path / "textbook.pdf"
+        document_path.write_bytes(
+            make_pdf(
+                [[f"Line {j} of page {i}" * 3 for j in range(60)] for i in range(10)]
+            )
+        )
+        stop = asyncio.Event()
+        ticker = asyncio.create_task(measure_loop_gaps(stop))
+
+        pages = [text async for text in extract_pdf_pages(str(document_path))]
+        stop.set()
+        gaps = await ticker
+
+        assert len(pages) == 10
+        assert max(gaps) < 0.15
+
+    @pytest.mark.asyncio
+    async def test_timeout_cancels_extraction(self, tmp_path, extraction_pool):
+        document_path = tmp_path / "lecture.pdf"
+        document_path.write_bytes(make_pdf([["text"]] * 3))
+
+        with pytest.raises(TimeoutError):
+            async for _ in extract_pdf_pages(str(document_path), timeout=0):
+                pass
@@ -1,15 +1,31 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 from app.services.tests.tests import (
     normalize_parsed_data,
     fill_random_value,
     build_google_form_payload,
+    answer_test_questions,
+    run_background_tests,
+    build_llm_answer_plan,
+    save_test_run,
+    submit_single_test,
 )
 from app.controllers.tests import get_run_status
-from app.schemas.tests.test import AnsweredQuestionStructure, QuestionType
+from app.schemas.llm import LLMUsage
+from app.schemas.tests.test import (
+    Answer,
+    AnsweredQuestionStructure,
+    AnsweredTestContent,
+    QuestionStructure,
+    QuestionType,
+    TestQuestions,
+    TestResponse,
+    TestSubmitPayload,
+)
 from app.utils.exception_types import NotFoundError
-from app.utils.enums import JobStatus
+from app.services.jobs.store import InMemoryJobStore
+from app.utils.enums import JobStatus, JobKind
 
 
 class TestNormalizeParsedData:
@@ -128,27 +144,308 @@ class TestBuildGoogleFormPayload:
         assert result == {"entry.300": None}
 
 
+class TestAnswerTestQuestions:
+
+    @pytest.fixture
+    def test_content(self):
+        return TestQuestions(
+            questions=[
+                QuestionStructure(
+                    id=1,
+                    question="Capital of France?",
+                    type=QuestionType(type_id=2, description="Multiple choice"),
+                    required=True,
+                    options=["Paris", "Rome"],
+                ),
+                QuestionStructure(
+                    id=2,
+                    question="Your name",
+                    type=QuestionType(type_id=0, description="Short answer"),
+                    required=True,
+                ),
+            ]
+        )
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.tests.answer_llm_questions", new_callable=AsyncMock)
+    async def test_uses_answer_plan_without_calling_llm(
+        self, mock_answer_llm, test_content
+    ):
+        result = await answer_test_questions(
+            test_content=test_content,
+            payload_answers=[
+                Answer(question_id=1, answer_mode="llm"),
+                Answer(question_id=2, answer_mode="user", answer="Bob"),
+            ],
+            test_id=1,
+            db_session=MagicMock(),
+            llm_answers_map={1: "Paris"},
+        )
+
+        mock_answer_llm.assert_not_called()
+        content, llm_usage = result
+        assert content.questions[0].llm_answer == "Paris"
+        assert content.questions[1].user_answer == "Bob"
+        assert llm_usage is None
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.tests.answer_llm_questions", new_callable=AsyncMock)
+    async def test_calls_llm_without_answer_plan(self, mock_answer_llm, test_content):
+        usage = LLMUsage(model="gemini", prompt_tokens=100, attempts=1)
+        mock_answer_llm.return_value = ({1: "Rome"}, usage)
+
+        content, llm_usage = await answer_test_questions(
+            test_content=test_content,
+            payload_answers=[Answer(question_id=1, answer_mode="llm")],
+            test_id=1,
+            db_session=MagicMock(),
+        )
+
+        mock_answer_llm.assert_awaited_once()
+        assert content.questions[0].llm_answer == "Rome"
+        assert llm_usage == usage
+
+
+class TestBuildLLMAnswerPlan:
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.tests.answer_llm_questions", new_callable=AsyncMock)
+    @patch("app.services.tests.tests.get_test_from_db", new_callable=AsyncMock)
+    @patch("app.services.tests.tests.async_postgres_session")
+    async def test_passes_cache_bypass_flag_to_solver(
+        self, mock_session, mock_get_test, mock_answer_llm, fake_user
+    ):
+        mock_get_test.return_value = MagicMock(content=TestQuestions(questions=[]))
+        mock_answer_llm.return_value = ({1: "Paris"}, None)
+        payload = TestSubmitPayload(quantity=1, answers=[], use_llm_cache=False)
+
+        result = await build_llm_answer_plan(1, payload, fake_user)
+
+        assert result == ({1: "Paris"}, None)
+        assert mock_answer_llm.await_args.kwargs["use_cache"] is False
+
+
+class TestSaveTestRun:
+
+    @pytest.mark.asyncio
+    async def test_records_llm_usage(self):
+        session = MagicMock(commit=AsyncMock(), refresh=AsyncMock())
+        usage = LLMUsage(
+            model="gemini",
+            prompt_tokens=1200,
+            completion_tokens=80,
+            attempts=2,
+            retrieval_time=0.1,
+            generation_time=1.5,
+            answering_time=1.7,
+        )
+
+        test_run = await save_test_run(
+            test_db=MagicMock(id=1),
+            job_id="job-1",
+            user_id=1,
+            answered_test_content=AnsweredTestContent(questions=[]),
+            async_db_session=session,
+            llm_usage=usage,
+        )
+
+        assert test_run.llm_model == "gemini"
+        assert test_run.llm_prompt_tokens == 1200
+        assert test_run.llm_completion_tokens == 80
+        assert test_run.llm_attempts == 2
+        assert test_run.llm_answering_time == 1.7
+        session.add.assert_called_once_with(test_run)
+
+
+class TestRunBackgroundTests:
+
+    @staticmethod
+    async def _create_job(store, quantity):
+        await store.create(
+            "job-1",
+            kind=JobKind.TEST_RUN,
+            data={
+                "status": JobStatus.PENDING,
+                "total_tests": quantity,
+                "processed_tests": 0,
+                "results": [],
+            },
+        )
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.tests.submit_single_test", new_callable=AsyncMock)
+    @patch("app.services.tests.tests.build_llm_answer_plan", new_callable=AsyncMock)
+    async def test_solves_llm_once_per_batch(
+        self, mock_plan, mock_submit, fake_user, memory_job_store
+    ):
+        await self._create_job(memory_job_store, 3)
+        usage = LLMUsage(model="gemini", prompt_tokens=100, attempts=1)
+        mock_plan.return_value = ({1: "Paris"}, usage)
+        mock_submit.return_value = TestResponse(test_id=1, run_id=10)
+        payload = TestSubmitPayload(quantity=3, answers=[])
+
+        await run_background_tests("job-1", 1, payload, fake_user)
+
+        mock_plan.assert_awaited_once()
+        assert mock_submit.await_count == 3
+        for call in mock_submit.await_args_list:
+            assert call.kwargs["llm_answers_map"] == {1: "Paris"}
+        # Every copy shares one holder, the first saved run claims the plan usage
+        holders = [call.kwargs["plan_usage"] for call in mock_submit.await_args_list]
+        assert all(holder is holders[0] for holder in holders)
+        assert holders[0] == {"usage": usage}
+        job = await memory_job_store.get("job-1")
+        assert job["processed_tests"] == 3
+        assert job["status"] == JobStatus.COMPLETED
+        assert len(job["results"]) == 3
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.tests.submit_single_test", new_callable=AsyncMock)
+    @patch("app.services.tests.tests.build_llm_answer_plan", new_callable=AsyncMock)
+    async def test_failed_plan_is_left_to_the_worker_retry(
+        self, mock_plan, mock_submit, fake_user, memory_job_store
+    ):
+        await self._create_job(memory_job_store, 2)
+        mock_plan.side_effect = RuntimeError("Gemini is down")
+        payload = TestSubmitPayload(quantity=2, answers=[])
+
+        with pytest.raises(RuntimeError):
+            await run_background_tests("job-1", 1, payload, fake_user)
+
+        mock_submit.assert_not_called()
+        job = await memory_job_store.get("job-1")
+        assert job["status"] == JobStatus.PROCESSING
+        assert job["error"] == "Gemini is down"
+        assert job["results"] == []
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.tests.submit_single_test", new_callable=AsyncMock)
+    @patch("app.services.tests.tests.build_llm_answer_plan", new_callable=AsyncMock)
+    async def test_diverse_mode_solves_every_copy(
+        self, mock_plan, mock_submit, fake_user, memory_job_store
+    ):
+        await self._create_job(memory_job_store, 2)
+        mock_submit.return_value = TestResponse(test_id=1, run_id=10)
+        payload = TestSubmitPayload(quantity=2, answers=[], diverse_llm_answers=True)
+
+        await run_background_tests("job-1", 1, payload, fake_user)
+
+        mock_plan.assert_not_called()
+        for call in mock_submit.await_args_list:
+            assert call.kwargs["llm_answers_map"] is None
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.tests.submit_single_test", new_callable=AsyncMock)
+    @patch("app.services.tests.tests.build_llm_answer_plan", new_callable=AsyncMock)
+    async def test_retried_job_submits_only_remaining_copies(
+        self, mock_plan, mock_submit, fake_user, memory_job_store
+    ):
+        await self._create_job(memory_job_store, 3)
+        await memory_job_store.append_result(
+            "job-1", {"status": JobStatus.COMPLETED, "run_id": 1}
+        )
+        mock_plan.return_value = ({}, None)
+        mock_submit.return_value = TestResponse(test_id=1, run_id=10)
+        payload = TestSubmitPayload(quantity=3, answers=[])
+
+        await run_background_tests("job-1", 1, payload, fake_user)
+
+        assert mock_submit.await_count == 2
+        job = await memory_job_store.get("job-1")
+        assert job["processed_tests"] == 3
+        assert len(job["results"]) == 3
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.tests.submit_single_test", new_callable=AsyncMock)
+    @patch("app.services.tests.tests.build_llm_answer_plan", new_callable=AsyncMock)
+    async def test_failed_progress_update_does_not_cancel_batch(
+        self, mock_plan, mock_submit, fake_user, memory_job_store
+    ):
+        await self._create_job(memory_job_store, 3)
+        mock_plan.return_value = ({}, None)
+        mock_submit.return_value = TestResponse(test_id=1, run_id=10)
+        payload = TestSubmitPayload(quantity=3, answers=[])
+        append_result = memory_job_store.append_result
+        calls = 0
+
+        async def flaky_append_result(job_id, result):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise ConnectionError("connection reset")
+            await append_result(job_id, result)
+
+        with patch.object(memory_job_store, "append_result", flaky_append_result):
+            await run_background_tests("job-1", 1, payload, fake_user)
+
+        assert mock_submit.await_count == 3
+        job = await memory_job_store.get("job-1")
+        assert job["status"] == JobStatus.COMPLETED
+        assert len(job["results"]) == 2
+
+
+class TestSubmitSingleTest:
+
+    @pytest.mark.asyncio
+    @patch("app.services.tests.tests.save_test_run", new_callable=AsyncMock)
+    @patch("app.services.tests.tests.build_google_form_payload")
+    @patch("app.services.tests.tests.answer_test_questions", new_callable=AsyncMock)
+    @patch("app.services.tests.tests.get_test_from_db", new_callable=AsyncMock)
+    @patch("app.services.tests.tests.async_postgres_session")
+    async def test_plan_usage_is_saved_with_first_successful_run(
+        self,
+        mock_session,
+        mock_get_test,
+        mock_answer,
+        _mock_payload,
+        mock_save,
+        fake_user,
+    ):
+        mock_session.return_value.__aenter__.return_value = MagicMock()
+        mock_get_test.return_value = MagicMock(id=1, url=None)
+        mock_answer.return_value = (AnsweredTestContent(questions=[]), None)
+        mock_save.side_effect = [
+            RuntimeError("db down"),
+            MagicMock(id=10),
+            MagicMock(id=11),
+        ]
+        usage = LLMUsage(model="gemini", prompt_tokens=100, attempts=1)
+        plan_usage = {"usage": usage}
+        payload = TestSubmitPayload(quantity=3, answers=[])
+
+        with pytest.raises(RuntimeError):
+            await submit_single_test(1, "job-1", payload, fake_user, {}, plan_usage)
+        for _ in range(2):
+            await submit_single_test(1, "job-1", payload, fake_user, {}, plan_usage)
+
+        assert [call.kwargs["llm_usage"] for call in mock_save.await_args_list] == [
+            usage,
+            usage,
+            None,
+        ]
+        assert plan_usage == {}
+
+
 class TestGetRunStatus:
 
     @pytest.mark.asyncio
-    @patch("app.controllers.tests.TEST_RUNS_JOBS_STORAGE", {})
-    async def test_raises_not_found_for_missing_job(self):
+    async def test_raises_not_found_for_missing_job(self, memory_job_store):
         with pytest.raises(NotFoundError):
             await get_run_status("non-existent-id")
 
     @pytest.mark.asyncio
-    @patch(
-        "app.controllers.tests.TEST_RUNS_JOBS_STORAGE",
-        {
-            "job-123": {
+    async def test_returns_completed_status_with_results(self, memory_job_store):
+        await memory_job_store.create(
+            "job-123",
+            kind=JobKind.TEST_RUN,
+            data={
                 "status": JobStatus.COMPLETED,
                 "processed_tests": 2,
                 "total_tests": 2,
                 "results": [{"run_id": 1, "status": "completed"}],
-            }
-        },
-    )
-    async def test_returns_completed_status_with_results(self):
+            },
+        )
+
         result = await get_run_status("job-123")
 
         assert result.job_id == "job-123"
@@ -158,19 +455,54 @@ class TestGetRunStatus:
         assert result.results is not None
 
     @pytest.mark.asyncio
-    @patch(
-        "app.controllers.tests.TEST_RUNS_JOBS_STORAGE",
-        {
-            "job-456": {
+    async def test_returns_pending_status_without_results(self, memory_job_store):
+        await memory_job_store.create(
+            "job-456",
+            kind=JobKind.TEST_RUN,
+            data={
                 "status": JobStatus.PENDING,
                 "processed_tests": 0,
                 "total_tests": 5,
                 "results": [],
-            }
-        },
-    )
-    async def test_returns_pending_status_without_results(self):
+            },
+        )
+
         result = await get_run_status("job-456")
 
         assert result.status == JobStatus.PENDING
         assert result.results is None
+
+    @pytest.mark.asyncio
+    async def test_raises_not_found_for_document_job(self, memory_job_store):
+        await memory_job_store.create(
+            "doc-job",
+            kind=JobKind.DOCUMENT_UPLOAD,
+            data={"status": JobStatus.PENDING},
+        )
+
+        with pytest.raises(NotFoundError):
+            await get_run_status("doc-job")
+
+
+class TestInMemoryJobStore:
+
+    @pytest.mark.asyncio
+    async def test_increment_and_append_result(self):
+        store = InMemoryJobStore()
+        await store.create("job-1", kind=JobKind.TEST_RUN, data={"results": []})
+
+        await store.increment("job-1", "processed_tests")
+        await store.increment("job-1", "processed_tests")
+        await store.append_result("job-1", {"status": JobStatus.FAILED})
+
+        job = await store.get("job-1")
+        assert job["processed_tests"] == 2
+        assert job["results"] == [{"status": JobStatus.FAILED}]
+
+    @pytest.mark.asyncio
+    async def test_expired_jobs_are_removed(self):
+        store = InMemoryJobStore(ttl=-1)
+        await store.create("job-1", kind=JobKind.TEST_RUN, data={})
+
+        assert await store.cleanup_expired() == 1
+        assert await store.get("job-1") is None
@@ -0,0 +1,28 @@
+from unittest.mock import patch
+
+from app.utils.cache import TTLCache
+
+
+class TestTTLCache:
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(max_size=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    @patch("app.utils.cache.time.monotonic")
+    def test_expires_entries_after_ttl(self, mock_monotonic):
+        mock_monotonic.return_value = 100.0
+        cache = TTLCache(max_size=2, ttl=10)
+        cache.set("a", 1)
+
+        mock_monotonic.return_value = 111.0
+
+        assert cache.get("a") is None
+        assert len(cache) == 0
@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.controllers.tests import start_test_batch
+from app.schemas.tests.test import TestSubmitPayload
+from app.services.jobs.queue import get_retry_delay
+from app.utils.enums import JobKind, JobStatus
+from app.worker import JobWorker
+
+
+def make_task(kind=JobKind.TEST_RUN, attempts=1):
+    task = MagicMock()
+    task.id = 7
+    task.job_id = "job-1"
+    task.kind = kind.value
+    task.attempts = attempts
+    task.max_attempts = 3
+    task.payload = {}
+    return task
+
+
+class TestJobWorker:
+
+    @pytest.mark.asyncio
+    @patch("app.worker.fail_task", new_callable=AsyncMock)
+    @patch("app.worker.complete_task", new_callable=AsyncMock)
+    async def test_completes_successful_task(self, mock_complete, mock_fail):
+        handler = AsyncMock()
+        task = make_task()
+
+        with patch.dict("app.worker.TASK_HANDLERS", {JobKind.TEST_RUN: handler}):
+            await JobWorker(concurrency=1).run_task(task)
+
+        handler.assert_awaited_once_with(task)
+        mock_complete.assert_awaited_once_with(7)
+        mock_fail.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch("app.worker.fail_task", new_callable=AsyncMock)
+    @patch("app.worker.complete_task", new_callable=AsyncMock)
+    async def test_failed_task_is_scheduled_for_retry(self, mock_complete, mock_fail):
+        handler = AsyncMock(side_effect=RuntimeError("Gemini is down"))
+        mock_fail.return_value = True
+
+        with patch.dict("app.worker.TASK_HANDLERS", {JobKind.TEST_RUN: handler}):
+            await JobWorker(concurrency=1).run_task(make_task())
+
+        mock_fail.assert_awaited_once_with(7, error="Gemini is down")
+        mock_complete.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch("app.worker.fail_task", new_callable=AsyncMock)
+    @patch("app.worker.complete_task", new_callable=AsyncMock)
+    async def test_job_fails_when_task_runs_out_of_attempts(
+        self, mock_complete, mock_fail, memory_job_store
+    ):
+        await memory_job_store.create(
+            "job-1", kind=JobKind.TEST_RUN, data={"status": JobStatus.PROCESSING}
+        )
+        handler = AsyncMock(side_effect=RuntimeError("Gemini is down"))
+        mock_fail.return_value = False
+
+        with (
+            patch.dict("app.worker.TASK_HANDLERS", {JobKind.TEST_RUN: handler}),
+            patch("app.worker.job_store", memory_job_store),
+        ):
+            await JobWorker(concurrency=1).run_task(make_task(attempts=3))
+
+        job = await memory_job_store.get("job-1")
+        assert job["status"] == JobStatus.FAILED
+        assert job["error"] == "Gemini is down"
+
+    @pytest.mark.asyncio
+    @patch("app.worker.heartbeat_task", new_callable=AsyncMock)
+    @patch("app.worker.complete_task", new_callable=AsyncMock)
+    async def test_long_task_refreshes_its_lock(self, mock_complete, mock_heartbeat):
+        async def slow_handler(_task):
+            await asyncio.sleep(0.05)
+
+        worker = JobWorker(concurrency=1, heartbeat_interval=0.01)
+        with patch.dict("app.worker.TASK_HANDLERS", {JobKind.TEST_RUN: slow_handler}):
+            await worker.run_task(make_task())
+
+        assert mock_heartbeat.await_count >= 2
+        mock_heartbeat.assert_awaited_with(7, worker.worker_id)
+
+    @pytest.mark.asyncio
+    @patch("app.worker.fail_abandoned_tasks", new_callable=AsyncMock)
+    @patch("app.worker.claim_next_task", new_callable=AsyncMock)
+    async def test_stops_polling_after_shutdown(self, mock_claim, _mock_abandoned):
+        worker = JobWorker(concurrency=2, poll_interval=0.01)
+        mock_claim.side_effect = lambda _worker_id: worker.stop()
+
+        with patch("app.worker.postgres_db_engine") as mock_engine:
+            mock_engine.dispose = AsyncMock()
+            await worker.run()
+
+        mock_engine.dispose.assert_awaited_once()
+
+    def test_retry_delay_grows_exponentially(self):
+        assert get_retry_delay(2) == 2 * get_retry_delay(1)
+        assert get_retry_delay(3) == 4 * get_retry_delay(1)
+
+
+class TestStartTestBatch:
+
+    @pytest.mark.asyncio
+    @patch("app.controllers.tests.enqueue_task", new_callable=AsyncMock)
+    async def test_enqueues_job_for_workers(
+        self, mock_enqueue, fake_user, memory_job_store
+    ):
+        payload = TestSubmitPayload(quantity=5, answers=[])
+
+        result = await start_test_batch(
+            test_id=3, payload=payload, current_user=fake_user
+        )
+
+        job = await memory_job_store.get(result.job_id)
+        assert job["status"] == JobStatus.PENDING
+        assert job["total_tests"] == 5
+        mock_enqueue.assert_awaited_once()
+        assert mock_enqueue.await_args.kwargs["kind"] == JobKind.TEST_RUN
+        assert mock_enqueue.await_args.kwargs["payload"]["test_id"] == 3
+        assert mock_enqueue.await_args.kwargs["payload"]["user_id"] == fake_user.id